@@ -0,0 +1,201 @@
+"""Standalone NumPy runtime for the trained XGBoost delay models.
+
+`ml/train_model.py` flattens every tree of the classifier and regressor into
+a handful of node arrays (split feature, threshold, child/missing pointers,
+leaf value) and saves them to one .npz. At inference all trees are walked
+together, one vectorized step per tree level, so serving needs neither
+XGBoost, scikit-learn nor joblib — only NumPy.
+
+`CompactBooster` mimics the scikit-learn methods the predictor calls
+(`predict_proba` / `predict`), so it drops in for the XGBoost wrappers.
+"""
+
+import json
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+COMPACT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "ml", "delay_model_compact.npz",
+)
+
+_ARRAYS = ("roots", "feature", "threshold", "left", "right", "missing", "value")
+
+
+def _parse_base_score(raw: str) -> float:
+    """base_score from a booster config: "5E-1" up to XGBoost 2.x, "[5E-1]" from 3.0 on."""
+    try:
+        return float(raw)
+    except ValueError:
+        scores = json.loads(raw)
+        if len(scores) != 1:
+            raise ValueError(f"Expected a single base_score, got {raw!r}")
+        return float(scores[0])
+
+
+class CompactBooster:
+    """A flattened gradient-boosted tree ensemble.
+
+    Node arrays are global across trees; `roots[t]` is tree t's root node.
+    Leaves have `feature == -1` and point to themselves, so walking past a
+    leaf is a no-op and every tree can advance in lockstep.
+    """
+
+    def __init__(
+        self, roots, feature, threshold, left, right, missing, value,
+        base_margin: float, objective: str, max_depth: int,
+    ):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing = missing
+        self.value = value
+        self.base_margin = base_margin
+        self.objective = objective
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_xgboost(cls, model, feature_cols: list[str]) -> "CompactBooster":
+        """Flatten a fitted XGBClassifier/XGBRegressor (or raw Booster)."""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        config = json.loads(booster.save_config())
+        objective = config["learner"]["objective"]["name"]
+        base_score = _parse_base_score(config["learner"]["learner_model_param"]["base_score"])
+        if objective.startswith("binary:"):
+            base_margin = math.log(base_score / (1.0 - base_score))
+        else:
+            base_margin = base_score
+
+        feature_index = {name: i for i, name in enumerate(feature_cols)}
+        columns = {name: [] for name in _ARRAYS if name != "roots"}
+        roots = []
+        max_depth = 0
+
+        for tree_json in booster.get_dump(dump_format="json"):
+            tree = json.loads(tree_json)
+            offset = len(columns["feature"])
+            roots.append(offset)
+
+            # Collect this tree's nodes by id, then emit them densely
+            nodes = {}
+            stack = [(tree, 0)]
+            while stack:
+                node, depth = stack.pop()
+                nodes[node["nodeid"]] = node
+                max_depth = max(max_depth, depth)
+                for child in node.get("children", []):
+                    stack.append((child, depth + 1))
+
+            local = {node_id: offset + i for i, node_id in enumerate(sorted(nodes))}
+            for node_id in sorted(nodes):
+                node = nodes[node_id]
+                me = local[node_id]
+                if "leaf" in node:
+                    columns["feature"].append(-1)
+                    columns["threshold"].append(0.0)
+                    columns["left"].append(me)
+                    columns["right"].append(me)
+                    columns["missing"].append(me)
+                    columns["value"].append(node["leaf"])
+                else:
+                    split = node["split"]
+                    if split in feature_index:
+                        feat = feature_index[split]
+                    else:
+                        feat = int(split.lstrip("f"))  # Trained on a bare array: "f<index>"
+                    columns["feature"].append(feat)
+                    columns["threshold"].append(node["split_condition"])
+                    columns["left"].append(local[node["yes"]])
+                    columns["right"].append(local[node["no"]])
+                    columns["missing"].append(local[node["missing"]])
+                    columns["value"].append(0.0)
+
+        return cls(
+            roots=np.asarray(roots, dtype=np.int32),
+            feature=np.asarray(columns["feature"], dtype=np.int32),
+            threshold=np.asarray(columns["threshold"], dtype=np.float32),
+            left=np.asarray(columns["left"], dtype=np.int32),
+            right=np.asarray(columns["right"], dtype=np.int32),
+            missing=np.asarray(columns["missing"], dtype=np.int32),
+            value=np.asarray(columns["value"], dtype=np.float32),
+            base_margin=base_margin,
+            objective=objective,
+            max_depth=max_depth,
+        )
+
+    def to_arrays(self, prefix: str) -> dict:
+        arrays = {f"{prefix}{name}": getattr(self, name) for name in _ARRAYS}
+        arrays[f"{prefix}meta"] = np.array(json.dumps({
+            "base_margin": self.base_margin,
+            "objective": self.objective,
+            "max_depth": self.max_depth,
+        }))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str) -> "CompactBooster":
+        meta = json.loads(str(data[f"{prefix}meta"]))
+        return cls(**{name: data[f"{prefix}{name}"] for name in _ARRAYS}, **meta)
+
+    def predict_margin(self, X, chunk_rows: int = 4096) -> np.ndarray:
+        """Raw ensemble score per row (before the objective's link function).
+
+        Rows are processed in chunks so the (rows × trees) node matrix stays
+        small even for large inputs such as the prediction table build.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            chunk = X[start:start + chunk_rows]
+            rows = np.arange(chunk.shape[0])[:, None]
+            node = np.broadcast_to(self.roots, (chunk.shape[0], len(self.roots))).copy()
+
+            for _ in range(self.max_depth):
+                feat = self.feature[node]
+                x = chunk[rows, np.maximum(feat, 0)]
+                nxt = np.where(x < self.threshold[node], self.left[node], self.right[node])
+                node = np.where(np.isnan(x), self.missing[node], nxt)
+
+            out[start:start + chunk_rows] = self.value[node].sum(axis=1, dtype=np.float64)
+        return out + self.base_margin
+
+    def predict(self, X) -> np.ndarray:
+        margin = self.predict_margin(X)
+        if self.objective.startswith("binary:"):
+            return 1.0 / (1.0 + np.exp(-margin))
+        return margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.predict(X)
+        return np.column_stack([1.0 - p, p])
+
+
+def export_compact_model(
+    classifier, regressor, feature_cols: list[str], path: str = COMPACT_MODEL_PATH,
+    encoders: Optional[dict] = None,
+) -> None:
+    """Write both models' flattened trees (plus feature order and encoders) to one .npz."""
+    arrays = {
+        **CompactBooster.from_xgboost(classifier, feature_cols).to_arrays("clf_"),
+        **CompactBooster.from_xgboost(regressor, feature_cols).to_arrays("reg_"),
+        "feature_cols": np.array(feature_cols),
+        "encoders": np.array(json.dumps(encoders or {})),
+    }
+    np.savez_compressed(path, **arrays)
+
+
+def load_compact_model(path: str = COMPACT_MODEL_PATH) -> Optional[dict]:
+    """Load exported models as {"classifier", "regressor", "feature_cols", "encoders"}, or None if absent."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return {
+            "classifier": CompactBooster.from_arrays(data, "clf_"),
+            "regressor": CompactBooster.from_arrays(data, "reg_"),
+            "feature_cols": [str(c) for c in data["feature_cols"]],
+            "encoders": json.loads(str(data["encoders"])) if "encoders" in data.files else {},
+        }
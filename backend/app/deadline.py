@@ -0,0 +1,62 @@
+"""Per-request time budget shared by route generation and its upstream calls."""
+
+import os
+import time
+from typing import Optional
+
+# Overall budget for one /routes request (seconds)
+DEFAULT_ROUTE_BUDGET_S = float(os.getenv("ROUTE_DEADLINE_S", "8.0"))
+
+
+class Deadline:
+    """Time budget for a single request.
+
+    Upstream helpers cap their HTTP timeouts with `timeout()` and check
+    `exhausted()` before starting work they can degrade instead (straight-line
+    geometry, heuristic transit, default weather). Every stage that was skipped
+    or cut short is recorded in `degraded` so the response can report it.
+    """
+
+    def __init__(self, budget_s: float = DEFAULT_ROUTE_BUDGET_S, reserve_s: float = 0.25):
+        self.budget_s = budget_s
+        # Kept back for assembling the response after upstream work stops
+        self.reserve_s = reserve_s
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget_s
+        self.degraded: list[str] = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """Seconds left for upstream work (excludes the reserve)."""
+        return max(0.0, self.expires_at - self.reserve_s - time.monotonic())
+
+    def exhausted(self, min_needed: float = 0.0) -> bool:
+        """True if less than `min_needed` seconds of budget are left."""
+        return self.remaining() <= min_needed
+
+    def timeout(self, default: float) -> float:
+        """Cap a per-call timeout to the remaining budget."""
+        return max(0.05, min(default, self.remaining()))
+
+    def degrade(self, stage: str) -> None:
+        """Record that a stage fell back to a degraded result."""
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+
+
+def timeout_for(deadline: Optional[Deadline], default: float) -> float:
+    """Per-call timeout: `default`, capped by the deadline when there is one."""
+    return deadline.timeout(default) if deadline else default
+
+
+def should_skip(deadline: Optional[Deadline], stage: str, min_needed: float = 0.3) -> bool:
+    """Check whether a stage should be skipped for lack of budget.
+
+    Records the stage as degraded when it is skipped.
+    """
+    if deadline is None or not deadline.exhausted(min_needed):
+        return False
+    deadline.degrade(stage)
+    return True
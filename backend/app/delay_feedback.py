@@ -0,0 +1,370 @@
+"""Online feedback loop: realized delays from GTFS-RT trip updates.
+
+The poller hands each trip-updates snapshot to `DelayFeedback.submit()`, a
+non-blocking put on a small bounded queue (the oldest snapshot is dropped if
+the consumer falls behind), so polling never waits on this module. The
+consumer keeps the latest predicted time per (trip, stop); once that time
+has passed — or the stop leaves the feed right around it — the stop event
+counts as realized and its lateness is taken from the feed's delay field or,
+failing that, from the static GTFS schedule.
+
+Realized delays are:
+- appended to a daily CSV under data/feedback/ (append-only, for retraining);
+- aggregated in-process per (line, stop, hour);
+- paired with DelayPredictor's output for the same line, station and hour,
+  giving a rolling calibration (Brier score, reliability bins, expected
+  minutes error) over the last FEEDBACK_WINDOW_HOURS.
+"""
+
+import asyncio
+import csv
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger("fluxroute.feedback")
+
+FEEDBACK_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "feedback")
+FEEDBACK_LOG_ENABLED = os.getenv("DELAY_FEEDBACK_LOG", "1").lower() not in ("0", "false", "no")
+FEEDBACK_WINDOW_HOURS = float(os.getenv("DELAY_FEEDBACK_WINDOW_HOURS", "24"))
+
+SIGNIFICANT_DELAY_MIN = 5  # Same label as training: delay_minutes > 5
+QUEUE_SIZE = 4
+WINDOW_MAX_OBS = 100_000
+RELIABILITY_BINS = 10
+VANISHED_GRACE_S = 300  # A stop that leaves the feed within 5 min of its time counts as served
+MAX_ABS_DELAY_S = 3 * 3600  # Larger gaps are schedule mismatches, not delays
+REALIZED_MEMORY_S = 2 * 3600  # How long realized (trip, stop) keys are remembered to avoid double counting
+
+# GTFS route_type -> DelayPredictor mode
+ROUTE_TYPE_MODES = {0: "streetcar", 1: "subway", 2: "subway", 3: "bus"}
+
+LOG_FIELDS = [
+    "observed_at", "trip_id", "route_id", "line", "stop_id", "hour", "day_of_week",
+    "scheduled", "actual", "delay_seconds", "predicted_probability", "predicted_minutes",
+]
+
+
+def _gtfs_seconds(value) -> Optional[int]:
+    """Parse a GTFS time like '25:30:00' to seconds after service-day midnight."""
+    try:
+        h, m, *rest = str(value).split(":")
+        return int(h) * 3600 + int(m) * 60 + (int(rest[0]) if rest else 0)
+    except ValueError:
+        return None
+
+
+def _scheduled_epoch(service_seconds: int, near: float) -> int:
+    """Epoch of a schedule time on whichever service day (today or yesterday) is closest to `near`."""
+    midnight = datetime.fromtimestamp(near).replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = [(midnight - timedelta(days=d)).timestamp() + service_seconds for d in (0, 1)]
+    return int(min(candidates, key=lambda t: abs(t - near)))
+
+
+class StopHourStats:
+    """Running lateness totals for one (line, stop, hour)."""
+
+    def __init__(self):
+        self.count = 0
+        self.significant = 0
+        self.delay_sum_min = 0.0
+        self.last_seen = 0
+
+    def add(self, delay_min: float, seen_at: int) -> None:
+        self.count += 1
+        self.significant += delay_min > SIGNIFICANT_DELAY_MIN
+        self.delay_sum_min += delay_min
+        self.last_seen = max(self.last_seen, seen_at)
+
+    @property
+    def mean_delay_min(self) -> float:
+        return self.delay_sum_min / self.count if self.count else 0.0
+
+
+def _calibration(rows: list[tuple]) -> dict:
+    """Calibration summary for window rows (ts, line, probability, predicted min, delay min)."""
+    summary = {
+        "observations": len(rows),
+        "mean_delay_minutes": round(sum(r[4] for r in rows) / len(rows), 2) if rows else None,
+        "observed_significant_rate": (
+            round(sum(r[4] > SIGNIFICANT_DELAY_MIN for r in rows) / len(rows), 3) if rows else None
+        ),
+    }
+    scored = [r for r in rows if r[2] is not None]
+    summary["scored"] = len(scored)
+    if not scored:
+        return summary
+
+    n = len(scored)
+    outcomes = [float(r[4] > SIGNIFICANT_DELAY_MIN) for r in scored]
+    minute_errors = [r[3] - max(0.0, r[4]) for r in scored]
+    bins = [[0, 0.0, 0.0] for _ in range(RELIABILITY_BINS)]  # count, prob sum, outcome sum
+    for r, outcome in zip(scored, outcomes):
+        b = bins[min(int(r[2] * RELIABILITY_BINS), RELIABILITY_BINS - 1)]
+        b[0] += 1
+        b[1] += r[2]
+        b[2] += outcome
+
+    summary.update({
+        "mean_predicted_probability": round(sum(r[2] for r in scored) / n, 3),
+        "brier_score": round(sum((r[2] - o) ** 2 for r, o in zip(scored, outcomes)) / n, 4),
+        "expected_minutes_mae": round(sum(abs(e) for e in minute_errors) / n, 2),
+        "expected_minutes_bias": round(sum(minute_errors) / n, 2),
+        "reliability": [
+            {
+                "range": [i / RELIABILITY_BINS, (i + 1) / RELIABILITY_BINS],
+                "count": count,
+                "mean_predicted": round(prob_sum / count, 3),
+                "observed_rate": round(outcome_sum / count, 3),
+            }
+            for i, (count, prob_sum, outcome_sum) in enumerate(bins) if count
+        ],
+    })
+    return summary
+
+
+class DelayFeedback:
+    """Realized-delay store fed by the real-time poller; see the module docstring."""
+
+    def __init__(self, app_state: dict):
+        self.app_state = app_state
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.stop_hours: dict[tuple[str, str, int], StopHourStats] = {}
+        # (actual epoch, line, predicted probability, predicted minutes, delay minutes)
+        self.window: deque = deque(maxlen=WINDOW_MAX_OBS)
+        self.counters = {"snapshots": 0, "dropped_snapshots": 0, "realized": 0, "no_schedule": 0, "discarded": 0}
+        self._lock = threading.Lock()
+        # Consumer-thread state: latest (event time, route_id, feed delay) per (trip, stop)
+        self._pending: dict[tuple[str, str], tuple[int, Optional[str], Optional[int]]] = {}
+        self._realized: dict[tuple[str, str], int] = {}
+        self._static_key = None
+        self._routes: dict[str, tuple[str, Optional[str]]] = {}
+        self._stop_names: dict[str, str] = {}
+        self._trip_ids = (None, None)
+
+    def submit(self, trip_updates: dict) -> None:
+        """Queue a parsed trip-updates snapshot ({trip_id: (route_id, timestamp, rows)})
+        without waiting; drops the oldest queued one when full."""
+        if not trip_updates:
+            return
+        self.counters["snapshots"] += 1
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.counters["dropped_snapshots"] += 1
+        self.queue.put_nowait((time.time(), trip_updates))
+
+    async def run(self) -> None:
+        """Consume snapshots until cancelled; the work happens in a worker thread."""
+        while True:
+            received_at, snapshot = await self.queue.get()
+            try:
+                await asyncio.to_thread(self._process, snapshot, received_at)
+            except Exception as e:
+                logger.warning(f"Delay feedback update failed: {e}")
+
+    # --- Consumer (worker thread) ---
+
+    def _process(self, snapshot: dict, now: float) -> None:
+        realized = self._realize(snapshot, now)
+        if not realized:
+            return
+
+        gtfs = self.app_state.get("gtfs") or {}
+        self._refresh_static(gtfs)
+        scheduled = self._scheduled_times(gtfs, realized)
+
+        observations = []
+        for (trip_id, stop_id), (actual, route_id, delay_s) in realized.items():
+            if delay_s is None:
+                service_seconds = scheduled.get((trip_id, stop_id))
+                if service_seconds is None:
+                    self.counters["no_schedule"] += 1
+                    continue
+                delay_s = actual - _scheduled_epoch(service_seconds, actual)
+            if abs(delay_s) > MAX_ABS_DELAY_S:
+                self.counters["discarded"] += 1
+                continue
+
+            line, mode = self._routes.get(route_id, (route_id or "unknown", None))
+            scheduled_at = datetime.fromtimestamp(actual - delay_s)
+            observations.append({
+                "observed_at": int(now), "trip_id": trip_id, "route_id": route_id, "line": line,
+                "mode": mode, "stop_id": stop_id, "station": self._stop_names.get(stop_id),
+                "hour": scheduled_at.hour, "day_of_week": scheduled_at.weekday(), "month": scheduled_at.month,
+                "scheduled": actual - delay_s, "actual": actual, "delay_seconds": delay_s,
+            })
+        if not observations:
+            return
+
+        self._attach_predictions(observations)
+        self._record(observations)
+        if FEEDBACK_LOG_ENABLED:
+            try:
+                self._append_log(observations, now)
+            except OSError as e:
+                logger.warning(f"Could not append to the delay feedback log: {e}")
+
+    def _realize(self, snapshot: dict, now: float) -> dict:
+        """Track the latest prediction per (trip, stop); pop and return the events that happened."""
+        pending, done = self._pending, self._realized
+        in_snapshot = set()
+        for trip_id, (route_id, _timestamp, rows) in snapshot.items():
+            for _seq, stop_id, arrival, departure, delay in rows:
+                key = (trip_id, stop_id)
+                in_snapshot.add(key)
+                event_time = arrival or departure
+                if event_time and key not in done:
+                    pending[key] = (int(event_time), route_id, delay)
+
+        realized = {}
+        for key, value in list(pending.items()):
+            event_time = value[0]
+            in_feed = key in in_snapshot
+            if event_time <= now or (not in_feed and event_time <= now + VANISHED_GRACE_S):
+                realized[key] = value
+                done[key] = event_time
+                del pending[key]
+            elif not in_feed:
+                del pending[key]  # Dropped well before its time: cancelled or detoured
+
+        cutoff = now - REALIZED_MEMORY_S
+        for key in [k for k, t in done.items() if t < cutoff]:
+            del done[key]
+        return realized
+
+    def _refresh_static(self, gtfs: dict) -> None:
+        """route_id -> (line, mode) and stop_id -> name, rebuilt when the GTFS tables change."""
+        routes, stops = gtfs.get("routes"), gtfs.get("stops")
+        key = (id(routes), id(stops))
+        if key == self._static_key:
+            return
+        self._static_key = key
+        self._routes, self._stop_names = {}, {}
+        if routes is not None and not routes.empty:
+            import pandas as pd
+
+            short_names = routes["route_short_name"] if "route_short_name" in routes.columns else routes["route_id"]
+            route_types = routes["route_type"] if "route_type" in routes.columns else pd.Series(None, index=routes.index)
+            for route_id, short_name, route_type in zip(routes["route_id"].astype(str), short_names, route_types):
+                line = str(short_name) if pd.notna(short_name) else route_id
+                mode = ROUTE_TYPE_MODES.get(int(route_type)) if pd.notna(route_type) else None
+                self._routes[route_id] = (line, mode)
+        if stops is not None and not stops.empty and "stop_name" in stops.columns:
+            self._stop_names = dict(zip(stops["stop_id"].astype(str), stops["stop_name"].astype(str)))
+
+    def _scheduled_times(self, gtfs: dict, realized: dict) -> dict[tuple[str, str], int]:
+        """Scheduled service-day seconds for realized events the feed gave no delay for."""
+        wanted = {key for key, (_, _, delay_s) in realized.items() if delay_s is None}
+        stop_times = gtfs.get("stop_times")
+        if not wanted or stop_times is None or stop_times.empty:
+            return {}
+
+        # One vectorized scan per batch; trip IDs are stringified once per GTFS load
+        if self._trip_ids[0] is not stop_times:
+            self._trip_ids = (stop_times, stop_times["trip_id"].astype(str))
+        trip_ids = self._trip_ids[1]
+        mask = trip_ids.isin({trip_id for trip_id, _ in wanted})
+        rows = stop_times[mask]
+
+        scheduled = {}
+        for trip_id, stop_id, arrival, departure in zip(
+            trip_ids[mask], rows["stop_id"], rows["arrival_time"], rows["departure_time"],
+        ):
+            key = (trip_id, stop_id)
+            if key in wanted:
+                seconds = _gtfs_seconds(arrival if isinstance(arrival, str) else departure)
+                if seconds is not None:
+                    scheduled[key] = seconds
+        return scheduled
+
+    def _attach_predictions(self, observations: list[dict]) -> None:
+        """What the served model predicts for each event: one batch over the distinct inputs."""
+        predictor = self.app_state.get("predictor")
+        fields = ("line", "station", "hour", "day_of_week", "month", "mode")
+        keys = list({tuple(o[f] for f in fields) for o in observations})
+        predictions = {}
+        if predictor is not None:
+            try:
+                results = predictor.predict_batch([dict(zip(fields, k)) for k in keys])
+                predictions = dict(zip(keys, results))
+            except Exception as e:
+                logger.warning(f"Delay feedback predictions failed: {e}")
+
+        for o in observations:
+            result = predictions.get(tuple(o[f] for f in fields))
+            o["predicted_probability"] = result["delay_probability"] if result else None
+            o["predicted_minutes"] = result["expected_delay_minutes"] if result else None
+
+    def _record(self, observations: list[dict]) -> None:
+        with self._lock:
+            for o in observations:
+                delay_min = o["delay_seconds"] / 60
+                key = (o["line"], o["stop_id"], o["hour"])
+                stats = self.stop_hours.get(key)
+                if stats is None:
+                    stats = self.stop_hours[key] = StopHourStats()
+                stats.add(delay_min, o["actual"])
+                self.window.append((o["actual"], o["line"], o["predicted_probability"], o["predicted_minutes"], delay_min))
+            self.counters["realized"] += len(observations)
+
+    def _append_log(self, observations: list[dict], now: float) -> None:
+        os.makedirs(FEEDBACK_DIR, exist_ok=True)
+        path = os.path.join(FEEDBACK_DIR, f"observed_delays-{datetime.fromtimestamp(now):%Y%m%d}.csv")
+        is_new = not os.path.exists(path)
+        with open(path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=LOG_FIELDS, extrasaction="ignore")
+            if is_new:
+                writer.writeheader()
+            writer.writerows(observations)
+
+    # --- Readers (event loop) ---
+
+    def stop_hour_stats(self, line: str, stop_id: str, hour: int) -> Optional[StopHourStats]:
+        return self.stop_hours.get((line, stop_id, hour))
+
+    def recent_line_lateness(self, seconds: float) -> dict[str, list[float]]:
+        """Delays (minutes) realized per line in the last `seconds`."""
+        cutoff = time.time() - seconds
+        by_line: dict[str, list[float]] = {}
+        with self._lock:
+            for ts, line, _prob, _minutes, delay_min in reversed(self.window):
+                if ts < cutoff:
+                    break
+                by_line.setdefault(line, []).append(delay_min)
+        return by_line
+
+    def metrics(self, line: Optional[str] = None, top: int = 20) -> dict:
+        """Counters, rolling calibration (overall and per line) and the most delayed stop-hours."""
+        cutoff = time.time() - FEEDBACK_WINDOW_HOURS * 3600
+        with self._lock:
+            rows = [r for r in self.window if r[0] >= cutoff and (line is None or r[1] == line)]
+            stop_hours = [
+                (key, stats) for key, stats in self.stop_hours.items()
+                if stats.count >= 3 and (line is None or key[0] == line)
+            ]
+
+        by_line: dict[str, list[tuple]] = {}
+        for r in rows:
+            by_line.setdefault(r[1], []).append(r)
+        stop_hours.sort(key=lambda item: item[1].mean_delay_min, reverse=True)
+
+        return {
+            "window_hours": FEEDBACK_WINDOW_HOURS,
+            "counters": dict(self.counters, pending=len(self._pending), queued=self.queue.qsize()),
+            "calibration": _calibration(rows),
+            "lines": {name: _calibration(line_rows) for name, line_rows in sorted(by_line.items())},
+            "most_delayed_stop_hours": [
+                {
+                    "line": key[0], "stop_id": key[1], "hour": key[2],
+                    "station": self._stop_names.get(key[1]),
+                    "observations": stats.count,
+                    "mean_delay_minutes": round(stats.mean_delay_min, 2),
+                    "significant_rate": round(stats.significant / stats.count, 3),
+                }
+                for key, stats in stop_hours[:top]
+            ],
+        }
@@ -0,0 +1,139 @@
+"""Pre-encoded JSON responses for read-heavy endpoints.
+
+/transit-lines, /alerts and /vehicles return data that only changes when a
+warm-up task or the realtime poller swaps a new object into app_state, yet
+used to be JSON-encoded (and compressed by nobody) on every request. Here
+each payload is encoded once per source object — JSON bytes plus gzip and,
+if the optional `brotli` package is installed, brotli variants — and served
+as raw bytes:
+- the cache entry is keyed by the identity of the app_state object it was
+  built from, so it is rebuilt only after that object is replaced;
+- encoding and compression run in a worker thread (the transit overlay is
+  several MB of GeoJSON);
+- every response carries a weak ETag and `Cache-Control: no-cache`, so
+  clients revalidate and get a bodyless 304 while nothing has changed.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import importlib.util
+import logging
+from typing import Any, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.fast_json import dumps
+
+logger = logging.getLogger("fluxroute.encoded")
+
+# Brotli needs the optional `brotli` package (pip install brotli)
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+MIN_COMPRESS_BYTES = 1024  # Smaller bodies aren't worth a Content-Encoding
+
+
+class EncodedPayload:
+    """One response body (JSON unless told otherwise) with its compressed variants and ETag."""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.variants: dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if BROTLI_AVAILABLE:
+                import brotli
+                self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    @classmethod
+    def from_obj(cls, obj: Any) -> "EncodedPayload":
+        return cls(dumps(obj))
+
+    def sizes(self) -> dict[str, int]:
+        return {"identity": len(self.body), **{enc: len(data) for enc, data in self.variants.items()}}
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Codings from an Accept-Encoding header, minus any refused with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def encoded_response(request: Request, payload: EncodedPayload) -> Response:
+    """304 if the client's ETag matches, else the best variant the client accepts."""
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or payload.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for encoding in ("br", "gzip"):
+        if encoding in payload.variants and (encoding in accepted or "*" in accepted):
+            headers["Content-Encoding"] = encoding
+            return Response(payload.variants[encoding], media_type=payload.media_type, headers=headers)
+    return Response(payload.body, media_type=payload.media_type, headers=headers)
+
+
+class EncodedCache:
+    """Encoded payloads keyed by name, each valid while its source object is unchanged."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[Any, EncodedPayload]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.builds = 0
+
+    async def get(self, key: str, source: Any, build: Callable[[Any], Any]) -> EncodedPayload:
+        """Payload for `source`, re-encoding `build(source)` only if `source` was replaced."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            self.hits += 1
+            return entry[1]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is source:
+                self.hits += 1
+                return entry[1]  # Built by a concurrent request while we waited
+            payload = await asyncio.to_thread(lambda: EncodedPayload.from_obj(build(source)))
+            self._entries[key] = (source, payload)
+            self.builds += 1
+            logger.debug(f"Encoded {key}: {payload.sizes()}")
+            return payload
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "builds": self.builds,
+            "brotli": BROTLI_AVAILABLE,
+            "entries": {key: payload.sizes() for key, (_source, payload) in self._entries.items()},
+        }
+
+
+_cache = EncodedCache()
+
+
+async def cached_json(request: Request, key: str, source: Optional[Any], build: Callable[[Any], Any]) -> Response:
+    """Serve `build(source)` as pre-encoded JSON, rebuilt only when `source` is replaced."""
+    return encoded_response(request, await _cache.get(key, source, build))
+
+
+def encoded_cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,63 @@
+"""Fast JSON serialization for API responses and WebSocket messages.
+
+FastAPI's default path for an endpoint with a response_model dumps the
+returned model to a dict, validates that dict against the model again,
+converts it with jsonable_encoder and finally runs json.dumps — three full
+walks of objects that route_engine has already built and validated.
+`FastJSONResponse` skips all of that when an endpoint returns it directly
+(the response_model on the route still documents the schema):
+- Pydantic models serialize through pydantic-core's Rust serializer
+  (model_dump_json), with no intermediate dicts;
+- anything else — GeoJSON dicts, NDJSON / WebSocket messages, dicts that
+  embed models — goes through orjson, with models converted by its
+  `default` hook.
+
+orjson is optional: without it the same calls fall back to the standard
+json module (compact separators), so behaviour is unchanged, only slower.
+"""
+
+import importlib.util
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+if ORJSON_AVAILABLE:
+    import orjson
+
+
+def _default(obj: Any) -> Any:
+    """Types neither encoder handles natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):  # NumPy scalars and arrays
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON for a model, or for plain data that may embed models."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json().encode("utf-8")
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """`dumps` as text, for WebSocket text frames."""
+    return dumps(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps` (no jsonable_encoder, no re-validation)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
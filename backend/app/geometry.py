@@ -0,0 +1,157 @@
+"""Geometry helpers for map payloads: projection, simplification, clipping, encoding.
+
+Points are (x, y) tuples in whatever planar units the caller uses — GeoJSON
+[lng, lat] pairs, or normalized Web Mercator from `lnglat_to_mercator()`
+(x and y in [0, 1), y growing southwards, as in slippy-map tiles).
+"""
+
+import math
+from typing import Sequence
+
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def lnglat_to_mercator(lng: float, lat: float) -> tuple[float, float]:
+    """Normalized Web Mercator coordinates: (0, 0) is the north-west corner of tile 0/0/0."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def _segment_distance_sq(p, a, b) -> float:
+    """Squared distance from point p to segment ab."""
+    ax, ay = a
+    dx, dy = b[0] - ax, b[1] - ay
+    px, py = p[0] - ax, p[1] - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq > 0:
+        t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+        px -= t * dx
+        py -= t * dy
+    return px * px + py * py
+
+
+def douglas_peucker(points: Sequence, tolerance: float) -> list:
+    """Ramer–Douglas–Peucker simplification; keeps both endpoints.
+
+    `tolerance` is in the points' own units.
+    """
+    return [points[i] for i in douglas_peucker_indices(points, tolerance)]
+
+
+def douglas_peucker_indices(points: Sequence, tolerance: float) -> list[int]:
+    """Indices of the points Douglas–Peucker keeps, in order.
+
+    Iterative (explicit stack), so long GTFS shapes can't hit the recursion
+    limit.
+    """
+    n = len(points)
+    if n <= 2 or tolerance <= 0:
+        return list(range(n))
+
+    tol_sq = tolerance * tolerance
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        a, b = points[first], points[last]
+        max_sq, index = 0.0, -1
+        for i in range(first + 1, last):
+            d = _segment_distance_sq(points[i], a, b)
+            if d > max_sq:
+                max_sq, index = d, i
+        if max_sq > tol_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def simplify_for_zoom(coordinates: Sequence, zoom: float, pixel_tolerance: float = 1.0) -> list:
+    """Drop [lng, lat] vertices that move the line less than `pixel_tolerance`
+    screen pixels (256 px tiles) at map `zoom`. Kept vertices are returned as-is."""
+    if len(coordinates) <= 2:
+        return list(coordinates)
+    projected = [lnglat_to_mercator(c[0], c[1]) for c in coordinates]
+    tolerance = pixel_tolerance / (256 * 2 ** zoom)
+    return [coordinates[i] for i in douglas_peucker_indices(projected, tolerance)]
+
+
+def encode_polyline(coordinates: Sequence, precision: int = 6) -> str:
+    """Encoded polyline (Google algorithm; precision 6 = Mapbox "polyline6") of [lng, lat] pairs."""
+    factor = 10 ** precision
+    out: list[str] = []
+    prev_lat = prev_lng = 0
+    for lng, lat, *_ in coordinates:
+        lat_i, lng_i = round(lat * factor), round(lng * factor)
+        for delta in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(out)
+
+
+def quantize_deltas(coordinates: Sequence, scale: int = 100_000) -> list[int]:
+    """Flat [x0, y0, dx1, dy1, ...] integers: the first [lng, lat] scaled, then deltas."""
+    out: list[int] = []
+    px = py = 0
+    for lng, lat, *_ in coordinates:
+        x, y = round(lng * scale), round(lat * scale)
+        out += (x - px, y - py)
+        px, py = x, y
+    return out
+
+
+def clip_line(points: Sequence, xmin: float, ymin: float, xmax: float, ymax: float) -> list[list]:
+    """Clip a polyline to a box (Liang–Barsky per segment); returns the parts inside."""
+    parts: list[list] = []
+    current: list = []
+    for a, b in zip(points, points[1:]):
+        clipped = _clip_segment(a, b, xmin, ymin, xmax, ymax)
+        if clipped is None:
+            if current:
+                parts.append(current)
+                current = []
+            continue
+        start, end = clipped
+        if not current:
+            current = [start]
+        elif current[-1] != start:
+            parts.append(current)
+            current = [start]
+        current.append(end)
+        if end != b:  # Left the box
+            parts.append(current)
+            current = []
+    if current:
+        parts.append(current)
+    return [part for part in parts if len(part) >= 2]
+
+
+def _clip_segment(a, b, xmin, ymin, xmax, ymax):
+    x0, y0 = a
+    dx, dy = b[0] - x0, b[1] - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+    start = a if t0 == 0.0 else (x0 + t0 * dx, y0 + t0 * dy)
+    end = b if t1 == 1.0 else (x0 + t1 * dx, y0 + t1 * dy)
+    return start, end
@@ -1464,6 +1464,7 @@ def find_transit_route(gtfs: dict, origin_stop_id: str, dest_stop_id: str, route
         "route_id": resolved_route_id or route_id_str,
         "transfers": 0 if same_line else 1,
         "geometry": geometry,
+        "intermediate_stops": intermediate,
     }
 
     return route_info
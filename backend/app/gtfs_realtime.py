@@ -1,17 +1,33 @@
 import asyncio
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional
 
 import httpx
 
+from app.live_adjustment import MAX_AGE_S, refresh_live_adjuster
 from app.models import ServiceAlert, VehiclePosition
+from app.trip_updates import TripUpdateStore
+from app.upstream import get_http_client
+from app.vehicle_store import VehicleStore
 
 logger = logging.getLogger("fluxroute.realtime")
 
-POLL_INTERVAL = 30  # seconds
+POLL_INTERVAL = 30  # seconds — starting interval; each feed then adapts (see FeedSchedule)
+MIN_POLL_INTERVAL = float(os.getenv("REALTIME_MIN_INTERVAL_S", "10"))
+MAX_POLL_INTERVAL = float(os.getenv("REALTIME_MAX_INTERVAL_S", "120"))
+# Per-attempt timeout for each feed (protobuf and JSON fallback get one each)
+FEED_TIMEOUTS = {"vehicles": 10.0, "alerts": 10.0, "trip_updates": 15.0}
+# Decode trip updates in a child process: ParseFromString and the row loops
+# hold the GIL, so in a thread they still stall the event loop
+DECODE_IN_PROCESS = os.getenv("REALTIME_DECODE_PROCESS", "1").lower() not in ("0", "false", "no")
 METROLINX_API_KEY = os.getenv("METROLINX_API_KEY", "")
 
 # TTC GTFS-RT endpoints (protobuf)
@@ -113,7 +129,7 @@ MOCK_ALERTS = [
 ]
 
 
-def _generate_mock_vehicles() -> list[VehiclePosition]:
+def _generate_mock_vehicles() -> VehicleStore:
     """Generate realistic vehicle positions along subway lines."""
     vehicles = []
     ts = int(time.time())
@@ -150,7 +166,7 @@ def _generate_mock_vehicles() -> list[VehiclePosition]:
                 timestamp=ts,
             ))
 
-    return vehicles
+    return VehicleStore.from_positions(vehicles)
 
 
 def _get_mock_alerts() -> list[ServiceAlert]:
@@ -158,40 +174,56 @@ def _get_mock_alerts() -> list[ServiceAlert]:
     return random.sample(MOCK_ALERTS, k=min(3, len(MOCK_ALERTS)))
 
 
-async def _try_fetch_vehicles_protobuf(client: httpx.AsyncClient) -> list[VehiclePosition]:
-    """Try TTC GTFS-RT protobuf vehicle feed."""
-    resp = await client.get(TTC_VEHICLE_URL)
-    if resp.status_code != 200:
-        return []
+# --- Feed decoding ---
+#
+# Each feed is first reduced to compact tuples; vehicles are then packed into
+# a columnar VehicleStore and alerts wrapped with Pydantic's model_construct
+# (the fields come straight from typed protobuf/JSON values, so validation is
+# skipped). Vehicle and alert decoders run in a worker thread; that keeps
+# them off the event loop but not off the GIL, so the loop still stalls for
+# most of their (short) decode time. Trip updates, the largest feed, are
+# decoded in a child process (see _decode_off_loop) and come back as tuples.
+
+# (vehicle_id, route_id, latitude, longitude, bearing, speed, timestamp)
+VehicleRow = tuple[str, Optional[str], float, float, Optional[float], Optional[float], Optional[int]]
+# (id, route_id, title, description, severity)
+AlertRow = tuple[str, Optional[str], str, str, str]
+
+
+def _alerts_from_rows(rows: list[AlertRow]) -> list[ServiceAlert]:
+    return [
+        ServiceAlert.model_construct(
+            id=aid, route_id=route_id, title=title, description=desc, severity=severity, active=True,
+        )
+        for aid, route_id, title, desc, severity in rows
+    ]
+
 
+def _parse_vehicle_rows_protobuf(content: bytes) -> list[VehicleRow]:
     from google.transit import gtfs_realtime_pb2
     feed = gtfs_realtime_pb2.FeedMessage()
-    feed.ParseFromString(resp.content)
+    feed.ParseFromString(content)
 
-    vehicles = []
+    rows = []
     for entity in feed.entity:
         if entity.HasField("vehicle"):
             vp = entity.vehicle
-            vehicles.append(VehiclePosition(
-                vehicle_id=str(vp.vehicle.id) if vp.vehicle.id else entity.id,
-                route_id=str(vp.trip.route_id) if vp.trip.route_id else None,
-                latitude=vp.position.latitude,
-                longitude=vp.position.longitude,
-                bearing=vp.position.bearing if vp.position.bearing else None,
-                speed=vp.position.speed if vp.position.speed else None,
-                timestamp=vp.timestamp if vp.timestamp else None,
+            pos = vp.position
+            rows.append((
+                str(vp.vehicle.id) if vp.vehicle.id else entity.id,
+                str(vp.trip.route_id) if vp.trip.route_id else None,
+                pos.latitude,
+                pos.longitude,
+                pos.bearing if pos.bearing else None,
+                pos.speed if pos.speed else None,
+                vp.timestamp if vp.timestamp else None,
             ))
-    return vehicles
+    return rows
 
 
-async def _try_fetch_vehicles_json(client: httpx.AsyncClient) -> list[VehiclePosition]:
-    """Try TTC JSON vehicle API (fallback)."""
-    resp = await client.get(TTC_LIVE_VEHICLES_URL)
-    if resp.status_code != 200:
-        return []
-
-    data = resp.json()
-    vehicles = []
+def _parse_vehicle_rows_json(content: bytes) -> list[VehicleRow]:
+    data = json.loads(content)
+    rows = []
     ts = int(time.time())
 
     # The TTC live-map API returns vehicles grouped by route
@@ -201,46 +233,41 @@ async def _try_fetch_vehicles_json(client: httpx.AsyncClient) -> list[VehiclePos
                 continue
             for v in route_vehicles:
                 try:
-                    vehicles.append(VehiclePosition(
-                        vehicle_id=str(v.get("id", f"ttc_{route_id}_{len(vehicles)}")),
-                        route_id=str(route_id),
-                        latitude=float(v.get("lat", 0)),
-                        longitude=float(v.get("lon", v.get("lng", 0))),
-                        bearing=float(v["heading"]) if v.get("heading") else None,
-                        speed=float(v["speed"]) if v.get("speed") else None,
-                        timestamp=ts,
+                    rows.append((
+                        str(v.get("id", f"ttc_{route_id}_{len(rows)}")),
+                        str(route_id),
+                        float(v.get("lat", 0)),
+                        float(v.get("lon", v.get("lng", 0))),
+                        float(v["heading"]) if v.get("heading") else None,
+                        float(v["speed"]) if v.get("speed") else None,
+                        ts,
                     ))
                 except (ValueError, KeyError):
                     continue
     elif isinstance(data, list):
         for v in data:
             try:
-                vehicles.append(VehiclePosition(
-                    vehicle_id=str(v.get("id", f"ttc_{len(vehicles)}")),
-                    route_id=str(v.get("routeId", v.get("route_id", ""))),
-                    latitude=float(v.get("lat", v.get("latitude", 0))),
-                    longitude=float(v.get("lon", v.get("lng", v.get("longitude", 0)))),
-                    bearing=float(v["heading"]) if v.get("heading") else None,
-                    speed=float(v["speed"]) if v.get("speed") else None,
-                    timestamp=ts,
+                rows.append((
+                    str(v.get("id", f"ttc_{len(rows)}")),
+                    str(v.get("routeId", v.get("route_id", ""))),
+                    float(v.get("lat", v.get("latitude", 0))),
+                    float(v.get("lon", v.get("lng", v.get("longitude", 0)))),
+                    float(v["heading"]) if v.get("heading") else None,
+                    float(v["speed"]) if v.get("speed") else None,
+                    ts,
                 ))
             except (ValueError, KeyError):
                 continue
 
-    return vehicles
-
+    return rows
 
-async def _try_fetch_alerts_protobuf(client: httpx.AsyncClient) -> list[ServiceAlert]:
-    """Try TTC GTFS-RT protobuf alerts feed."""
-    resp = await client.get(TTC_ALERTS_URL)
-    if resp.status_code != 200:
-        return []
 
+def _parse_alert_rows_protobuf(content: bytes) -> list[AlertRow]:
     from google.transit import gtfs_realtime_pb2
     feed = gtfs_realtime_pb2.FeedMessage()
-    feed.ParseFromString(resp.content)
+    feed.ParseFromString(content)
 
-    alerts = []
+    rows = []
     for entity in feed.entity:
         if entity.HasField("alert"):
             alert = entity.alert
@@ -255,24 +282,15 @@ async def _try_fetch_alerts_protobuf(client: httpx.AsyncClient) -> list[ServiceA
             if alert.informed_entity:
                 route_id = alert.informed_entity[0].route_id or None
 
-            alerts.append(ServiceAlert(
-                id=entity.id,
-                route_id=route_id,
-                title=title or "Service Alert",
-                description=desc or "No details available",
-                severity="warning",
+            rows.append((
+                entity.id, route_id, title or "Service Alert", desc or "No details available", "warning",
             ))
-    return alerts
-
+    return rows
 
-async def _try_fetch_alerts_json(client: httpx.AsyncClient) -> list[ServiceAlert]:
-    """Try TTC JSON alerts API (fallback)."""
-    resp = await client.get(TTC_LIVE_ALERTS_URL)
-    if resp.status_code != 200:
-        return []
 
-    data = resp.json()
-    alerts = []
+def _parse_alert_rows_json(content: bytes) -> list[AlertRow]:
+    data = json.loads(content)
+    rows = []
 
     # TTC alerts API uses "routes" key, other formats may use "alerts" or "data"
     alert_list = data if isinstance(data, list) else data.get("routes", data.get("alerts", data.get("data", [])))
@@ -294,135 +312,374 @@ async def _try_fetch_alerts_json(client: httpx.AsyncClient) -> list[ServiceAlert
             if route_id and str(route_id) == "9999":
                 route_id = None  # TTC uses 9999 for system-wide alerts
 
-            alerts.append(ServiceAlert(
-                id=str(item.get("id", f"alert_{len(alerts)}")),
-                route_id=str(route_id) if route_id else None,
-                title=title[:200] if title else "Service Alert",
-                description=description[:500] if description else "No details",
-                severity=severity,
+            rows.append((
+                str(item.get("id", f"alert_{len(rows)}")),
+                str(route_id) if route_id else None,
+                str(title)[:200] if title else "Service Alert",
+                str(description)[:500] if description else "No details",
+                severity,
             ))
-        except (ValueError, KeyError):
+        except (ValueError, KeyError, AttributeError):
             continue
 
-    return alerts
-
+    return rows
 
-async def _try_fetch_trip_updates_protobuf(client: httpx.AsyncClient) -> dict:
-    """Fetch TTC GTFS-RT trip updates protobuf feed.
 
-    Returns dict: {(trip_id, stop_id): {"arrival": epoch_seconds, "departure": epoch_seconds}}
+def _parse_trip_updates_protobuf(content: bytes) -> dict:
+    """{trip_id: (route_id, timestamp, rows)} with rows of app.trip_updates.StopRow:
+    (stop_sequence, stop_id, arrival, departure, delay) in feed order.
+    Times are epoch seconds; None where the feed leaves a field out.
     """
-    resp = await client.get(TTC_TRIP_UPDATES_URL)
-    if resp.status_code != 200:
-        return {}
-
     from google.transit import gtfs_realtime_pb2
     feed = gtfs_realtime_pb2.FeedMessage()
-    feed.ParseFromString(resp.content)
+    feed.ParseFromString(content)
 
-    updates = {}
+    trips = {}
     for entity in feed.entity:
         if entity.HasField("trip_update"):
             tu = entity.trip_update
             trip_id = str(tu.trip.trip_id) if tu.trip.trip_id else None
             if not trip_id:
                 continue
+            route_id = str(tu.trip.route_id) if tu.trip.route_id else None
+            rows = []
             for stu in tu.stop_time_update:
                 stop_id = str(stu.stop_id) if stu.stop_id else None
                 if not stop_id:
                     continue
-                entry = {}
-                if stu.HasField("arrival") and stu.arrival.time:
-                    entry["arrival"] = stu.arrival.time
-                if stu.HasField("departure") and stu.departure.time:
-                    entry["departure"] = stu.departure.time
-                if entry:
-                    updates[(trip_id, stop_id)] = entry
+                has_arr, has_dep = stu.HasField("arrival"), stu.HasField("departure")
+                arrival = stu.arrival.time if has_arr and stu.arrival.time else None
+                departure = stu.departure.time if has_dep and stu.departure.time else None
+                delay = None
+                if has_arr and stu.arrival.HasField("delay"):
+                    delay = stu.arrival.delay
+                elif has_dep and stu.departure.HasField("delay"):
+                    delay = stu.departure.delay
+                if arrival or departure or delay is not None:
+                    seq = stu.stop_sequence if stu.HasField("stop_sequence") else None
+                    rows.append((seq, stop_id, arrival, departure, delay))
+            if rows:
+                trips[trip_id] = (route_id, tu.timestamp or feed.header.timestamp, tuple(rows))
 
-    return updates
+    return trips
 
 
-async def _try_fetch_realtime(app_state: dict) -> None:
-    """Try to fetch real GTFS-RT data, fall back to mock."""
-    vehicles_fetched = False
-    alerts_fetched = False
+def decode_vehicles_protobuf(content: bytes) -> VehicleStore:
+    return VehicleStore.from_rows(_parse_vehicle_rows_protobuf(content))
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            # Try vehicle positions: protobuf first, then JSON
-            try:
-                vehicles = await _try_fetch_vehicles_protobuf(client)
-                if vehicles:
-                    app_state["vehicles"] = vehicles
-                    vehicles_fetched = True
-                    logger.info(f"Fetched {len(vehicles)} real vehicle positions (protobuf)")
-            except Exception as e:
-                logger.debug(f"TTC protobuf vehicle feed unavailable: {e}")
 
-            if not vehicles_fetched:
-                try:
-                    vehicles = await _try_fetch_vehicles_json(client)
-                    if vehicles:
-                        app_state["vehicles"] = vehicles
-                        vehicles_fetched = True
-                        logger.info(f"Fetched {len(vehicles)} real vehicle positions (JSON)")
-                except Exception as e:
-                    logger.debug(f"TTC JSON vehicle feed unavailable: {e}")
-
-            # Try alerts: protobuf first, then JSON
-            try:
-                alerts = await _try_fetch_alerts_protobuf(client)
-                if alerts:
-                    app_state["alerts"] = alerts
-                    alerts_fetched = True
-                    logger.info(f"Fetched {len(alerts)} real alerts (protobuf)")
-            except Exception as e:
-                logger.debug(f"TTC protobuf alerts feed unavailable: {e}")
+def decode_vehicles_json(content: bytes) -> VehicleStore:
+    return VehicleStore.from_rows(_parse_vehicle_rows_json(content))
 
-            if not alerts_fetched:
-                try:
-                    alerts = await _try_fetch_alerts_json(client)
-                    if alerts:
-                        app_state["alerts"] = alerts
-                        alerts_fetched = True
-                        logger.info(f"Fetched {len(alerts)} real alerts (JSON)")
-                except Exception as e:
-                    logger.debug(f"TTC JSON alerts feed unavailable: {e}")
-
-            # Try trip updates (protobuf only — no JSON fallback)
-            try:
-                trip_updates = await _try_fetch_trip_updates_protobuf(client)
-                if trip_updates:
-                    app_state["trip_updates"] = trip_updates
-                    logger.info(f"Fetched {len(trip_updates)} trip updates")
-                else:
-                    app_state["trip_updates"] = {}
-            except Exception as e:
-                logger.debug(f"TTC trip updates feed unavailable: {e}")
-                app_state["trip_updates"] = {}
 
-    except Exception as e:
-        logger.debug(f"Real-time fetch failed: {e}")
+def decode_alerts_protobuf(content: bytes) -> list[ServiceAlert]:
+    return _alerts_from_rows(_parse_alert_rows_protobuf(content))
 
-    # Fallback to mock data for anything we couldn't fetch
-    if not vehicles_fetched:
-        app_state["vehicles"] = _generate_mock_vehicles()
-        logger.debug("Using mock vehicle data")
-    if not alerts_fetched:
-        app_state["alerts"] = _get_mock_alerts()
-        logger.debug("Using mock alert data")
 
+def decode_alerts_json(content: bytes) -> list[ServiceAlert]:
+    return _alerts_from_rows(_parse_alert_rows_json(content))
 
-async def _poller_loop(app_state: dict):
-    """Background polling loop."""
+
+# --- Feed fetching ---
+#
+# Each URL remembers its ETag / Last-Modified validators and a fingerprint
+# of the last body it decoded (the FeedHeader timestamp for protobuf feeds,
+# a BLAKE2 digest otherwise). A 304, or a 200 with the same fingerprint,
+# returns UNCHANGED without decoding, and app_state keeps what it has. The
+# validators are dropped whenever app_state stops holding that URL's data
+# (another source or mock data took over), so UNCHANGED is always safe.
+
+UNCHANGED = object()
+
+_validators: dict[str, dict] = {}
+_url_stats: dict[str, dict[str, int]] = {}
+
+
+def _protobuf_header_timestamp(content: bytes) -> int:
+    """FeedHeader.timestamp without parsing the entities (0 if unavailable).
+
+    The header is field 1 of FeedMessage and is written first, so only that
+    length-delimited prefix is decoded.
+    """
+    if not content or content[0] != 0x0A:
+        return 0
+    length, shift, i = 0, 0, 1
+    while i < len(content):
+        byte = content[i]
+        length |= (byte & 0x7F) << shift
+        i += 1
+        if not byte & 0x80:
+            break
+        shift += 7
+    from google.transit import gtfs_realtime_pb2
+    header = gtfs_realtime_pb2.FeedHeader()
+    header.ParseFromString(content[i:i + length])
+    return header.timestamp
+
+
+def _fingerprint(content: bytes, protobuf: bool) -> str:
+    if protobuf:
+        ts = _protobuf_header_timestamp(content)
+        if ts:
+            return f"ts:{ts}:{len(content)}"
+    return "b2:" + hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+# Decoders that run in the child process; they must be module-level (picklable)
+# functions returning plain tuples/dicts
+_PROCESS_DECODERS = {_parse_trip_updates_protobuf}
+_decode_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_decode_pool() -> ProcessPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        # spawn, not fork: the parent has an event loop and worker threads running
+        _decode_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _decode_pool
+
+
+def shutdown_decode_pool() -> None:
+    global _decode_pool
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False, cancel_futures=True)
+        _decode_pool = None
+
+
+async def _decode_off_loop(decode, content: bytes):
+    """Run `decode(content)` in the decode process if it is registered there, else in a thread."""
+    global _decode_pool
+    if DECODE_IN_PROCESS and decode in _PROCESS_DECODERS:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_get_decode_pool(), decode, content)
+        except BrokenProcessPool:
+            logger.warning("Realtime decode process died; decoding this poll in a thread")
+            _decode_pool = None  # Recreated on the next poll
+    return await asyncio.to_thread(decode, content)
+
+
+async def _fetch_and_decode(client: httpx.AsyncClient, url: str, decode, protobuf: bool):
+    """Conditional GET of `url`; decodes the body off the event loop only if it changed.
+
+    Returns the decoded result, UNCHANGED, or None on a non-200.
+    """
+    cache = _validators.setdefault(url, {})
+    stats = _url_stats.setdefault(url, {"requests": 0, "not_modified": 0, "same_content": 0, "decoded": 0})
+    stats["requests"] += 1
+    headers = {}
+    if cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+    if cache.get("last_modified"):
+        headers["If-Modified-Since"] = cache["last_modified"]
+
+    resp = await client.get(url, headers=headers)
+    if resp.status_code == 304 and cache.get("fingerprint"):
+        stats["not_modified"] += 1
+        return UNCHANGED
+    if resp.status_code != 200:
+        _validators.pop(url, None)
+        return None
+
+    fingerprint = await asyncio.to_thread(_fingerprint, resp.content, protobuf)
+    if fingerprint == cache.get("fingerprint"):
+        stats["same_content"] += 1
+        return UNCHANGED
+    result = await _decode_off_loop(decode, resp.content)
+    stats["decoded"] += 1
+    cache.update(
+        etag=resp.headers.get("etag"),
+        last_modified=resp.headers.get("last-modified"),
+        fingerprint=fingerprint if result else None,
+    )
+    return result
+
+
+class FeedSchedule:
+    """Adaptive poll interval for one feed, from how often its content changes.
+
+    The interval tracks half the (EWMA) time between observed changes, so a
+    feed refreshed every 20 s is polled every ~10 s and one refreshed every
+    2 min about once a minute. Long runs without a change back off further;
+    failures reset to POLL_INTERVAL.
+    """
+
+    def __init__(self):
+        self.interval = float(POLL_INTERVAL)
+        self.change_interval: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.live = False  # app_state holds real (not mock) data for this feed
+        self.outcomes = {"changed": 0, "unchanged": 0, "failed": 0}
+
+    def observe(self, outcome: str, now: float) -> float:
+        """Record a poll outcome ("changed" / "unchanged" / "failed"); returns the next interval."""
+        self.outcomes[outcome] += 1
+        if outcome == "changed":
+            if self.last_change is not None:
+                dt = now - self.last_change
+                self.change_interval = dt if self.change_interval is None else 0.7 * self.change_interval + 0.3 * dt
+                self.interval = self._clamp(self.change_interval / 2)
+            self.last_change = now
+            self.live = True
+        elif outcome == "unchanged":
+            expected = self.change_interval or POLL_INTERVAL
+            if self.last_change is None or now - self.last_change > 2 * expected:
+                self.interval = self._clamp(self.interval * 1.5)
+        else:
+            self.interval = float(POLL_INTERVAL)
+            self.live = False
+        return self.interval
+
+    @staticmethod
+    def _clamp(seconds: float) -> float:
+        return min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, seconds))
+
+    def snapshot(self) -> dict:
+        return {
+            "interval_s": round(self.interval, 1),
+            "change_interval_s": round(self.change_interval, 1) if self.change_interval else None,
+            "last_change_age_s": round(time.time() - self.last_change, 1) if self.last_change else None,
+            "live": self.live,
+            **self.outcomes,
+        }
+
+
+async def _fetch_feed(client: httpx.AsyncClient, feed: str, attempts: list, timeout: float):
+    """Try each (source, url, decode, protobuf) in order, each capped at `timeout` seconds.
+
+    Returns (result, source) for the first non-empty result (possibly
+    UNCHANGED), else (None, None). Validators of the sources not serving
+    app_state are dropped.
+    """
+    result, served_by = None, None
+    for source, url, decode, protobuf in attempts:
+        try:
+            result = await asyncio.wait_for(_fetch_and_decode(client, url, decode, protobuf), timeout)
+        except asyncio.TimeoutError:
+            logger.debug(f"TTC {source} {feed} feed timed out after {timeout:.0f}s")
+        except Exception as e:
+            logger.debug(f"TTC {source} {feed} feed unavailable: {e}")
+        else:
+            if result:
+                served_by = url
+                break
+        result = None
+
+    for _, url, _, _ in attempts:
+        if url != served_by:
+            _validators.pop(url, None)
+    source = next((s for s, url, _, _ in attempts if url == served_by), None)
+    return result, source
+
+
+async def _poll_vehicles(app_state: dict, client: httpx.AsyncClient) -> str:
+    """Vehicle positions: protobuf first, then JSON, then mock. Returns the poll outcome."""
+    vehicles, source = await _fetch_feed(client, "vehicle", [
+        ("protobuf", TTC_VEHICLE_URL, decode_vehicles_protobuf, True),
+        ("JSON", TTC_LIVE_VEHICLES_URL, decode_vehicles_json, False),
+    ], FEED_TIMEOUTS["vehicles"])
+    if vehicles is UNCHANGED:
+        return "unchanged"
+    if vehicles:
+        app_state["vehicles"] = vehicles
+        logger.info(f"Fetched {len(vehicles)} real vehicle positions ({source})")
+        return "changed"
+    app_state["vehicles"] = _generate_mock_vehicles()
+    logger.debug("Using mock vehicle data")
+    return "failed"
+
+
+async def _poll_alerts(app_state: dict, client: httpx.AsyncClient) -> str:
+    """Service alerts: protobuf first, then JSON, then mock. Returns the poll outcome."""
+    alerts, source = await _fetch_feed(client, "alerts", [
+        ("protobuf", TTC_ALERTS_URL, decode_alerts_protobuf, True),
+        ("JSON", TTC_LIVE_ALERTS_URL, decode_alerts_json, False),
+    ], FEED_TIMEOUTS["alerts"])
+    if alerts is UNCHANGED:
+        return "unchanged"
+    if alerts:
+        app_state["alerts"] = alerts
+        logger.info(f"Fetched {len(alerts)} real alerts ({source})")
+        return "changed"
+    app_state["alerts"] = _get_mock_alerts()
+    logger.debug("Using mock alert data")
+    return "failed"
+
+
+async def _poll_trip_updates(app_state: dict, client: httpx.AsyncClient) -> str:
+    """Trip updates (protobuf only — no JSON fallback). Returns the poll outcome."""
+    trip_updates, _ = await _fetch_feed(client, "trip updates", [
+        ("protobuf", TTC_TRIP_UPDATES_URL, _parse_trip_updates_protobuf, True),
+    ], FEED_TIMEOUTS["trip_updates"])
+    if trip_updates is UNCHANGED:
+        return "unchanged"
+    store = app_state["trip_updates"]
+    if not trip_updates:
+        store.apply({})  # Only expires trips that have passed or gone unseen
+        return "failed"
+    diff = store.apply(trip_updates)
+    logger.info(
+        f"Trip updates: {len(store)} trips "
+        f"(+{diff['added']} ~{diff['updated']} -{diff['removed']}, {diff['unchanged']} unchanged)"
+    )
+    # Realized-delay tracking runs off the poller (non-blocking enqueue)
+    feedback = app_state.get("delay_feedback")
+    if feedback is not None:
+        feedback.submit(trip_updates)
+    return "changed"
+
+
+_POLLERS = {"vehicles": _poll_vehicles, "alerts": _poll_alerts, "trip_updates": _poll_trip_updates}
+FEED_SCHEDULES = {feed: FeedSchedule() for feed in _POLLERS}
+
+
+def realtime_feed_stats() -> dict:
+    """Per-feed poll interval and outcomes, and conditional-GET counters per URL."""
+    return {
+        "feeds": {feed: schedule.snapshot() for feed, schedule in FEED_SCHEDULES.items()},
+        "urls": dict(_url_stats),
+    }
+
+
+async def _feed_loop(app_state: dict, feed: str):
+    """Poll one feed forever on its own adaptive interval."""
+    poll, schedule = _POLLERS[feed], FEED_SCHEDULES[feed]
     while True:
+        # Reuse the pooled client — keep-alive outlives the poll interval
+        client = app_state.get("http_client") or get_http_client()
         try:
-            await _try_fetch_realtime(app_state)
+            outcome = await poll(app_state, client)
         except Exception as e:
-            logger.error(f"Poller error: {e}")
-            app_state["vehicles"] = _generate_mock_vehicles()
-            app_state["alerts"] = _get_mock_alerts()
-        await asyncio.sleep(POLL_INTERVAL)
+            logger.error(f"Poller error ({feed}): {e}")
+            outcome = "failed"
+        interval = schedule.observe(outcome, time.time())
+
+        # Push what changed to subscribed map clients (app.live_push)
+        hub = app_state.get("live_hub")
+        if hub is not None and outcome != "unchanged":
+            try:
+                await hub.publish(feed, app_state)
+            except Exception as e:
+                logger.warning(f"Live push failed ({feed}): {e}")
+
+        # Per-line live signals for the delay adjustment layer (mock positions excluded),
+        # rebuilt on changes and whenever they would pass half of MAX_AGE_S before
+        # this feed's next poll, so the adjuster never ages out between polls
+        adjuster = app_state.get("live_adjuster")
+        if (
+            outcome != "unchanged" or adjuster is None
+            or time.time() - adjuster.built_at + interval > MAX_AGE_S / 2
+        ):
+            try:
+                await refresh_live_adjuster(app_state, real_vehicles=FEED_SCHEDULES["vehicles"].live)
+            except Exception as e:
+                logger.warning(f"Live signal refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _poller_loop(app_state: dict):
+    """Background polling: the feeds run concurrently, each landing in app_state as
+    soon as it is fetched, so a slow feed never holds back the others."""
+    await asyncio.gather(*(_feed_loop(app_state, feed) for feed in _POLLERS))
 
 
 async def start_realtime_poller(app_state: dict) -> Optional[asyncio.Task]:
@@ -430,7 +687,11 @@ async def start_realtime_poller(app_state: dict) -> Optional[asyncio.Task]:
     # Initialize with mock data immediately
     app_state["vehicles"] = _generate_mock_vehicles()
     app_state["alerts"] = _get_mock_alerts()
-    app_state["trip_updates"] = {}
+    app_state["trip_updates"] = TripUpdateStore()
+    hub = app_state.get("live_hub")
+    if hub is not None:
+        await hub.publish("vehicles", app_state)
+        await hub.publish("alerts", app_state)
 
     task = asyncio.create_task(_poller_loop(app_state))
     logger.info("Real-time poller started")
@@ -446,4 +707,5 @@ async def stop_realtime_poller(app_state: dict):
             await task
         except asyncio.CancelledError:
             pass
+    shutdown_decode_pool()
     logger.info("Real-time poller stopped")
@@ -0,0 +1,245 @@
+"""Live adjustment layer on top of the static delay model.
+
+DelayPredictor only sees calendar and weather features. After every poll the
+real-time poller rebuilds a `LiveAdjuster` from what it just fetched:
+- active service alerts per line (weighted by severity);
+- trip-update lateness per line — the feed's delay field, or failing that
+  the delays realized in the last LATENESS_WINDOW_S (app.delay_feedback);
+- headway gaps per line: vehicles are projected onto the principal axis of
+  their positions and the largest gap is compared with the mean spacing.
+
+The adjuster is an immutable per-line snapshot swapped into
+`app_state["live_adjuster"]`, so applying it to a prediction is one dict
+lookup plus a few arithmetic operations. Snapshots older than MAX_AGE_S are
+ignored (the poller has stalled), leaving the model output unchanged.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Optional
+
+from app.ml_predictor import LINE_MAP
+from app.vehicle_store import VehicleStore
+
+logger = logging.getLogger("fluxroute.live")
+
+LIVE_ADJUSTMENT_ENABLED = os.getenv("LIVE_ADJUSTMENT", "1").lower() not in ("0", "false", "no")
+
+MAX_AGE_S = 180  # ~6 missed polls
+LATENESS_WINDOW_S = 1800
+SIGNIFICANT_DELAY_MIN = 5
+
+# Alerts: probability floor blended in per severity, and added expected minutes
+ALERT_WEIGHTS = {"info": 0.0, "warning": 0.25, "error": 0.5}
+ALERT_MINUTES = {"info": 0.0, "warning": 3.0, "error": 8.0}
+
+# Lateness: observed trips get weight n / (n + prior), capped
+LATENESS_PRIOR_TRIPS = 10
+LATENESS_MAX_WEIGHT = 0.6
+
+# Headway gaps: max gap / mean spacing of randomly placed vehicles is ~ln(n),
+# so only ratios well above that count as a service gap
+GAP_RATIO_NORMAL = 2.5
+GAP_RATIO_SEVERE = 5.0
+GAP_MIN_VEHICLES = 4
+GAP_MAX_BOOST = 0.2
+GAP_MAX_MINUTES = 4.0
+
+
+def line_key(line) -> str:
+    """Key lines the same way whatever their source ("Line 1", "1", " 504 ")."""
+    s = str(line).strip()
+    return LINE_MAP.get(s.lower(), s.upper())
+
+
+def _gap_ratio(points: list[tuple[float, float]]) -> Optional[float]:
+    """Largest gap between consecutive vehicles along the line over the mean spacing."""
+    n = len(points)
+    if n < GAP_MIN_VEHICLES:
+        return None
+    lat0 = sum(p[0] for p in points) / n
+    lng0 = sum(p[1] for p in points) / n
+    scale = math.cos(math.radians(lat0))
+    xs = [(p[1] - lng0) * scale for p in points]
+    ys = [p[0] - lat0 for p in points]
+
+    # Principal axis of the positions stands in for the line's shape
+    sxx = sum(x * x for x in xs)
+    syy = sum(y * y for y in ys)
+    sxy = sum(x * y for x, y in zip(xs, ys))
+    angle = 0.5 * math.atan2(2 * sxy, sxx - syy)
+    ux, uy = math.cos(angle), math.sin(angle)
+    along = sorted(x * ux + y * uy for x, y in zip(xs, ys))
+
+    mean_gap = (along[-1] - along[0]) / (n - 1)
+    if mean_gap <= 0:
+        return None
+    return max(b - a for a, b in zip(along, along[1:])) / mean_gap
+
+
+class LiveAdjuster:
+    """Per-line live signals and the blend applied to model predictions."""
+
+    def __init__(self, lines: dict[str, dict], built_at: Optional[float] = None):
+        self.lines = lines
+        self.built_at = built_at if built_at is not None else time.time()
+
+    def signals(self, line) -> Optional[dict]:
+        if time.time() - self.built_at > MAX_AGE_S:
+            return None
+        return self.lines.get(line_key(line))
+
+    def adjust(self, line, prediction: dict) -> dict:
+        """Blend one prediction (a predict() result dict) with the line's live signals."""
+        signals = self.signals(line)
+        if not signals:
+            return prediction
+
+        p = prediction["delay_probability"]
+        minutes = prediction["expected_delay_minutes"]
+        factors = list(prediction["contributing_factors"])
+
+        if signals["alert_weight"]:
+            p = 1 - (1 - p) * (1 - signals["alert_weight"])
+            minutes += signals["alert_minutes"]
+            factors.append(f"Live: {signals['alerts']} active alert(s) on this line")
+
+        if signals["trips"]:
+            w = LATENESS_MAX_WEIGHT * signals["trips"] / (signals["trips"] + LATENESS_PRIOR_TRIPS)
+            p = (1 - w) * p + w * signals["late_share"]
+            minutes = (1 - w) * minutes + w * signals["mean_lateness_min"]
+            if signals["mean_lateness_min"] >= 1:
+                factors.append(f"Live: trips running {signals['mean_lateness_min']:.1f} min late")
+
+        if signals["gap_severity"]:
+            p = 1 - (1 - p) * (1 - GAP_MAX_BOOST * signals["gap_severity"])
+            minutes += GAP_MAX_MINUTES * signals["gap_severity"]
+            factors.append(f"Live: service gap ({signals['gap_ratio']:.1f}x normal vehicle spacing)")
+
+        return dict(
+            prediction,
+            delay_probability=round(min(0.99, max(0.0, p)), 3),
+            expected_delay_minutes=round(max(0.0, minutes), 1),
+            contributing_factors=factors,
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": LIVE_ADJUSTMENT_ENABLED,
+            "age_s": round(time.time() - self.built_at, 1),
+            "stale": time.time() - self.built_at > MAX_AGE_S,
+            "lines": self.lines,
+        }
+
+
+def build_live_adjuster(
+    vehicles: Optional[VehicleStore],
+    alerts: list,
+    trips: dict,
+    route_names: Optional[dict[str, str]] = None,
+    realized_lateness: Optional[dict[str, list[float]]] = None,
+) -> LiveAdjuster:
+    """Aggregate the poller's latest feeds into per-line signals.
+
+    `trips` is a TripUpdateStore.trips snapshot (trip_id -> TripState).
+    `route_names` maps GTFS route_id -> short name, so lines key the same as
+    prediction requests. `realized_lateness` (line -> recent realized delays,
+    in minutes) stands in for trip-update lateness when the feed carries no
+    delay field. `vehicles` should hold real positions only (or be None) —
+    mock ones would read as random gaps.
+    """
+    route_names = route_names or {}
+
+    def _key(route_id) -> str:
+        return line_key(route_names.get(str(route_id), route_id))
+
+    lines: dict[str, dict] = {}
+
+    def _line(key: str) -> dict:
+        if key not in lines:
+            lines[key] = {
+                "alerts": 0, "alert_weight": 0.0, "alert_minutes": 0.0,
+                "trips": 0, "late_share": 0.0, "mean_lateness_min": 0.0,
+                "vehicles": 0, "gap_ratio": None, "gap_severity": 0.0,
+            }
+        return lines[key]
+
+    for alert in alerts:
+        route_id = getattr(alert, "route_id", None)
+        if not route_id or not getattr(alert, "active", True):
+            continue  # System-wide alerts apply to every route equally
+        signals = _line(_key(route_id))
+        severity = getattr(alert, "severity", "info") or "info"
+        signals["alerts"] += 1
+        # Independent alerts compound; minutes take the worst one
+        signals["alert_weight"] = 1 - (1 - signals["alert_weight"]) * (1 - ALERT_WEIGHTS.get(severity, 0.0))
+        signals["alert_minutes"] = max(signals["alert_minutes"], ALERT_MINUTES.get(severity, 0.0))
+
+    # Per trip, the delay at its next stop (or its last one, once every stop has passed)
+    now = time.time()
+    trip_delays: list[tuple[str, int]] = []
+    for trip in trips.values():
+        timed = [(row[2] or row[3], row[4]) for row in trip.rows if row[4] is not None and (row[2] or row[3])]
+        if trip.route_id and timed:
+            upcoming = [delay for event, delay in timed if event >= now]
+            trip_delays.append((trip.route_id, upcoming[0] if upcoming else timed[-1][1]))
+    lateness: dict[str, list[float]] = {}
+    for route_id, delay in trip_delays:
+        lateness.setdefault(_key(route_id), []).append(delay / 60)
+    for key, delays in (realized_lateness or {}).items():
+        lateness.setdefault(line_key(key), delays)
+
+    for key, delays in lateness.items():
+        signals = _line(key)
+        signals["trips"] = len(delays)
+        signals["late_share"] = round(sum(d > SIGNIFICANT_DELAY_MIN for d in delays) / len(delays), 3)
+        signals["mean_lateness_min"] = round(max(0.0, sum(delays) / len(delays)), 2)
+
+    positions: dict[str, list[tuple[float, float]]] = {}
+    if vehicles is not None:
+        for route_id, points in vehicles.positions_by_route().items():
+            positions.setdefault(_key(route_id), []).extend(points)
+    for key, points in positions.items():
+        ratio = _gap_ratio(points)
+        signals = _line(key)
+        signals["vehicles"] = len(points)
+        if ratio is not None:
+            signals["gap_ratio"] = round(ratio, 2)
+            severity = (ratio - GAP_RATIO_NORMAL) / (GAP_RATIO_SEVERE - GAP_RATIO_NORMAL)
+            signals["gap_severity"] = round(min(1.0, max(0.0, severity)), 2)
+
+    return LiveAdjuster(lines)
+
+
+def _route_names(gtfs: Optional[dict]) -> dict[str, str]:
+    routes = (gtfs or {}).get("routes")
+    if routes is None or routes.empty or "route_short_name" not in routes.columns:
+        return {}
+    return {
+        str(route_id): str(short_name)
+        for route_id, short_name in zip(routes["route_id"], routes["route_short_name"])
+        if short_name == short_name  # Skip NaN
+    }
+
+
+async def refresh_live_adjuster(app_state: dict, real_vehicles: bool) -> None:
+    """Rebuild the live signals from the latest poll (off the event loop) and swap them in."""
+    if not LIVE_ADJUSTMENT_ENABLED:
+        return
+    feedback = app_state.get("delay_feedback")
+    vehicles = app_state.get("vehicles") if real_vehicles else None
+    alerts = app_state.get("alerts", [])
+    store = app_state.get("trip_updates")
+    trips = store.trips if store is not None else {}
+    gtfs = app_state.get("gtfs")
+
+    def _build() -> LiveAdjuster:
+        realized = feedback.recent_line_lateness(LATENESS_WINDOW_S) if feedback is not None else None
+        return build_live_adjuster(vehicles, alerts, trips, _route_names(gtfs), realized)
+
+    adjuster = await asyncio.to_thread(_build)
+    app_state["live_adjuster"] = adjuster
+    logger.debug(f"Live signals refreshed for {len(adjuster.lines)} lines")
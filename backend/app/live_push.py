@@ -0,0 +1,224 @@
+"""Push vehicle and alert deltas to map clients (WebSocket or SSE).
+
+Instead of polling /vehicles and /alerts, a client subscribes with its map
+viewport and receives only what changed after each poll. After every
+vehicle or alert poll that changed app_state, the poller calls
+`LiveHub.publish()`, which diffs the new data against the previous poll:
+- vehicles are grouped by PUSH_CELL_DEG grid cell; each changed cell's delta
+  ({"cell", "upsert", "remove"}) is JSON-encoded once, and a subscriber's
+  frame is the concatenation of the fragments for the cells its viewport
+  covers (cached per cell set, so identical viewports share one string);
+- alerts are one frame for everyone.
+
+Messages (JSON text):
+- {"type": "snapshot", "seq", "vehicles": [...], "alerts": [...]} — on
+  connect, on viewport change and after falling behind;
+- {"type": "vehicles", "seq", "cells": [{"cell", "upsert", "remove"}, ...]}
+  — apply every remove in the frame before its upserts (a vehicle crossing
+  cells is removed from the old one and upserted in the new one);
+- {"type": "alerts", "seq", "upsert": [...], "remove": [ids]}.
+
+Deltas are idempotent (upsert by id, remove by id), so a snapshot that
+already includes a queued delta is harmless. Each subscriber has a bounded
+queue; one that falls QUEUE_SIZE frames behind has it dropped and gets a
+fresh snapshot instead.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Optional
+
+from app.fast_json import dumps_str
+from app.vehicle_store import VehicleStore
+
+logger = logging.getLogger("fluxroute.live_push")
+
+PUSH_CELL_DEG = 0.05  # ~5.5 km; Toronto is ~15 x 10 cells
+QUEUE_SIZE = 8
+MAX_VIEWPORT_CELLS = 2500  # Larger viewports subscribe to everything
+
+SNAPSHOT = object()  # Queue marker: send a fresh snapshot
+
+
+def _cell(lat: float, lon: float) -> tuple[int, int]:
+    return math.floor(lat / PUSH_CELL_DEG), math.floor(lon / PUSH_CELL_DEG)
+
+
+def viewport_cells(bbox: Optional[tuple[float, float, float, float]]) -> Optional[frozenset]:
+    """Cells covered by (west, south, east, north); None means the whole network."""
+    if bbox is None:
+        return None
+    if not all(math.isfinite(v) for v in bbox):
+        raise ValueError("bbox values must be finite numbers")
+    west, south, east, north = bbox
+    (row0, col0), (row1, col1) = _cell(south, west), _cell(north, east)
+    if (row1 - row0 + 1) * (col1 - col0 + 1) > MAX_VIEWPORT_CELLS:
+        return None
+    return frozenset((r, c) for r in range(row0, row1 + 1) for c in range(col0, col1 + 1))
+
+
+class Subscriber:
+    """One connected client: its viewport and outgoing frame queue."""
+
+    def __init__(self, bbox: Optional[tuple[float, float, float, float]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.bbox = bbox
+        self.cells = viewport_cells(bbox)
+        self.dropped = 0
+        self.queue.put_nowait(SNAPSHOT)
+
+    def set_viewport(self, bbox: Optional[tuple[float, float, float, float]]) -> None:
+        self.bbox = bbox
+        self.cells = viewport_cells(bbox)
+        self.resync()
+
+    def resync(self) -> None:
+        """Replace everything queued with one snapshot."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(SNAPSHOT)
+
+    def offer(self, frame: str) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.resync()
+
+
+def _same_row(a: tuple, b: tuple) -> bool:
+    """Row equality treating missing (NaN) bearing/speed as equal."""
+    return all(x == y or (x != x and y != y) for x, y in zip(a, b))
+
+
+def _diff_vehicles(previous: dict, store: VehicleStore) -> tuple[dict, dict[tuple, dict]]:
+    """Rows keyed by vehicle_id for `store`, and per-cell upserts/removes against `previous`."""
+    rows = {}
+    for i, row in enumerate(zip(
+        store.ids.tolist(), store.routes.tolist(), store.lat.tolist(), store.lon.tolist(),
+        store.bearing.tolist(), store.speed.tolist(), store.timestamp.tolist(),
+    )):
+        rows[row[0]] = (i, row)
+
+    changed, moved_from = [], {}
+    for vid, (i, row) in rows.items():
+        old = previous.get(vid)
+        if old is not None and _same_row(old[1], row):
+            continue
+        changed.append(i)
+        if old is not None:
+            moved_from[vid] = _cell(old[1][2], old[1][3])
+
+    cells: dict[tuple, dict] = {}
+    for vehicle in store.to_dicts(changed) if changed else []:
+        cell = _cell(vehicle["latitude"], vehicle["longitude"])
+        cells.setdefault(cell, {"upsert": [], "remove": []})["upsert"].append(vehicle)
+        old_cell = moved_from.get(vehicle["vehicle_id"])
+        if old_cell is not None and old_cell != cell:
+            cells.setdefault(old_cell, {"upsert": [], "remove": []})["remove"].append(vehicle["vehicle_id"])
+    for vid, (_i, row) in previous.items():
+        if vid not in rows:
+            cells.setdefault(_cell(row[2], row[3]), {"upsert": [], "remove": []})["remove"].append(vid)
+    return rows, cells
+
+
+class LiveHub:
+    """Diffs each poll against the last one and fans deltas out to subscribers."""
+
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+        self.seq = 0
+        self.store = VehicleStore.empty()
+        self._rows: dict = {}
+        self._alerts: dict[str, dict] = {}
+        self.frames_sent = 0
+        self.frames_encoded = 0
+
+    def subscribe(self, bbox: Optional[tuple[float, float, float, float]] = None) -> Subscriber:
+        sub = Subscriber(bbox)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def snapshot_frame(self, sub: Subscriber) -> str:
+        """Full state for one viewport, from the same baseline the deltas build on."""
+        store = self.store
+        vehicles = store.to_dicts(store.query(sub.bbox)) if sub.cells is not None else store.to_dicts()
+        return dumps_str({
+            "type": "snapshot", "seq": self.seq,
+            "vehicles": vehicles, "alerts": list(self._alerts.values()),
+        })
+
+    async def publish(self, feed: str, app_state: dict) -> None:
+        """Diff the feed's new state in app_state against the last poll and push the delta."""
+        if feed == "vehicles":
+            store = app_state.get("vehicles")
+            if store is not None:
+                await self._publish_vehicles(store)
+        elif feed == "alerts":
+            self._publish_alerts(app_state.get("alerts", []))
+
+    async def _publish_vehicles(self, store: VehicleStore) -> None:
+        def _build():
+            rows, cells = _diff_vehicles(self._rows, store)
+            # Each changed cell is encoded once, whatever the subscriber count
+            fragments = {
+                cell: dumps_str({"cell": list(cell), **delta}) for cell, delta in cells.items()
+            }
+            return rows, fragments
+
+        rows, fragments = await asyncio.to_thread(_build)
+        self.store, self._rows = store, rows
+        self.seq += 1
+        if not fragments or not self.subscribers:
+            return
+        self.frames_encoded += len(fragments)
+
+        head = f'{{"type":"vehicles","seq":{self.seq},"cells":['
+        frames: dict[Optional[frozenset], Optional[str]] = {}
+        for sub in list(self.subscribers):
+            if sub.cells not in frames:
+                keys = fragments.keys() if sub.cells is None else sub.cells & fragments.keys()
+                frames[sub.cells] = head + ",".join(fragments[k] for k in keys) + "]}" if keys else None
+            frame = frames[sub.cells]
+            if frame is not None:
+                sub.offer(frame)
+                self.frames_sent += 1
+
+    def _publish_alerts(self, alerts: list) -> None:
+        current = {
+            a.id: a.model_dump() if hasattr(a, "model_dump") else a
+            for a in alerts
+        }
+        upsert = [a for aid, a in current.items() if self._alerts.get(aid) != a]
+        remove = [aid for aid in self._alerts if aid not in current]
+        self._alerts = current
+        self.seq += 1
+        if not (upsert or remove) or not self.subscribers:
+            return
+
+        frame = dumps_str({"type": "alerts", "seq": self.seq, "upsert": upsert, "remove": remove})
+        self.frames_encoded += 1
+        for sub in list(self.subscribers):
+            sub.offer(frame)
+            self.frames_sent += 1
+
+    async def messages(self, sub: Subscriber):
+        """Yield the subscriber's outgoing frames (snapshots built on demand)."""
+        while True:
+            item = await sub.queue.get()
+            yield self.snapshot_frame(sub) if item is SNAPSHOT else item
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "seq": self.seq,
+            "vehicles": len(self._rows),
+            "alerts": len(self._alerts),
+            "frames_encoded": self.frames_encoded,
+            "frames_sent": self.frames_sent,
+            "resyncs": sum(sub.dropped for sub in self.subscribers),
+        }
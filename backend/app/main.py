@@ -1,8 +1,8 @@
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 
-import httpx
 from dotenv import load_dotenv
 
 load_dotenv()  # Load .env before any other imports that read env vars
@@ -10,6 +10,8 @@ load_dotenv()  # Load .env before any other imports that read env vars
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.fast_json import FastJSONResponse
+
 logger = logging.getLogger("fluxroute")
 logging.basicConfig(level=logging.INFO)
 
@@ -17,85 +19,145 @@ logging.basicConfig(level=logging.INFO)
 app_state: dict = {}
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Load data, ML model, and start real-time poller on startup."""
-    mapbox_token = os.getenv("MAPBOX_TOKEN", "")
-    if not mapbox_token or mapbox_token == "your-mapbox-token-here":
-        logger.warning(
-            "MAPBOX_TOKEN is missing or placeholder in backend/.env — "
-            "driving/walking routes will use straight-line fallback. "
-            "Copy backend/.env.example to backend/.env and add your "
-            "Mapbox token for road-following routes."
-        )
-
-    from app.gtfs_parser import load_gtfs_data
+def _load_predictor():
     from app.ml_predictor import DelayPredictor
-    from app.gtfs_realtime import start_realtime_poller, stop_realtime_poller
-
-    logger.info("Loading GTFS data...")
-    gtfs = load_gtfs_data()
-    app_state["gtfs"] = gtfs
-    logger.info(f"GTFS loaded: {len(gtfs.get('stops', []))} stops")
 
-    logger.info("Loading ML model...")
     predictor = DelayPredictor()
     predictor.load()
+    return predictor
+
+
+async def _warm_predictor():
+    """Load the ML model off the event loop, then hot-swap it in."""
+    logger.info("Loading ML model in the background (heuristic predictions until ready)...")
+    try:
+        predictor = await asyncio.to_thread(_load_predictor)
+    except Exception as e:
+        logger.error(f"ML model load failed: {e}")
+        app_state["components"]["ml_model"] = "heuristic"
+        return
     app_state["predictor"] = predictor
+    app_state["components"]["ml_model"] = "ready" if predictor.mode == "ml" else "heuristic"
     logger.info(f"ML predictor mode: {predictor.mode}")
 
-    # Check OTP availability
-    from app.otp_client import check_otp_health
-    otp_available = await check_otp_health()
-    app_state["otp_available"] = otp_available
-    if otp_available:
-        logger.info("OpenTripPlanner is available — using OTP for transit routing")
-    else:
-        logger.info("OpenTripPlanner not available — using heuristic transit routing (fallback)")
 
-    # Shared httpx client for connection pooling across all API calls
-    # Force IPv4 via custom transport — IPv6 to Mapbox/CloudFront can timeout
-    transport = httpx.AsyncHTTPTransport(
-        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
-        local_address="0.0.0.0",
-    )
-    http_client = httpx.AsyncClient(
-        timeout=12.0,
-        transport=transport,
-    )
-    app_state["http_client"] = http_client
-    logger.info("Shared HTTP client created (IPv4, connection pooling enabled)")
+async def _warm_gtfs_and_overlay(http_client):
+    """Parse GTFS off the event loop, then build the transit line overlay from it."""
+    from app.gtfs_parser import load_gtfs_data
+    from app.transit_lines import fetch_transit_lines
+
+    logger.info("Loading GTFS data in the background...")
+    try:
+        gtfs = await asyncio.to_thread(load_gtfs_data)
+    except Exception as e:
+        logger.error(f"GTFS load failed: {e}")
+        app_state["components"]["gtfs"] = "failed"
+        app_state["components"]["transit_lines"] = "failed"
+        return
+    app_state["gtfs"] = gtfs
+    app_state["components"]["gtfs"] = "ready"
+    logger.info(f"GTFS loaded: {len(gtfs.get('stops', []))} stops")
 
     # Load transit line geometries + stations for always-visible overlay
-    from app.transit_lines import fetch_transit_lines
     logger.info("Loading transit line overlay...")
-    transit_data = await fetch_transit_lines(
-        gtfs, http_client
-    )
+    try:
+        transit_data = await fetch_transit_lines(gtfs, http_client)
+    except Exception as e:
+        logger.error(f"Transit overlay load failed: {e}")
+        app_state["components"]["transit_lines"] = "failed"
+        return
     app_state["transit_lines"] = transit_data
+    app_state["components"]["transit_lines"] = "ready"
     line_count = len(transit_data.get("lines", {}).get("features", []))
     station_count = len(transit_data.get("stations", {}).get("features", []))
     logger.info(f"Transit overlay loaded: {line_count} lines, {station_count} stations")
 
+
+async def _warm_otp(http_client):
+    """Check OTP availability; routing uses the heuristic fallback until then."""
+    from app.otp_client import check_otp_health
+
+    otp_available = await check_otp_health(http_client)
+    app_state["otp_available"] = otp_available
+    app_state["components"]["otp"] = "ready" if otp_available else "unavailable"
+    if otp_available:
+        logger.info("OpenTripPlanner is available — using OTP for transit routing")
+    else:
+        logger.info("OpenTripPlanner not available — using heuristic transit routing (fallback)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the real-time poller and warm up data + ML model in the background."""
+    mapbox_token = os.getenv("MAPBOX_TOKEN", "")
+    if not mapbox_token or mapbox_token == "your-mapbox-token-here":
+        logger.warning(
+            "MAPBOX_TOKEN is missing or placeholder in backend/.env — "
+            "driving/walking routes will use straight-line fallback. "
+            "Copy backend/.env.example to backend/.env and add your "
+            "Mapbox token for road-following routes."
+        )
+
+    from app.ml_predictor import DelayPredictor
+    from app.gtfs_realtime import start_realtime_poller, stop_realtime_poller
+
+    # Serve immediately: heuristic predictor until the ML model is loaded,
+    # GTFS + transit overlay + OTP check warm up in the background.
+    app_state["components"] = {
+        "gtfs": "loading",
+        "transit_lines": "loading",
+        "ml_model": "loading",
+        "otp": "loading",
+    }
+    app_state["predictor"] = DelayPredictor()
+
+    # Shared httpx client: one connection pool per upstream (limits, keep-alive,
+    # HTTP/2 where available), forced to IPv4 — see app/upstream.py
+    from app.upstream import close_http_client, get_http_client
+    http_client = get_http_client()
+    app_state["http_client"] = http_client
+
     # Initialize navigation session manager
     from app.navigation_service import NavigationSessionManager
     nav_manager = NavigationSessionManager()
     app_state["nav_manager"] = nav_manager
     logger.info("Navigation session manager initialized")
 
+    # Realized delays from trip updates, for rolling model calibration
+    from app.delay_feedback import DelayFeedback
+    delay_feedback = DelayFeedback(app_state)
+    app_state["delay_feedback"] = delay_feedback
+    feedback_task = asyncio.create_task(delay_feedback.run())
+
+    # Vehicle/alert deltas pushed to map clients after each poll
+    from app.live_push import LiveHub
+    app_state["live_hub"] = LiveHub()
+
     logger.info("Starting real-time poller...")
     poller_task = await start_realtime_poller(app_state)
     app_state["poller_task"] = poller_task
 
+    warmup_tasks = [
+        asyncio.create_task(_warm_predictor()),
+        asyncio.create_task(_warm_gtfs_and_overlay(http_client)),
+        asyncio.create_task(_warm_otp(http_client)),
+    ]
+
     yield
 
     logger.info("Shutting down...")
+    for task in warmup_tasks:
+        task.cancel()
     await stop_realtime_poller(app_state)
-    await http_client.aclose()
+    feedback_task.cancel()
+    await close_http_client()
     logger.info("Shared HTTP client closed")
 
 
-app = FastAPI(title="FluxRoute API", version="0.1.0", lifespan=lifespan)
+# Dict-returning endpoints render through orjson too (see app/fast_json.py)
+app = FastAPI(
+    title="FluxRoute API", version="0.1.0", lifespan=lifespan, default_response_class=FastJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,6 +11,7 @@ from typing import Optional
 import httpx
 
 from app.models import Coordinate, NavigationInstruction
+from app.upstream import get_http_client, hedged_get
 
 logger = logging.getLogger("fluxroute.mapbox_nav")
 
@@ -79,11 +80,8 @@ async def get_navigation_directions(
     url = f"{MAPBOX_BASE}/directions/v5/mapbox/{profile}/{coords_str}"
 
     try:
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=15.0)
-        else:
-            async with httpx.AsyncClient(timeout=15.0, transport=httpx.AsyncHTTPTransport(local_address="0.0.0.0")) as client:
-                resp = await client.get(url, params=params)
+        client = http_client or get_http_client()
+        resp = await hedged_get(client, url, endpoint="mapbox.navigation", params=params, timeout=15.0)
 
         resp.raise_for_status()
         data = resp.json()
@@ -250,11 +248,8 @@ async def get_optimized_route(
     }
 
     try:
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=15.0)
-        else:
-            async with httpx.AsyncClient(timeout=15.0, transport=httpx.AsyncHTTPTransport(local_address="0.0.0.0")) as client:
-                resp = await client.get(url, params=params)
+        client = http_client or get_http_client()
+        resp = await client.get(url, params=params, timeout=15.0)
 
         resp.raise_for_status()
         data = resp.json()
@@ -313,11 +308,8 @@ async def get_isochrone(
     }
 
     try:
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=15.0)
-        else:
-            async with httpx.AsyncClient(timeout=15.0, transport=httpx.AsyncHTTPTransport(local_address="0.0.0.0")) as client:
-                resp = await client.get(url, params=params)
+        client = http_client or get_http_client()
+        resp = await client.get(url, params=params, timeout=15.0)
 
         resp.raise_for_status()
         data = resp.json()
@@ -362,11 +354,8 @@ async def map_match(
     }
 
     try:
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=15.0)
-        else:
-            async with httpx.AsyncClient(timeout=15.0, transport=httpx.AsyncHTTPTransport(local_address="0.0.0.0")) as client:
-                resp = await client.get(url, params=params)
+        client = http_client or get_http_client()
+        resp = await client.get(url, params=params, timeout=15.0)
 
         resp.raise_for_status()
         data = resp.json()
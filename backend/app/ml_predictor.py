@@ -1,14 +1,28 @@
 import logging
 import os
+import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional
 
-import joblib
-
 logger = logging.getLogger("fluxroute.ml")
 
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml", "delay_model.joblib")
 
+# Which trained model to serve: "auto" prefers the compact NumPy export
+# (ml/delay_model_compact.npz) when it is at least as new as the joblib pickle
+MODEL_BACKEND = os.getenv("DELAY_MODEL_BACKEND", "auto").lower()
+
+# Model outputs for rows the lookup table can't serve (station/bound set, bus
+# and streetcar lines, off-grid weather), LRU-cached per feature key
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+
+# Weather is snapped to these steps (temperature °C, precipitation mm,
+# snowfall cm, wind km/h) before cached rows are evaluated, so every request
+# in a bucket gets the same prediction
+WEATHER_BUCKETS = (1.0, 0.5, 0.5, 5.0)
+
 # Line name normalization mapping
 LINE_MAP = {
     "line 1": "1", "yu": "1", "yonge": "1", "yonge-university": "1", "line1": "1", "1": "1",
@@ -21,6 +35,26 @@ LINE_MAP = {
 # Transit mode encoding (must match feature_engineering.py)
 MODE_MAP = {"subway": 1, "bus": 2, "streetcar": 3, "lrt": 1}
 
+# Delay-log labels for each normalized subway/LRT line, tried against the
+# trained line encoder in order
+LINE_LABELS = {
+    "1": ("YU", "1", "LINE 1"),
+    "2": ("BD", "2", "LINE 2"),
+    "4": ("SHP", "4", "LINE 4"),
+    "5": ("5", "LINE 5"),
+    "6": ("6", "LINE 6"),
+}
+
+# Must match feature_engineering.station_key
+_STATION_NOISE = {"STATION", "STN", "STATIO", "YUS", "YU", "BD", "BDS", "SHP", "SRT"}
+
+
+def _station_key(name: str) -> str:
+    """Normalize a station name ("St George Station" / "ST GEORGE YUS STATION" -> "ST GEORGE")."""
+    s = re.sub(r"\(.*?\)", " ", str(name).upper())
+    tokens = re.sub(r"[^A-Z0-9]+", " ", s).split()
+    return " ".join(t for t in tokens if t not in _STATION_NOISE)
+
 
 def _get_season(month: int) -> int:
     """Map month to season: 1=Winter, 2=Spring, 3=Summer, 4=Fall."""
@@ -38,24 +72,73 @@ class DelayPredictor:
         self.classifier = None
         self.regressor = None
         self.feature_cols = None
+        self.encoders = {}  # line/station/bound label → code maps saved with the model
+        self.table = None  # PredictionTable, built from the model in load()
+        self.table_line_codes = {}  # Normalized line → line encoding the table was built with
+        self._output_cache: OrderedDict[tuple, tuple[float, float]] = OrderedDict()
+        self._cache_lock = threading.Lock()  # predict_batch runs in worker threads
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.mode = "heuristic"
+        self.backend = None  # "compact" or "xgboost" once a model is loaded
+        self.model_path = None
 
     def load(self):
         """Try to load trained model, fall back to heuristic."""
         try:
-            if os.path.exists(MODEL_PATH):
-                model_data = joblib.load(MODEL_PATH)
+            model_data, self.backend, self.model_path = self._read_model()
+            if model_data:
                 self.classifier = model_data.get("classifier")
                 self.regressor = model_data.get("regressor")
                 self.feature_cols = model_data.get("feature_cols", [])
+                self.encoders = model_data.get("encoders") or {}
                 self.mode = "ml"
-                logger.info(f"ML model loaded successfully ({len(self.feature_cols)} features)")
+                logger.info(
+                    f"ML model loaded successfully ({len(self.feature_cols)} features, "
+                    f"{self.backend} backend)"
+                )
+                self._load_table()
             else:
                 logger.info("No ML model found, using heuristic mode")
         except Exception as e:
             logger.warning(f"Failed to load ML model: {e}. Using heuristic mode")
             self.mode = "heuristic"
 
+    def _read_model(self) -> tuple[Optional[dict], Optional[str], Optional[str]]:
+        """Return (model_data, backend, path) for the model to serve, or Nones."""
+        from app.compact_model import COMPACT_MODEL_PATH, load_compact_model
+
+        has_compact = os.path.exists(COMPACT_MODEL_PATH)
+        has_joblib = os.path.exists(MODEL_PATH)
+        compact_fresh = has_compact and (
+            not has_joblib or os.path.getmtime(COMPACT_MODEL_PATH) >= os.path.getmtime(MODEL_PATH)
+        )
+
+        if MODEL_BACKEND == "compact" or (MODEL_BACKEND == "auto" and compact_fresh):
+            if has_compact:
+                return load_compact_model(COMPACT_MODEL_PATH), "compact", COMPACT_MODEL_PATH
+        if has_joblib and MODEL_BACKEND != "compact":
+            import joblib  # Pulls in scikit-learn + XGBoost via the pickle
+
+            return joblib.load(MODEL_PATH), "xgboost", MODEL_PATH
+        return None, None, None
+
+    def _load_table(self):
+        """Precompute (or load the cached) prediction lookup table for the model."""
+        from app.prediction_table import LINES, TABLE_ENABLED, PredictionTable
+
+        if not TABLE_ENABLED:
+            return
+        try:
+            self.table_line_codes = {line: self._line_code(line, line, 1) for line in LINES}
+            self.table = PredictionTable.load_or_build(
+                self.model_path, self._feature_matrix, self.classifier, self.regressor,
+                self.table_line_codes,
+            )
+        except Exception as e:
+            logger.warning(f"Prediction table unavailable ({e}); using the model directly")
+            self.table = None
+
     def predict(
         self,
         line: str,
@@ -68,10 +151,62 @@ class DelayPredictor:
         snowfall: Optional[float] = None,
         wind_speed: Optional[float] = None,
         mode: Optional[str] = None,
+        bound: Optional[str] = None,
         # Backward compat
         is_adverse_weather: Optional[bool] = None,
     ) -> dict:
-        """Predict delay probability and expected duration."""
+        """Predict delay probability and expected duration.
+
+        `station` (a stop name) and `bound` ("N"/"S"/"E"/"W") are encoded with
+        the encoders trained alongside the model; unknown stations fall into
+        the same "other" bucket the model was trained with.
+        """
+        return self.predict_batch([dict(
+            line=line, station=station, hour=hour, day_of_week=day_of_week, month=month,
+            temperature=temperature, precipitation=precipitation, snowfall=snowfall,
+            wind_speed=wind_speed, mode=mode, bound=bound, is_adverse_weather=is_adverse_weather,
+        )])[0]
+
+    def predict_batch(self, requests: list[dict]) -> list[dict]:
+        """Predict for many inputs at once.
+
+        Each dict takes the same keyword arguments as `predict()`. In ML mode all
+        rows go through the classifier and regressor in a single call each.
+        """
+        if not requests:
+            return []
+
+        rows = [self._normalize_inputs(**r) for r in requests]
+
+        if self.mode == "ml" and self.classifier is not None:
+            return self._ml_predict_batch(rows)
+
+        return [
+            self._heuristic_predict(
+                line, hour, day_of_week, month,
+                temperature, precipitation, snowfall, wind_speed,
+                station,
+            )
+            for (line, hour, day_of_week, month, temperature, precipitation,
+                 snowfall, wind_speed, _mode_encoded, station, *_codes) in rows
+        ]
+
+    def _normalize_inputs(
+        self,
+        line: str,
+        station: Optional[str] = None,
+        hour: Optional[int] = None,
+        day_of_week: Optional[int] = None,
+        month: Optional[int] = None,
+        temperature: Optional[float] = None,
+        precipitation: Optional[float] = None,
+        snowfall: Optional[float] = None,
+        wind_speed: Optional[float] = None,
+        mode: Optional[str] = None,
+        bound: Optional[str] = None,
+        is_adverse_weather: Optional[bool] = None,
+    ) -> tuple:
+        """Fill defaults and encode line/mode/station/bound; returns a positional feature tuple."""
         now = datetime.now()
         hour = hour if hour is not None else now.hour
         day_of_week = day_of_week if day_of_week is not None else now.weekday()
@@ -98,32 +233,67 @@ class DelayPredictor:
         normalized_line = LINE_MAP.get(line.lower().strip(), "1")
         mode_encoded = MODE_MAP.get((mode or "subway").lower().strip(), 1)
 
-        if self.mode == "ml" and self.classifier is not None:
-            return self._ml_predict(
-                normalized_line, hour, day_of_week, month,
-                temperature, precipitation, snowfall, wind_speed,
-                mode_encoded,
-            )
+        station_map = self.encoders.get("station") or {}
+        bound_map = self.encoders.get("bound") or {}
+        station_encoded = station_map.get(_station_key(station), 0) if station else 0
+        bound_encoded = bound_map.get(bound.strip().upper()[:1], 0) if bound else 0
 
-        return self._heuristic_predict(
+        return (
             normalized_line, hour, day_of_week, month,
             temperature, precipitation, snowfall, wind_speed,
-            station,
+            mode_encoded, station,
+            self._line_code(line, normalized_line, mode_encoded), station_encoded, bound_encoded,
         )
 
-    def _ml_predict(
-        self, line: str, hour: int, day_of_week: int, month: int,
-        temperature: float, precipitation: float, snowfall: float, wind_speed: float,
-        mode_encoded: int = 1,
-    ) -> dict:
-        """Use trained XGBoost model for prediction."""
+    def _line_code(self, line: str, normalized_line: str, mode_encoded: int) -> int:
+        """The model's line encoding for a request.
+
+        Models saved without encoders were fed the bare line number. Otherwise
+        subway requests try the delay-log labels for their line first; bus and
+        streetcar requests try their own route number first.
+        """
+        line_map = self.encoders.get("line")
+        if not line_map:
+            return int(normalized_line) if normalized_line.isdigit() else 1
+
+        raw = line.strip().upper()
+        aliases = LINE_LABELS.get(normalized_line, ())
+        for label in ((*aliases, raw) if mode_encoded == 1 else (raw, *aliases)):
+            if label in line_map:
+                return line_map[label]
+        return 0
+
+    def _feature_matrix(
+        self, line_encoded, hour, day_of_week, month,
+        temperature, precipitation, snowfall, wind_speed,
+        mode_encoded=1, station_encoded=0, bound_encoded=0, min_gap=None,
+    ):
+        """Build model input rows, in the exact column order the model expects.
+
+        Arguments are scalars or equal-length arrays (one entry per row).
+        Incident code stays 0 ("other"); min_gap defaults to the station's
+        median gap from training.
+        """
         import numpy as np
 
-        is_rush = 1 if (7 <= hour <= 9 or 17 <= hour <= 19) else 0
-        is_weekend = 1 if day_of_week >= 5 else 0
-        season = _get_season(month)
+        hour = np.asarray(hour)
+        day_of_week = np.asarray(day_of_week)
+        month = np.asarray(month)
+        station_encoded = np.asarray(station_encoded)
+        season_by_month = np.array([_get_season(m) for m in range(13)])
+        n_rows = max(np.size(a) for a in (
+            line_encoded, hour, day_of_week, month,
+            temperature, precipitation, snowfall, wind_speed, mode_encoded,
+            station_encoded, bound_encoded,
+        ))
+
+        if min_gap is None:
+            gaps = self.encoders.get("min_gap_by_station")
+            min_gap = (
+                np.asarray(gaps, dtype=np.float32)[np.clip(station_encoded, 0, len(gaps) - 1)]
+                if gaps else 0
+            )
 
-        # Build feature vector matching training order
         # Full set: hour, day_of_week, month, season, is_rush_hour, is_weekend,
         #           line_encoded, station_encoded, bound_encoded, code_encoded, min_gap,
         #           temperature_mean, precipitation_sum, snowfall_sum, wind_speed_max
@@ -131,47 +301,110 @@ class DelayPredictor:
             "hour": hour,
             "day_of_week": day_of_week,
             "month": month,
-            "season": season,
-            "is_rush_hour": is_rush,
-            "is_weekend": is_weekend,
+            "season": season_by_month[np.clip(month, 0, 12)],
+            "is_rush_hour": ((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 19)),
+            "is_weekend": day_of_week >= 5,
             "mode_encoded": mode_encoded,
-            "line_encoded": int(line) if line.isdigit() else 1,
-            "station_encoded": 0,
-            "bound_encoded": 0,
+            "line_encoded": line_encoded,
+            "station_encoded": station_encoded,
+            "bound_encoded": bound_encoded,
             "code_encoded": 0,
-            "min_gap": 0,
+            "min_gap": min_gap,
             "temperature_mean": temperature,
             "precipitation_sum": precipitation,
             "snowfall_sum": snowfall,
             "wind_speed_max": wind_speed,
         }
 
-        # Build feature vector in the exact order the model expects
-        feature_vector = []
-        for col in self.feature_cols:
-            feature_vector.append(all_features.get(col, 0))
+        matrix = np.empty((n_rows, len(self.feature_cols)), dtype=np.float32)
+        for j, col in enumerate(self.feature_cols):
+            matrix[:, j] = all_features.get(col, 0)
+        return matrix
 
-        features = np.array([feature_vector])
+    def _ml_predict_batch(self, rows: list[tuple]) -> list[dict]:
+        """Use trained XGBoost model for prediction.
+
+        Station-less rows on a line the lookup table covers are served from
+        it. The rest are served from the output cache, keyed by their encoded
+        features with weather bucketed; cache misses go through the classifier
+        and regressor in one call each.
+        """
+        import numpy as np
 
         try:
-            prob = float(self.classifier.predict_proba(features)[0][1])
-            expected_min = float(self.regressor.predict(features)[0])
-            expected_min = max(0, expected_min)
-
-            factors = self._get_factors(line, hour, day_of_week, month, temperature, precipitation, snowfall, wind_speed)
-
-            return {
-                "delay_probability": round(prob, 3),
-                "expected_delay_minutes": round(expected_min, 1),
-                "confidence": 0.85,
-                "contributing_factors": factors,
-            }
+            outputs: list = [None] * len(rows)
+            if self.table is not None:
+                for i, row in enumerate(rows):
+                    line_encoded, station_encoded, bound_encoded = row[10:13]
+                    if station_encoded == 0 and bound_encoded == 0 and self.table_line_codes.get(row[0]) == line_encoded:
+                        outputs[i] = self.table.lookup(*row[:9])
+
+            keys = {i: self._cache_key(row) for i, row in enumerate(rows) if outputs[i] is None}
+            missing: dict[tuple, list[int]] = {}
+            with self._cache_lock:
+                for i, key in keys.items():
+                    cached = self._output_cache.get(key)
+                    if cached is None:
+                        missing.setdefault(key, []).append(i)
+                    else:
+                        self._output_cache.move_to_end(key)
+                        outputs[i] = cached
+                self.cache_hits += len(keys) - sum(len(idx) for idx in missing.values())
+                self.cache_misses += len(missing)
+
+            if missing:
+                # Key layout: line, station, bound, hour, dow, month, mode, *weather
+                cols = [np.array(c) for c in zip(*missing)]
+                features = self._feature_matrix(
+                    cols[0], *cols[3:6], *cols[7:11],
+                    mode_encoded=cols[6],
+                    station_encoded=cols[1],
+                    bound_encoded=cols[2],
+                )
+                probs = self.classifier.predict_proba(features)[:, 1]
+                expected = self.regressor.predict(features)
+                with self._cache_lock:
+                    for (key, idx), prob, expected_min in zip(missing.items(), probs, expected):
+                        out = (float(prob), float(expected_min))
+                        self._output_cache[key] = out
+                        for i in idx:
+                            outputs[i] = out
+                    while len(self._output_cache) > PREDICTION_CACHE_SIZE:
+                        self._output_cache.popitem(last=False)
+
+            results = []
+            for row, (prob, expected_min) in zip(rows, outputs):
+                factors = self._get_factors(*row[:8])
+                if row[11]:
+                    factors.append(f"Station: {row[9]}")
+                results.append({
+                    "delay_probability": round(prob, 3),
+                    "expected_delay_minutes": round(max(0.0, expected_min), 1),
+                    "confidence": 0.85,
+                    "contributing_factors": factors,
+                })
+            return results
         except Exception as e:
             logger.warning(f"ML prediction failed: {e}, falling back to heuristic")
-            return self._heuristic_predict(
-                line, hour, day_of_week, month,
-                temperature, precipitation, snowfall, wind_speed,
-            )
+            return [self._heuristic_predict(*row[:8]) for row in rows]
+
+    @staticmethod
+    def _cache_key(row: tuple) -> tuple:
+        """Output-cache key for a normalized row: encoded features plus bucketed weather."""
+        weather = tuple(round(value / step) * step for value, step in zip(row[4:8], WEATHER_BUCKETS))
+        return (row[10], row[11], row[12], *row[1:4], row[8], *weather)
+
+    def clear_output_cache(self) -> None:
+        with self._cache_lock:
+            self._output_cache.clear()
+
+    def cache_stats(self) -> dict:
+        return {
+            "table_error": self.table.error if self.table is not None else None,
+            "entries": len(self._output_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+        }
 
     def _heuristic_predict(
         self,
@@ -305,3 +538,60 @@ class DelayPredictor:
             factors.append(f"Wind: {wind_speed:.0f}km/h")
 
         return factors
+
+
+class PredictionBatch:
+    """Defers delay predictions for a set of routes into one model call.
+
+    Route builders create their RouteOption with an empty DelayInfo and register
+    it with `add()`, listing one predict() request per line the route rides.
+    `flush()` runs every pending request through `predict_batch` and writes
+    each route's worst (highest-probability) prediction plus the stress score
+    derived from it: `stress_base + probability * stress_weight`, capped at 1.
+
+    With a `live` adjuster (app.live_adjustment), each prediction is blended
+    with its line's live signals before the worst one is picked.
+    """
+
+    def __init__(self, predictor: DelayPredictor, live=None):
+        self.predictor = predictor
+        self.live = live
+        self._pending: list[tuple] = []
+
+    def add(self, route, requests: list[dict], stress_base: float, stress_weight: float) -> None:
+        if requests:
+            self._pending.append((route, requests, stress_base, stress_weight))
+
+    def flush(self, routes: Optional[list] = None) -> None:
+        """Predict pending routes — all of them, or only those in `routes`."""
+        if routes is None:
+            batch, self._pending = self._pending, []
+        else:
+            wanted = {id(r) for r in routes}
+            batch = [p for p in self._pending if id(p[0]) in wanted]
+            self._pending = [p for p in self._pending if id(p[0]) not in wanted]
+        if not batch:
+            return
+
+        from app.models import DelayInfo
+
+        requests = [req for _, reqs, _, _ in batch for req in reqs]
+        try:
+            predictions = self.predictor.predict_batch(requests)
+        except Exception as e:
+            logger.warning(f"Batched delay prediction failed for {len(requests)} requests: {e}")
+            return
+        if self.live is not None:
+            predictions = [self.live.adjust(req["line"], pred) for req, pred in zip(requests, predictions)]
+
+        i = 0
+        for route, reqs, stress_base, stress_weight in batch:
+            worst = max(predictions[i:i + len(reqs)], key=lambda p: p["delay_probability"])
+            i += len(reqs)
+            route.delay_info = DelayInfo(
+                probability=worst["delay_probability"],
+                expected_minutes=worst["expected_delay_minutes"],
+                confidence=worst["confidence"],
+                factors=worst["contributing_factors"],
+            )
+            route.stress_score = round(min(1.0, stress_base + worst["delay_probability"] * stress_weight), 2)
@@ -14,6 +14,12 @@ class RouteMode(str, Enum):
     HYBRID = "hybrid"
 
 
+class GeometryFormat(str, Enum):
+    GEOJSON = "geojson"  # {"type": "LineString", "coordinates": [[lng, lat], ...]}
+    POLYLINE6 = "polyline6"  # {"type": "LineString", "encoding": "polyline6", "polyline": "..."}
+    QUANTIZED = "quantized"  # {"type": "LineString", "encoding": "quantized", "scale": 100000, "deltas": [x0, y0, dx, dy, ...]}
+
+
 class Coordinate(BaseModel):
     lat: float
     lng: float
@@ -99,12 +105,16 @@ class RouteRequest(BaseModel):
         ]
     )
     departure_time: Optional[str] = None
+    deadline_s: Optional[float] = Field(default=None, gt=0, le=30)  # Overall time budget; server default if unset
+    geometry_format: GeometryFormat = GeometryFormat.GEOJSON  # Encoding of segment geometries
+    simplify_zoom: Optional[float] = Field(default=None, ge=0, le=22)  # Drop vertices under ~1 px at this map zoom
 
 
 class RouteResponse(BaseModel):
     routes: list[RouteOption]
     origin: Coordinate
     destination: Coordinate
+    degraded: list[str] = Field(default_factory=list)  # Stages skipped/cut short by the deadline, e.g. "mapbox:walking"
 
 
 class DelayPredictionRequest(BaseModel):
@@ -8,6 +8,7 @@ from typing import Optional
 
 import httpx
 
+from app.deadline import Deadline, should_skip, timeout_for
 from app.models import (
     Coordinate,
     CostBreakdown,
@@ -16,6 +17,7 @@ from app.models import (
     RouteOption,
     RouteSegment,
 )
+from app.upstream import get_http_client, hedged_get
 
 logger = logging.getLogger("fluxroute.otp")
 
@@ -69,12 +71,17 @@ async def find_park_and_ride_stations(
     lng: float,
     radius_km: float = 15.0,
     http_client: Optional[httpx.AsyncClient] = None,
+    deadline: Optional[Deadline] = None,
 ) -> list[dict]:
     """Find subway/rail stations near a point using the OTP index API.
 
     Returns a list of dicts with stop_id, name, lat, lng, mode, agencyName.
     """
+    if should_skip(deadline, "otp-stations"):
+        return []
+
     base = _get_otp_url()
+    timeout = timeout_for(deadline, 5.0)
     # OTP index API uses bounding box — convert radius to approx degrees
     delta_lat = radius_km / 111.0
     delta_lng = radius_km / (111.0 * 0.7)  # cos(~43.7°) ≈ 0.72
@@ -88,11 +95,8 @@ async def find_park_and_ride_stations(
 
     try:
         url = f"{base}/otp/routers/default/index/stops"
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=5.0)
-        else:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(url, params=params)
+        client = http_client or get_http_client()
+        resp = await hedged_get(client, url, endpoint="otp.stops", params=params, timeout=timeout)
         resp.raise_for_status()
         stops = resp.json()
     except Exception as e:
@@ -147,13 +151,9 @@ async def check_otp_health(http_client: Optional[httpx.AsyncClient] = None) -> b
     """Check if OTP server is available."""
     base = _get_otp_url()
     try:
-        if http_client:
-            resp = await http_client.get(f"{base}/otp/routers/default/", timeout=3.0)
-            return resp.status_code == 200
-        else:
-            async with httpx.AsyncClient(timeout=3.0) as client:
-                resp = await client.get(f"{base}/otp/routers/default/")
-                return resp.status_code == 200
+        client = http_client or get_http_client()
+        resp = await client.get(f"{base}/otp/routers/default/", timeout=3.0)
+        return resp.status_code == 200
     except Exception:
         return False
 
@@ -164,12 +164,18 @@ async def query_otp_routes(
     departure_time: Optional[datetime] = None,
     num_itineraries: int = 3,
     http_client: Optional[httpx.AsyncClient] = None,
+    deadline: Optional[Deadline] = None,
 ) -> list[dict]:
     """Query OTP for transit itineraries.
 
-    Returns a list of raw OTP itinerary dicts, or empty list on failure.
+    Returns a list of raw OTP itinerary dicts, or empty list on failure
+    (including when the request deadline leaves no time for OTP).
     """
+    if should_skip(deadline, "otp"):
+        return []
+
     base = _get_otp_url()
+    timeout = timeout_for(deadline, 5.0)
     now = departure_time or datetime.now()
 
     params = {
@@ -187,15 +193,10 @@ async def query_otp_routes(
     url = f"{base}/otp/routers/default/plan"
 
     try:
-        if http_client:
-            resp = await http_client.get(url, params=params, timeout=5.0)
-            resp.raise_for_status()
-            data = resp.json()
-        else:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                data = resp.json()
+        client = http_client or get_http_client()
+        resp = await hedged_get(client, url, endpoint="otp.plan", params=params, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
 
         plan = data.get("plan")
         if not plan:
@@ -207,6 +208,8 @@ async def query_otp_routes(
 
     except httpx.TimeoutException:
         logger.warning("OTP request timed out")
+        if deadline:
+            deadline.degrade("otp")
         return []
     except Exception as e:
         logger.warning(f"OTP query failed: {e}")
@@ -315,11 +318,14 @@ def parse_otp_itinerary(
     predictor=None,
     weather: Optional[dict] = None,
     is_adverse: bool = False,
+    prediction_batch=None,
 ) -> RouteOption:
     """Convert an OTP itinerary into our RouteOption model.
 
     Adds delay prediction and cost calculation on top of OTP data.
     Accepts either a weather dict (preferred) or is_adverse bool (backward compat).
+    With a prediction_batch (app.ml_predictor.PredictionBatch) the delay
+    prediction is queued on it instead of run inline.
     """
     from app.cost_calculator import calculate_cost
 
@@ -350,36 +356,39 @@ def parse_otp_itinerary(
     # Delay prediction (use first transit leg's line)
     delay_info = DelayInfo()
     now = datetime.now()
+    prediction_request = None
     if predictor and transit_legs:
         first_transit = transit_legs[0]
         line_for_pred = first_transit.get("routeShortName", "1")
-        try:
-            prediction = predictor.predict(
-                line=line_for_pred,
-                hour=now.hour,
-                day_of_week=now.weekday(),
-                month=now.month,
-                temperature=weather.get("temperature"),
-                precipitation=weather.get("precipitation"),
-                snowfall=weather.get("snowfall"),
-                wind_speed=weather.get("wind_speed"),
-                is_adverse_weather=_is_adverse if not weather else None,
-                mode=first_transit.get("mode", "SUBWAY").lower(), # Pass OTP mode (BUS, SUBWAY, TRAM)
-            )
-            delay_info = DelayInfo(
-                probability=prediction["delay_probability"],
-                expected_minutes=prediction["expected_delay_minutes"],
-                confidence=prediction["confidence"],
-                factors=prediction["contributing_factors"],
-            )
-        except Exception as e:
-            logger.debug(f"Delay prediction failed for OTP route: {e}")
+        prediction_request = dict(
+            line=line_for_pred,
+            hour=now.hour,
+            day_of_week=now.weekday(),
+            month=now.month,
+            temperature=weather.get("temperature"),
+            precipitation=weather.get("precipitation"),
+            snowfall=weather.get("snowfall"),
+            wind_speed=weather.get("wind_speed"),
+            is_adverse_weather=_is_adverse if not weather else None,
+            mode=first_transit.get("mode", "SUBWAY").lower(), # Pass OTP mode (BUS, SUBWAY, TRAM)
+        )
+        if prediction_batch is None:
+            try:
+                prediction = predictor.predict(**prediction_request)
+                delay_info = DelayInfo(
+                    probability=prediction["delay_probability"],
+                    expected_minutes=prediction["expected_delay_minutes"],
+                    confidence=prediction["confidence"],
+                    factors=prediction["contributing_factors"],
+                )
+            except Exception as e:
+                logger.debug(f"Delay prediction failed for OTP route: {e}")
 
     # Stress score
-    stress_score = 0.2 + transfers * 0.1 + delay_info.probability * 0.3
+    stress_base = 0.2 + transfers * 0.1
     if _is_adverse:
-        stress_score += 0.1
-    stress_score = min(1.0, stress_score)
+        stress_base += 0.1
+    stress_score = min(1.0, stress_base + delay_info.probability * 0.3)
 
     # Cost
     transit_dist = sum(s.distance_km for s in segments if s.mode == RouteMode.TRANSIT)
@@ -401,7 +410,7 @@ def parse_otp_itinerary(
     transfer_str = f", {transfers} transfer{'s' if transfers != 1 else ''}" if transfers > 0 else ""
     summary = f"{agency_str} — {total_distance_km:.1f} km, {total_duration_min:.0f} min{transfer_str}"
 
-    return RouteOption(
+    route = RouteOption(
         id=str(uuid.uuid4())[:8],
         label="",
         mode=RouteMode.TRANSIT,
@@ -415,3 +424,6 @@ def parse_otp_itinerary(
         arrival_time=arr_str,
         summary=summary,
     )
+    if prediction_batch is not None and prediction_request:
+        prediction_batch.add(route, [prediction_request], stress_base, 0.3)
+    return route
@@ -0,0 +1,264 @@
+"""Dense precomputed delay-prediction table for the XGBoost model.
+
+For station-less requests every model input apart from weather is
+low-cardinality (line, hour, day of week, month, mode), so the model is
+evaluated once over the full grid — crossed with a small grid of weather points — and served by array
+indexing. Weather is snapped to the nearest grid point (or, optionally,
+linearly interpolated per dimension — which blends the trees' step-shaped
+output and isn't more accurate). Inputs outside the grid return None and the
+caller falls back to the model.
+
+Every load checks the table against the model on a fixed random sample of
+inputs and logs the error; a table whose p90 |Δprobability| exceeds
+TABLE_MAX_ERROR is not served.
+
+The table is cached next to the model as an .npz keyed by the model file's
+mtime/size and the grid definition, so every worker loads identical values.
+Training writes the table for the compact export with the XGBoost models
+(walking the full grid through CompactBooster is ~10x slower); a worker that
+still has to build it holds a file lock, and the others wait and then load
+its result.
+"""
+
+import contextlib
+import logging
+import os
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker lock, each worker may build
+    fcntl = None
+
+import numpy as np
+
+logger = logging.getLogger("fluxroute.ml")
+
+TABLE_ENABLED = os.getenv("PREDICTION_TABLE", "1").lower() not in ("0", "false", "no")
+TABLE_INTERPOLATE = os.getenv("PREDICTION_TABLE_INTERPOLATE", "0").lower() not in ("0", "false", "no")
+TABLE_MAX_ERROR = float(os.getenv("PREDICTION_TABLE_MAX_ERROR", "0.02"))  # p90 |Δprobability| vs the model
+CHECK_SAMPLES = 2000
+
+# Discrete axes — values LINE_MAP / MODE_MAP can produce
+LINES = ("1", "2", "4", "5", "6")
+MODES = (1, 2, 3)
+
+# Weather grid points (ordered axes; interpolation happens between them)
+WEATHER_GRID = {
+    "temperature": (-25.0, -10.0, 5.0, 20.0, 35.0),  # °C
+    "precipitation": (0.0, 5.0, 20.0),  # mm
+    "snowfall": (0.0, 5.0),  # cm
+    "wind_speed": (0.0, 25.0, 80.0),  # km/h
+}
+_WEATHER_AXES = tuple(np.asarray(v, dtype=np.float32) for v in WEATHER_GRID.values())
+
+_LINE_INDEX = {line: i for i, line in enumerate(LINES)}
+
+# DelayPredictor._feature_matrix: per-feature arrays → model input matrix
+FeatureMatrixFn = Callable[..., np.ndarray]
+
+
+def _grid_signature() -> str:
+    return repr((LINES, MODES, WEATHER_GRID))
+
+
+@contextlib.contextmanager
+def _build_lock(cache_path: str):
+    """Exclusive lock so only one worker process builds a given table."""
+    if fcntl is None:
+        yield
+        return
+    try:
+        lock_file = open(f"{cache_path}.lock", "w")
+    except OSError:
+        yield  # Read-only model directory: build without the lock
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _axis_position(axis: np.ndarray, value: float, interpolate: bool) -> Optional[tuple[int, float]]:
+    """Return (lower index, weight of the upper neighbour), or None if off-grid."""
+    if value < axis[0] or value > axis[-1]:
+        return None
+    if len(axis) == 1:
+        return 0, 0.0
+    i = min(int(np.searchsorted(axis, value, side="right")) - 1, len(axis) - 2)
+    t = float((value - axis[i]) / (axis[i + 1] - axis[i]))
+    if not interpolate:
+        return (i + 1, 0.0) if t >= 0.5 else (i, 0.0)
+    return i, t
+
+
+class PredictionTable:
+    """Lookup table of (delay probability, expected minutes).
+
+    `values` has shape (lines, 24 hours, 7 days, 12 months, modes,
+    *weather axes, 2).
+    """
+
+    def __init__(self, values: np.ndarray, interpolate: bool = TABLE_INTERPOLATE):
+        self.values = values
+        self.interpolate = interpolate
+        self.error: Optional[dict] = None  # Set by check()
+
+    @classmethod
+    def build(
+        cls, feature_matrix: FeatureMatrixFn, classifier, regressor,
+        line_codes: Optional[dict[str, int]] = None,
+    ) -> "PredictionTable":
+        """Evaluate the model over the whole grid, one (line, mode) slab at a time.
+
+        `line_codes` maps each LINES entry to the model's line encoding
+        (defaults to the line number itself).
+        """
+        line_codes = line_codes or {}
+        weather_shape = tuple(len(a) for a in _WEATHER_AXES)
+        values = np.zeros((len(LINES), 24, 7, 12, len(MODES), *weather_shape, 2), dtype=np.float32)
+
+        hour, dow, month, temp, precip, snow, wind = (
+            g.ravel() for g in np.meshgrid(
+                np.arange(24), np.arange(7), np.arange(1, 13), *_WEATHER_AXES, indexing="ij",
+            )
+        )
+        slab_shape = (24, 7, 12, *weather_shape)
+
+        for li, line in enumerate(LINES):
+            for mi, mode in enumerate(MODES):
+                features = feature_matrix(
+                    line_encoded=line_codes.get(line, int(line)), hour=hour, day_of_week=dow, month=month,
+                    temperature=temp, precipitation=precip, snowfall=snow, wind_speed=wind,
+                    mode_encoded=mode,
+                )
+                values[li, :, :, :, mi, ..., 0] = classifier.predict_proba(features)[:, 1].reshape(slab_shape)
+                values[li, :, :, :, mi, ..., 1] = np.maximum(0.0, regressor.predict(features)).reshape(slab_shape)
+
+        return cls(values)
+
+    @classmethod
+    def load_or_build(
+        cls, model_path: str, feature_matrix: FeatureMatrixFn, classifier, regressor,
+        line_codes: Optional[dict[str, int]] = None,
+    ) -> Optional["PredictionTable"]:
+        """Load the cached table for this model file, building (and caching) it if stale.
+
+        Returns None if the table disagrees with the model by more than
+        TABLE_MAX_ERROR, so callers use the model directly.
+        """
+        stat = os.stat(model_path)
+        key = f"{stat.st_mtime_ns}:{stat.st_size}:{_grid_signature()}:{sorted((line_codes or {}).items())}"
+        cache_path = os.path.splitext(model_path)[0] + "_table.npz"
+
+        table = cls._load_cached(cache_path, key)
+        if table is None:
+            with _build_lock(cache_path):
+                table = cls._load_cached(cache_path, key)  # Built by another worker while we waited
+                if table is None:
+                    table = cls.build(feature_matrix, classifier, regressor, line_codes)
+                    logger.info(f"Prediction table built: {table.values.size // 2:,} cells")
+                    try:
+                        # Write-then-rename so concurrent workers never read a partial file
+                        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+                        np.savez(tmp_path, key=np.array(key), values=table.values)
+                        os.replace(tmp_path, cache_path)
+                    except OSError as e:
+                        logger.warning(f"Could not cache prediction table: {e}")
+
+        error = table.check(feature_matrix, classifier, regressor, line_codes)
+        logger.info(
+            f"Prediction table vs model ({error['samples']} samples, "
+            f"{'interpolated' if table.interpolate else 'nearest point'}): "
+            f"|Δp| mean {error['p_mean']:.3f}, p90 {error['p_p90']:.3f}, max {error['p_max']:.3f}; "
+            f"|Δmin| mean {error['min_mean']:.2f}, max {error['min_max']:.2f}"
+        )
+        if error["p_p90"] > TABLE_MAX_ERROR:
+            logger.warning(
+                f"Prediction table disabled: p90 |Δp| {error['p_p90']:.3f} exceeds "
+                f"PREDICTION_TABLE_MAX_ERROR={TABLE_MAX_ERROR}"
+            )
+            return None
+        return table
+
+    def check(
+        self, feature_matrix: FeatureMatrixFn, classifier, regressor,
+        line_codes: Optional[dict[str, int]] = None, samples: int = CHECK_SAMPLES,
+    ) -> dict:
+        """Compare lookups against the model on a fixed random sample of in-grid inputs.
+
+        Weather is drawn around typical Toronto conditions (mostly dry, some
+        rain and snow) rather than only at grid points, which is where the
+        table's error shows.
+        """
+        line_codes = line_codes or {}
+        rng = np.random.default_rng(0)  # Same sample in every worker, so they agree
+        line_idx = rng.integers(0, len(LINES), samples)
+        mode = np.asarray(MODES)[rng.integers(0, len(MODES), samples)]
+        hour, dow, month = rng.integers(0, 24, samples), rng.integers(0, 7, samples), rng.integers(1, 13, samples)
+        temp = rng.uniform(-20.0, 30.0, samples)
+        precip = np.where(rng.random(samples) < 0.3, rng.uniform(0.0, 20.0, samples), 0.0)
+        snow = np.where(rng.random(samples) < 0.15, rng.uniform(0.0, 5.0, samples), 0.0)
+        wind = rng.uniform(0.0, 60.0, samples)
+
+        features = feature_matrix(
+            line_encoded=np.array([line_codes.get(LINES[i], int(LINES[i])) for i in line_idx]),
+            hour=hour, day_of_week=dow, month=month,
+            temperature=temp, precipitation=precip, snowfall=snow, wind_speed=wind,
+            mode_encoded=mode,
+        )
+        model_p = classifier.predict_proba(features)[:, 1]
+        model_min = np.maximum(0.0, regressor.predict(features))
+
+        looked_up = np.array([
+            self.lookup(LINES[li], int(h), int(d), int(m), float(t), float(p), float(sn), float(w), int(mo))
+            for li, h, d, m, t, p, sn, w, mo in zip(line_idx, hour, dow, month, temp, precip, snow, wind, mode)
+        ], dtype=np.float64)
+        dp = np.abs(looked_up[:, 0] - model_p)
+        dmin = np.abs(looked_up[:, 1] - model_min)
+        self.error = {
+            "samples": samples,
+            "p_mean": float(dp.mean()),
+            "p_p90": float(np.quantile(dp, 0.9)),
+            "p_max": float(dp.max()),
+            "min_mean": float(dmin.mean()),
+            "min_max": float(dmin.max()),
+        }
+        return self.error
+
+    @classmethod
+    def _load_cached(cls, cache_path: str, key: str) -> Optional["PredictionTable"]:
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if str(cached["key"]) == key:
+                    logger.info(f"Prediction table loaded from {os.path.basename(cache_path)}")
+                    return cls(cached["values"])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable prediction table cache: {e}")
+        return None
+
+    def lookup(
+        self, line: str, hour: int, day_of_week: int, month: int,
+        temperature: float, precipitation: float, snowfall: float, wind_speed: float,
+        mode_encoded: int,
+    ) -> Optional[tuple[float, float]]:
+        """(probability, expected minutes), or None if the input is off-grid."""
+        li = _LINE_INDEX.get(line)
+        if li is None or not (0 <= hour < 24 and 0 <= day_of_week < 7 and 1 <= month <= 12):
+            return None
+        if mode_encoded not in MODES:
+            return None
+
+        cell = self.values[li, hour, day_of_week, month - 1, MODES.index(mode_encoded)]
+        for axis, value in zip(_WEATHER_AXES, (temperature, precipitation, snowfall, wind_speed)):
+            pos = _axis_position(axis, value, self.interpolate)
+            if pos is None:
+                return None
+            i, t = pos
+            cell = cell[i] if t == 0.0 else cell[i] * (1.0 - t) + cell[i + 1] * t
+
+        return float(cell[0]), float(cell[1])
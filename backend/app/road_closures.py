@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import httpx
 
+from app.upstream import get_http_client
+
 logger = logging.getLogger("fluxroute.road_closures")
 
 # City of Toronto Open Data - Road Restrictions/Closures (ArcGIS FeatureServer)
@@ -20,7 +22,7 @@ _cache: Dict[str, Any] = {
 }
 CACHE_DURATION_SECONDS = 300  # 5 minutes
 
-async def fetch_road_closures() -> Dict[str, Any]:
+async def fetch_road_closures(http_client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """
     Fetch active road closures/restrictions from Toronto Open Data.
     Returns GeoJSON FeatureCollection.
@@ -40,10 +42,10 @@ async def fetch_road_closures() -> Dict[str, Any]:
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(ROAD_CLOSURES_URL, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        client = http_client or get_http_client()
+        resp = await client.get(ROAD_CLOSURES_URL, params=params, timeout=10.0)
+        resp.raise_for_status()
+        data = resp.json()
 
         # Basic validation
         if "features" in data:
@@ -1,9 +1,10 @@
 import asyncio
 import logging
+import math
 import os
 import uuid
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
 
 import httpx
 
@@ -12,21 +13,25 @@ from app.models import (
     CostBreakdown,
     DelayInfo,
     DirectionStep,
+    GeometryFormat,
     RouteMode,
     RouteOption,
     RouteSegment,
 )
 from app.cost_calculator import calculate_cost, calculate_hybrid_cost
+from app.deadline import Deadline, should_skip, timeout_for
+from app.geometry import encode_polyline, quantize_deltas, simplify_for_zoom
 from app.gtfs_parser import (
     find_nearest_stops, find_nearest_rapid_transit_stations, haversine,
     find_transit_route, get_active_service_ids, get_next_departures,
     get_trip_arrival_at_stop, find_transfer_stations, resolve_transfer_stop_id,
     TTC_LINE_INFO,
 )
-from app.ml_predictor import DelayPredictor
+from app.ml_predictor import DelayPredictor, PredictionBatch
 from app.models import ParkingInfo
 from app.otp_client import query_otp_routes, parse_otp_itinerary, find_park_and_ride_stations
 from app.parking_data import get_parking_info, find_stations_with_parking, is_station_on_suspended_line
+from app.upstream import get_http_client, hedged_get
 from app.weather import get_current_weather
 
 logger = logging.getLogger("fluxroute.engine")
@@ -35,6 +40,9 @@ def _get_mapbox_token() -> str:
     return os.getenv("MAPBOX_TOKEN", "")
 MAPBOX_DIRECTIONS_URL = "https://api.mapbox.com/directions/v5/mapbox"
 
+# Max stations per transit leg given their own delay prediction
+STATION_PREDICTIONS_MAX = int(os.getenv("STATION_PREDICTIONS_MAX", "16"))
+
 # Simple per-request cache for Mapbox directions (avoids duplicate calls within one route calculation)
 _directions_cache: dict[str, Optional[dict]] = {}
 
@@ -47,13 +55,21 @@ async def _mapbox_directions(
     destination: Coordinate,
     profile: str = "driving-traffic",
     http_client: Optional[httpx.AsyncClient] = None,
+    deadline: Optional[Deadline] = None,
 ) -> Optional[dict]:
-    """Call Mapbox Directions API. Returns route data or None on failure."""
+    """Call Mapbox Directions API. Returns route data or None on failure.
+
+    With a deadline, returns None (straight-line fallback) without calling
+    Mapbox once the request budget is nearly spent.
+    """
     # Check cache first (avoids duplicate API calls within one route calculation)
     cache_key = _directions_cache_key(origin, destination, profile)
     if cache_key in _directions_cache:
         return _directions_cache[cache_key]
 
+    if should_skip(deadline, f"mapbox:{profile}"):
+        return None
+
     token = _get_mapbox_token()
     if not token or token == "your-mapbox-token-here":
         logger.info(
@@ -71,16 +87,12 @@ async def _mapbox_directions(
     )
 
     for attempt in range(2):
+        timeout = timeout_for(deadline, 10.0)
         try:
-            if http_client:
-                resp = await http_client.get(url, timeout=10.0)
-                resp.raise_for_status()
-                data = resp.json()
-            else:
-                async with httpx.AsyncClient(timeout=10.0, transport=httpx.AsyncHTTPTransport(local_address="0.0.0.0")) as client:
-                    resp = await client.get(url)
-                    resp.raise_for_status()
-                    data = resp.json()
+            client = http_client or get_http_client()
+            resp = await hedged_get(client, url, endpoint="mapbox.directions", timeout=timeout)
+            resp.raise_for_status()
+            data = resp.json()
 
             routes = data.get("routes", [])
             if not routes:
@@ -136,7 +148,7 @@ async def _mapbox_directions(
                 f"Mapbox API call failed ({profile}, attempt {attempt + 1}/2): "
                 f"{type(e).__name__}: {e}"
             )
-            if attempt == 0:
+            if attempt == 0 and not should_skip(deadline, f"mapbox:{profile}", min_needed=1.0):
                 await asyncio.sleep(0.5)
                 continue
             _directions_cache[cache_key] = None
@@ -236,10 +248,10 @@ def _make_direction_steps(raw_steps: list[dict]) -> list[DirectionStep]:
     return [DirectionStep(**s) for s in raw_steps]
 
 
-async def _fetch_weather_full(lat: float, lng: float, http_client=None) -> dict:
+async def _fetch_weather_full(lat: float, lng: float, http_client=None, deadline: Optional[Deadline] = None) -> dict:
     """Fetch full weather data. Returns defaults on failure."""
     try:
-        weather = await get_current_weather(lat, lng, http_client=http_client)
+        weather = await get_current_weather(lat, lng, http_client=http_client, deadline=deadline)
         return weather
     except Exception:
         return {
@@ -248,7 +260,7 @@ async def _fetch_weather_full(lat: float, lng: float, http_client=None) -> dict:
         }
 
 
-async def _fetch_otp(origin, destination, now, modes, otp_available, http_client=None):
+async def _fetch_otp(origin, destination, now, modes, otp_available, http_client=None, deadline=None):
     """Query OTP if available. Returns (otp_used, otp_routes) tuple."""
     if RouteMode.TRANSIT not in modes or not otp_available:
         if RouteMode.TRANSIT in modes and not otp_available:
@@ -257,7 +269,7 @@ async def _fetch_otp(origin, destination, now, modes, otp_available, http_client
 
     try:
         otp_itineraries = await query_otp_routes(
-            origin, destination, now, num_itineraries=3, http_client=http_client
+            origin, destination, now, num_itineraries=3, http_client=http_client, deadline=deadline,
         )
         if otp_itineraries:
             logger.info(f"OTP returned {len(otp_itineraries)} itineraries")
@@ -268,15 +280,24 @@ async def _fetch_otp(origin, destination, now, modes, otp_available, http_client
     return False, []
 
 
-async def generate_routes(
+async def _plan_routes(
     origin: Coordinate,
     destination: Coordinate,
     gtfs: dict,
     predictor: DelayPredictor,
     modes: Optional[list[RouteMode]] = None,
     app_state: Optional[dict] = None,
-) -> list[RouteOption]:
-    """Generate 3-4 route options for the given origin/destination."""
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
+) -> tuple[list[RouteOption], list[tuple[str, object]]]:
+    """Run the shared setup for a route request.
+
+    Returns (ready_routes, pending) — OTP routes that are already built, plus
+    (stage_name, coroutine) pairs for the per-mode routes still to run. Hybrid
+    coroutines resolve to a list of routes, the others to a single RouteOption
+    or None. Delay predictions for every route are queued on prediction_batch;
+    the caller flushes it before handing routes out.
+    """
     _directions_cache.clear()  # Fresh cache per request
 
     if modes is None:
@@ -291,19 +312,21 @@ async def generate_routes(
     otp_available = (app_state or {}).get("otp_available", False)
 
     # Phase 1: Fetch weather + OTP concurrently (instead of sequentially)
-    weather_task = _fetch_weather_full(origin.lat, origin.lng, http_client=http_client)
-    otp_task = _fetch_otp(origin, destination, now, modes, otp_available, http_client=http_client)
+    weather_task = _fetch_weather_full(origin.lat, origin.lng, http_client=http_client, deadline=deadline)
+    otp_task = _fetch_otp(origin, destination, now, modes, otp_available, http_client=http_client, deadline=deadline)
     weather, (otp_used, otp_itineraries) = await asyncio.gather(weather_task, otp_task)
     is_adverse = weather.get("is_adverse", False)
 
     # Process OTP results
     if otp_used:
         for itin in otp_itineraries[:2]:  # Take best 2 OTP results
-            otp_route = parse_otp_itinerary(itin, predictor=predictor, weather=weather)
+            otp_route = parse_otp_itinerary(
+                itin, predictor=predictor, weather=weather, prediction_batch=prediction_batch,
+            )
             routes.append(otp_route)
         logger.info(f"Used {min(2, len(otp_itineraries))} OTP itineraries")
 
-    # Phase 2: Build and run route tasks in parallel
+    # Phase 2: Build route tasks (run in parallel by the caller)
     tasks = []
     hybrid_task = None
     for mode in modes:
@@ -319,36 +342,268 @@ async def generate_routes(
                 otp_available=otp_available,
                 app_state=app_state,
                 weather=weather,
+                deadline=deadline,
+                prediction_batch=prediction_batch,
             )
             continue
-        tasks.append(_generate_single_route(
+        tasks.append((f"route:{mode.value}", _generate_single_route(
             origin, destination, mode, gtfs, predictor, total_distance, is_adverse, now,
             http_client=http_client,
             weather=weather,
             app_state=app_state,
-        ))
+            deadline=deadline,
+            prediction_batch=prediction_batch,
+        )))
 
-    # Run single-mode routes + hybrid in parallel
     if hybrid_task:
-        tasks.append(hybrid_task)
-
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    for result in results:
-        if isinstance(result, Exception):
-            import traceback
-            logger.error(f"Route generation failed: {result}\n{''.join(traceback.format_exception(type(result), result, result.__traceback__))}")
-        elif isinstance(result, list):
-            # Hybrid routes return a list
-            routes.extend(result)
-        elif result:
-            routes.append(result)
+        tasks.append(("route:hybrid", hybrid_task))
+
+    return routes, tasks
+
+
+def _collect_route_result(result, routes: list[RouteOption]) -> list[RouteOption]:
+    """Append a finished route task's output to routes; returns the new routes."""
+    if isinstance(result, Exception):
+        import traceback
+        logger.error(f"Route generation failed: {result}\n{''.join(traceback.format_exception(type(result), result, result.__traceback__))}")
+        return []
+    if isinstance(result, list):
+        # Hybrid routes return a list
+        routes.extend(result)
+        return result
+    if result:
+        routes.append(result)
+        return [result]
+    return []
+
+
+def _cancel_late_tasks(named_tasks: list[tuple[str, asyncio.Task]], deadline: Optional[Deadline]) -> None:
+    """Cancel route tasks still running when the budget ran out, recording each."""
+    for name, task in named_tasks:
+        if not task.done():
+            task.cancel()
+            if deadline:
+                deadline.degrade(name)
+                logger.warning(f"Route deadline exceeded after {deadline.elapsed():.1f}s — dropped {name}")
+
+
+async def generate_routes(
+    origin: Coordinate,
+    destination: Coordinate,
+    gtfs: dict,
+    predictor: DelayPredictor,
+    modes: Optional[list[RouteMode]] = None,
+    app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    geometry_format: GeometryFormat = GeometryFormat.GEOJSON,
+    simplify_zoom: Optional[float] = None,
+) -> list[RouteOption]:
+    """Generate 3-4 route options for the given origin/destination.
+
+    With a deadline, route tasks still running when the budget runs out are
+    cancelled and listed in deadline.degraded; the finished ones are returned.
+    Delay predictions for all routes run as one batched model call at the end.
+    Geometries are simplified/encoded last (see encode_route_geometry).
+    """
+    prediction_batch = PredictionBatch(predictor, live=(app_state or {}).get("live_adjuster"))
+    routes, pending = await _plan_routes(
+        origin, destination, gtfs, predictor, modes, app_state, deadline, prediction_batch,
+    )
+
+    # Run single-mode routes + hybrid in parallel
+    named_tasks = [(name, asyncio.ensure_future(coro)) for name, coro in pending]
+    try:
+        if named_tasks:
+            await asyncio.wait(
+                [task for _, task in named_tasks],
+                timeout=deadline.remaining() if deadline else None,
+            )
+    finally:
+        _cancel_late_tasks(named_tasks, deadline)
+
+    for _, task in named_tasks:
+        if task.cancelled():
+            continue
+        _collect_route_result(task.exception() or task.result(), routes)
+
+    prediction_batch.flush()
 
     # Label routes
     _label_routes(routes)
+    await _encode_geometry_off_loop(routes, geometry_format, simplify_zoom)
 
     return routes
 
 
+async def stream_routes(
+    origin: Coordinate,
+    destination: Coordinate,
+    gtfs: dict,
+    predictor: DelayPredictor,
+    modes: Optional[list[RouteMode]] = None,
+    app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    geometry_format: GeometryFormat = GeometryFormat.GEOJSON,
+    simplify_zoom: Optional[float] = None,
+) -> AsyncIterator[tuple[str, object]]:
+    """Streaming variant of generate_routes.
+
+    Yields ("route", RouteOption) as soon as each mode finishes, then a single
+    ("summary", list[RouteOption]) with every route labeled and ranked.
+    Unfinished route tasks are cancelled if the consumer stops early
+    (e.g. the client disconnects) or the deadline runs out. Delay predictions
+    are batched per completed task, just before its routes are yielded.
+    """
+    prediction_batch = PredictionBatch(predictor, live=(app_state or {}).get("live_adjuster"))
+    routes, pending = await _plan_routes(
+        origin, destination, gtfs, predictor, modes, app_state, deadline, prediction_batch,
+    )
+
+    prediction_batch.flush(routes)
+    await _encode_geometry_off_loop(routes, geometry_format, simplify_zoom)
+    # Hybrids are numbered across the whole stream, as in generate_routes
+    hybrid_count = _label_routes(routes)
+    for route in routes:
+        yield "route", route
+
+    named_tasks = [(name, asyncio.ensure_future(coro)) for name, coro in pending]
+    try:
+        for next_done in asyncio.as_completed(
+            [task for _, task in named_tasks],
+            timeout=deadline.remaining() if deadline else None,
+        ):
+            try:
+                result = await next_done
+            except asyncio.TimeoutError:
+                break
+            except Exception as e:
+                result = e
+            finished = _collect_route_result(result, routes)
+            prediction_batch.flush(finished)
+            await _encode_geometry_off_loop(finished, geometry_format, simplify_zoom)
+            hybrid_count = _label_routes(finished, hybrid_count)
+            for route in finished:
+                yield "route", route
+    finally:
+        _cancel_late_tasks(named_tasks, deadline)
+
+    _label_routes(routes, hybrid_count)
+    yield "summary", rank_routes(routes)
+
+
+def rank_routes(routes: list[RouteOption]) -> list[RouteOption]:
+    """Order routes best-first by delay-adjusted duration, then cost."""
+    def _key(route: RouteOption) -> tuple[float, float]:
+        expected_delay = route.delay_info.probability * route.delay_info.expected_minutes
+        return (route.total_duration_min + expected_delay, route.cost.total)
+
+    return sorted(routes, key=_key)
+
+
+QUANTIZE_SCALE = 100_000  # 1e-5 degrees, ~1 m
+
+
+def _encode_line(geometry: Optional[dict], fmt: GeometryFormat, simplify_zoom: Optional[float]) -> Optional[dict]:
+    """One GeoJSON LineString, simplified and/or encoded; anything else passes through."""
+    if not geometry or geometry.get("type") != "LineString" or "coordinates" not in geometry:
+        return geometry  # Not a line, or already encoded
+    coords = geometry["coordinates"]
+    if simplify_zoom is not None:
+        coords = simplify_for_zoom(coords, simplify_zoom)
+    if fmt == GeometryFormat.POLYLINE6:
+        return {"type": "LineString", "encoding": "polyline6", "polyline": encode_polyline(coords, 6)}
+    if fmt == GeometryFormat.QUANTIZED:
+        return {
+            "type": "LineString", "encoding": "quantized", "scale": QUANTIZE_SCALE,
+            "deltas": quantize_deltas(coords, QUANTIZE_SCALE),
+        }
+    return {"type": "LineString", "coordinates": coords}
+
+
+def encode_route_geometry(
+    routes: list[RouteOption], fmt: GeometryFormat = GeometryFormat.GEOJSON, simplify_zoom: Optional[float] = None,
+) -> None:
+    """Simplify (Douglas–Peucker to ~1 px at `simplify_zoom`) and encode every
+    segment and congestion sub-segment geometry of `routes` in place.
+
+    New geometry dicts replace the old ones (cached Mapbox responses are never
+    modified), and already-encoded geometries are skipped, so calling this
+    again on the same routes is a no-op.
+    """
+    if fmt == GeometryFormat.GEOJSON and simplify_zoom is None:
+        return
+    for route in routes:
+        for segment in route.segments:
+            segment.geometry = _encode_line(segment.geometry, fmt, simplify_zoom)
+            if segment.congestion_segments:
+                segment.congestion_segments = [
+                    dict(sub, geometry=_encode_line(sub.get("geometry"), fmt, simplify_zoom))
+                    for sub in segment.congestion_segments
+                ]
+
+
+async def _encode_geometry_off_loop(
+    routes: list[RouteOption], fmt: GeometryFormat, simplify_zoom: Optional[float],
+) -> None:
+    """encode_route_geometry in a worker thread: Douglas–Peucker is pure Python
+    and takes hundreds of ms on long routes, which would stall the event loop."""
+    if fmt == GeometryFormat.GEOJSON and simplify_zoom is None:
+        return
+    await asyncio.to_thread(encode_route_geometry, routes, fmt, simplify_zoom)
+
+
+def _queue_prediction(
+    route: RouteOption,
+    requests: list[dict],
+    stress_base: float,
+    stress_weight: float,
+    predictor: DelayPredictor,
+    prediction_batch: Optional[PredictionBatch],
+) -> None:
+    """Queue a route's delay prediction on the request's batch.
+
+    Without a batch (e.g. a builder called on its own) the prediction runs
+    immediately, so the route is always complete when the caller sees it.
+    """
+    batch = prediction_batch or PredictionBatch(predictor)
+    batch.add(route, requests, stress_base, stress_weight)
+    if prediction_batch is None:
+        batch.flush()
+
+
+def _travel_bound(board: dict, alight: dict) -> str:
+    """Dominant compass direction ("N"/"S"/"E"/"W") from one stop to another."""
+    d_lat = alight["lat"] - board["lat"]
+    d_lng = (alight["lng"] - board["lng"]) * math.cos(math.radians(board["lat"]))
+    if abs(d_lat) >= abs(d_lng):
+        return "N" if d_lat >= 0 else "S"
+    return "E" if d_lng >= 0 else "W"
+
+
+def _leg_prediction_requests(
+    request: dict, transit_route: Optional[dict], board: dict, alight: dict,
+) -> list[dict]:
+    """Expand one leg's prediction request into one request per station along it.
+
+    Uses the stops `find_transit_route` walked (board and alight stations when
+    unknown), evenly thinned to STATION_PREDICTIONS_MAX. All of them join the
+    route's batch, whose worst station sets the route's delay.
+    """
+    stops = (transit_route or {}).get("intermediate_stops") or [
+        {"stop_name": board.get("stop_name") or board.get("name")},
+        {"stop_name": alight.get("stop_name") or alight.get("name")},
+    ]
+    if len(stops) > STATION_PREDICTIONS_MAX > 1:
+        step = (len(stops) - 1) / (STATION_PREDICTIONS_MAX - 1)
+        stops = [stops[round(i * step)] for i in range(STATION_PREDICTIONS_MAX)]
+
+    bound = _travel_bound(board, alight)
+    return [
+        dict(request, station=stop["stop_name"], bound=bound)
+        for stop in stops if stop.get("stop_name")
+    ] or [request]
+
+
 async def _generate_single_route(
     origin: Coordinate,
     destination: Coordinate,
@@ -361,6 +616,8 @@ async def _generate_single_route(
     http_client=None,
     weather: Optional[dict] = None,
     app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
 ) -> Optional[RouteOption]:
     """Generate a single route option."""
 
@@ -377,10 +634,12 @@ async def _generate_single_route(
             http_client=http_client,
             weather=weather,
             app_state=app_state,
+            deadline=deadline,
+            prediction_batch=prediction_batch,
         )
 
     elif mode == RouteMode.DRIVING:
-        mapbox = await _mapbox_directions(origin, destination, "driving-traffic", http_client=http_client)
+        mapbox = await _mapbox_directions(origin, destination, "driving-traffic", http_client=http_client, deadline=deadline)
 
         if mapbox:
             geometry = mapbox["geometry"]
@@ -430,7 +689,7 @@ async def _generate_single_route(
         cost = calculate_cost(RouteMode.DRIVING, total_dist, destination.lat, destination.lng)
 
     elif mode == RouteMode.WALKING:
-        mapbox = await _mapbox_directions(origin, destination, "walking", http_client=http_client)
+        mapbox = await _mapbox_directions(origin, destination, "walking", http_client=http_client, deadline=deadline)
 
         if mapbox:
             geometry = mapbox["geometry"]
@@ -532,40 +791,69 @@ def _enrich_transit_segment(
     seg.departure_time = best["departure_time"]
     seg.schedule_source = "gtfs-static"
 
-    # Check GTFS-RT trip updates for real-time override
-    trip_updates = (app_state or {}).get("trip_updates", {})
-    rt_dep = trip_updates.get((trip_id, origin_stop["stop_id"]))
-    rt_arr = trip_updates.get((trip_id, dest_stop["stop_id"]))
-
-    if rt_dep and rt_dep.get("departure"):
-        from datetime import timezone
-        dep_dt = datetime.fromtimestamp(rt_dep["departure"], tz=timezone.utc)
-        # Convert to local time (Toronto is UTC-5 or UTC-4)
-        import time as _time
-        offset = _time.timezone if _time.daylight == 0 else _time.altzone
-        dep_local_minutes = dep_dt.hour * 60 + dep_dt.minute - (offset // 60)
-        seg.departure_time = f"{(dep_local_minutes // 60) % 24:02d}:{dep_local_minutes % 60:02d}"
-        seg.schedule_source = "gtfs-rt"
-
-    if rt_arr and rt_arr.get("arrival"):
-        from datetime import timezone
-        import time as _time
-        arr_dt = datetime.fromtimestamp(rt_arr["arrival"], tz=timezone.utc)
-        offset = _time.timezone if _time.daylight == 0 else _time.altzone
-        arr_local_minutes = arr_dt.hour * 60 + arr_dt.minute - (offset // 60)
-        seg.arrival_time = f"{(arr_local_minutes // 60) % 24:02d}:{arr_local_minutes % 60:02d}"
-        seg.schedule_source = "gtfs-rt"
+    # GTFS-RT: board the next trip the realtime store has at this stop on this route;
+    # otherwise look up (or propagate a delay to) the scheduled trip
+    store = (app_state or {}).get("trip_updates")
+    if store is not None and len(store):
+        realtime = store.next_departures(origin_stop["stop_id"], route_id=rid, now=now.timestamp())
+        if realtime:
+            trip_id = realtime[0]["trip_id"]
+            seg.trip_id = trip_id
+            seg.departure_time = _epoch_to_hhmm(realtime[0]["departure"])
+            seg.next_departures = [
+                {
+                    "departure_time": _epoch_to_hhmm(d["departure"]),
+                    "minutes_until": max(0, round((d["departure"] - now.timestamp()) / 60)),
+                }
+                for d in realtime
+            ]
+            seg.schedule_source = "gtfs-rt"
+        else:
+            rt_dep = store.stop_time(
+                trip_id, origin_stop["stop_id"], scheduled=_hhmm_to_epoch(seg.departure_time, now),
+            )
+            if rt_dep and (rt_dep["departure"] or rt_dep["arrival"]):
+                seg.departure_time = _epoch_to_hhmm(rt_dep["departure"] or rt_dep["arrival"])
+                seg.schedule_source = "gtfs-rt"
+
+        rt_arr = store.stop_time(trip_id, dest_stop["stop_id"])
+        arrival = None
+        if rt_arr is None:
+            arrival = get_trip_arrival_at_stop(gtfs, trip_id, dest_stop["stop_id"])
+            if arrival:
+                rt_arr = store.stop_time(trip_id, dest_stop["stop_id"], scheduled=_hhmm_to_epoch(arrival, now))
+        if rt_arr and (rt_arr["arrival"] or rt_arr["departure"]):
+            seg.arrival_time = _epoch_to_hhmm(rt_arr["arrival"] or rt_arr["departure"])
+            seg.schedule_source = "gtfs-rt"
+            return
     else:
-        # Use static GTFS arrival
         arrival = get_trip_arrival_at_stop(gtfs, trip_id, dest_stop["stop_id"])
-        if arrival:
-            seg.arrival_time = arrival
-        else:
-            # Estimate from departure + duration
-            dep_parts = seg.departure_time.split(":")
-            dep_minutes = int(dep_parts[0]) * 60 + int(dep_parts[1])
-            arr_minutes = dep_minutes + round(seg.duration_min)
-            seg.arrival_time = f"{(arr_minutes // 60) % 24:02d}:{arr_minutes % 60:02d}"
+
+    # Static GTFS arrival, else estimate from departure + duration
+    if arrival:
+        seg.arrival_time = arrival
+    else:
+        dep_parts = seg.departure_time.split(":")
+        dep_minutes = int(dep_parts[0]) * 60 + int(dep_parts[1])
+        arr_minutes = dep_minutes + round(seg.duration_min)
+        seg.arrival_time = f"{(arr_minutes // 60) % 24:02d}:{arr_minutes % 60:02d}"
+
+
+def _epoch_to_hhmm(epoch: float) -> str:
+    """Local "HH:MM" for an epoch timestamp."""
+    return datetime.fromtimestamp(epoch).strftime("%H:%M")
+
+
+def _hhmm_to_epoch(hhmm: str, now: datetime) -> Optional[float]:
+    """Epoch of an "HH:MM" time nearest to `now` (today, or tomorrow just after midnight)."""
+    try:
+        hour, minute = (int(part) for part in hhmm.split(":")[:2])
+    except (ValueError, AttributeError):
+        return None
+    t = now.replace(hour=hour % 24, minute=minute, second=0, microsecond=0)
+    if t < now - timedelta(hours=12):
+        t += timedelta(days=1)
+    return t.timestamp()
 
 
 async def _build_transfer_route(
@@ -581,6 +869,8 @@ async def _build_transfer_route(
     http_client=None,
     weather: Optional[dict] = None,
     app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
 ) -> Optional[RouteOption]:
     """Build a transit route with one transfer between two lines.
 
@@ -617,8 +907,8 @@ async def _build_transfer_route(
     dest_profile = "driving-traffic" if drive_from_dest else "walking"
 
     access_to_geo, access_from_geo = await asyncio.gather(
-        _mapbox_directions(origin, origin_station_coord, origin_profile, http_client=http_client),
-        _mapbox_directions(dest_station_coord, destination, dest_profile, http_client=http_client),
+        _mapbox_directions(origin, origin_station_coord, origin_profile, http_client=http_client, deadline=deadline),
+        _mapbox_directions(dest_station_coord, destination, dest_profile, http_client=http_client, deadline=deadline),
     )
 
     if drive_to_origin:
@@ -760,26 +1050,25 @@ async def _build_transfer_route(
     total_duration += from_dur
     total_dist += from_dist
 
-    # --- Delay prediction (use worst of both lines) ---
+    # --- Delay prediction (use worst station on either line) ---
     _w = weather or {}
-    delay_info = DelayInfo()
-    for line_id in [origin_line, dest_line]:
-        pred_mode = "subway" if line_id in ("1", "2", "4") else "streetcar"
-        prediction = predictor.predict(
-            line=line_id, hour=now.hour, day_of_week=now.weekday(), month=now.month,
-            temperature=_w.get("temperature"), precipitation=_w.get("precipitation"),
-            snowfall=_w.get("snowfall"), wind_speed=_w.get("wind_speed"), mode=pred_mode,
+    prediction_requests = []
+    for line_id, leg_route, board, alight in [
+        (origin_line, leg1_route, origin_stop, transfer_station),
+        (dest_line, leg2_route, transfer_station, dest_stop),
+    ]:
+        prediction_requests += _leg_prediction_requests(
+            dict(
+                line=line_id, hour=now.hour, day_of_week=now.weekday(), month=now.month,
+                temperature=_w.get("temperature"), precipitation=_w.get("precipitation"),
+                snowfall=_w.get("snowfall"), wind_speed=_w.get("wind_speed"),
+                mode="subway" if line_id in ("1", "2", "4") else "streetcar",
+            ),
+            leg_route, board, alight,
         )
-        if prediction["delay_probability"] > delay_info.probability:
-            delay_info = DelayInfo(
-                probability=prediction["delay_probability"],
-                expected_minutes=prediction["expected_delay_minutes"],
-                confidence=prediction["confidence"],
-                factors=prediction["contributing_factors"],
-            )
 
-    # Stress: base + transfer penalty + delay
-    stress_score = 0.2 + 0.1 + delay_info.probability * 0.3
+    # Stress: base + transfer penalty (+ delay, applied with the prediction)
+    stress_score = 0.2 + 0.1
     if is_adverse:
         stress_score += 0.1
 
@@ -788,7 +1077,7 @@ async def _build_transfer_route(
         cost.gas = round(extra_gas_cost, 2)
         cost.total = round(cost.fare + cost.gas + cost.parking, 2)
 
-    return RouteOption(
+    route = RouteOption(
         id=str(uuid.uuid4())[:8],
         label="",
         mode=RouteMode.TRANSIT,
@@ -796,11 +1085,13 @@ async def _build_transfer_route(
         total_distance_km=round(total_dist, 2),
         total_duration_min=round(total_duration, 1),
         cost=cost,
-        delay_info=delay_info,
+        delay_info=DelayInfo(),
         stress_score=round(min(1.0, stress_score), 2),
         departure_time=now.strftime("%H:%M"),
         summary=f"{line1_name} to {transfer_station['name']}, transfer to {line2_name}",
     )
+    _queue_prediction(route, prediction_requests, stress_score, 0.3, predictor, prediction_batch)
+    return route
 
 
 async def _generate_transit_route(
@@ -814,6 +1105,8 @@ async def _generate_transit_route(
     http_client=None,
     weather: Optional[dict] = None,
     app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
 ) -> Optional[RouteOption]:
     """Generate a transit route with walking segments to/from stations."""
     # Find nearest rapid transit stations (subway/LRT/rail only — no bus stops)
@@ -883,6 +1176,7 @@ async def _generate_transit_route(
                 origin, destination, best_o, best_d, best_ts,
                 gtfs, predictor, is_adverse, now,
                 http_client=http_client, weather=weather, app_state=app_state,
+                deadline=deadline, prediction_batch=prediction_batch,
             )
 
         # No valid same-line or transfer route found
@@ -913,8 +1207,8 @@ async def _generate_transit_route(
     dest_profile = "driving-traffic" if drive_from_dest_station else "walking"
 
     access_to_geo, access_from_geo = await asyncio.gather(
-        _mapbox_directions(origin, origin_station_coord, origin_profile, http_client=http_client),
-        _mapbox_directions(dest_station_coord, destination, dest_profile, http_client=http_client),
+        _mapbox_directions(origin, origin_station_coord, origin_profile, http_client=http_client, deadline=deadline),
+        _mapbox_directions(dest_station_coord, destination, dest_profile, http_client=http_client, deadline=deadline),
     )
 
     # --- Access TO origin station ---
@@ -1044,7 +1338,7 @@ async def _generate_transit_route(
              pred_mode = "bus"
 
     _w = weather or {}
-    prediction = predictor.predict(
+    prediction_request = dict(
         line=line_for_pred,
         hour=now.hour,
         day_of_week=now.weekday(),
@@ -1056,16 +1350,9 @@ async def _generate_transit_route(
         mode=pred_mode,
     )
 
-    delay_info = DelayInfo(
-        probability=prediction["delay_probability"],
-        expected_minutes=prediction["expected_delay_minutes"],
-        confidence=prediction["confidence"],
-        factors=prediction["contributing_factors"],
-    )
-
-    # Transit stress
+    # Transit stress (delay term applied with the prediction)
     transfers = transit_route.get("transfers", 0) if transit_route else 0
-    stress_score = 0.2 + transfers * 0.1 + prediction["delay_probability"] * 0.3
+    stress_score = 0.2 + transfers * 0.1
 
     cost = calculate_cost(RouteMode.TRANSIT, transit_dist)
     # Add gas cost if we drove to/from station
@@ -1093,7 +1380,7 @@ async def _generate_transit_route(
         except (ValueError, IndexError):
             pass
 
-    return RouteOption(
+    route = RouteOption(
         id=str(uuid.uuid4())[:8],
         label="",
         mode=RouteMode.TRANSIT,
@@ -1101,12 +1388,17 @@ async def _generate_transit_route(
         total_distance_km=round(total_dist, 2),
         total_duration_min=round(total_duration, 1),
         cost=cost,
-        delay_info=delay_info,
+        delay_info=DelayInfo(),
         stress_score=round(min(1.0, stress_score), 2),
         departure_time=route_departure,
         arrival_time=route_arrival,
         summary=f"Transit via {origin_stop['stop_name']} → {dest_stop['stop_name']}",
     )
+    _queue_prediction(
+        route, _leg_prediction_requests(prediction_request, transit_route, origin_stop, dest_stop),
+        stress_score, 0.3, predictor, prediction_batch,
+    )
+    return route
 
 
 def _check_line_disruption(alerts: list, line_name: str) -> tuple[bool, str]:
@@ -1255,6 +1547,8 @@ async def _generate_hybrid_routes(
     otp_available: bool = False,
     weather: Optional[dict] = None,
     app_state: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
 ) -> list[RouteOption]:
     """Generate 1-3 hybrid (drive + transit) routes via multiple station candidates.
 
@@ -1276,7 +1570,7 @@ async def _generate_hybrid_routes(
     if otp_available and http_client:
         try:
             otp_stations = await find_park_and_ride_stations(
-                origin.lat, origin.lng, radius_km=20.0, http_client=http_client,
+                origin.lat, origin.lng, radius_km=20.0, http_client=http_client, deadline=deadline,
             )
         except Exception as e:
             logger.warning(f"OTP station search failed: {e}")
@@ -1413,22 +1707,38 @@ async def _generate_hybrid_routes(
 
     # --- 3. Generate routes for top candidates in parallel ---
     route_tasks = [
-        _build_single_hybrid_route(
+        asyncio.ensure_future(_build_single_hybrid_route(
             origin, destination, candidate, gtfs, predictor,
             is_adverse, now, http_client, otp_available,
             weather=weather,
-        )
+            deadline=deadline,
+            prediction_batch=prediction_batch,
+        ))
         for candidate in top_candidates
     ]
 
-    results = await asyncio.gather(*route_tasks, return_exceptions=True)
+    # Keep whichever candidates finish within the budget instead of losing all of them.
+    # Stop slightly before the outer route deadline so partial results make it out.
+    try:
+        await asyncio.wait(
+            route_tasks,
+            timeout=max(0.0, deadline.remaining() - 0.1) if deadline else None,
+        )
+    except asyncio.CancelledError:
+        for task in route_tasks:
+            task.cancel()
+        raise
 
     hybrid_routes = []
-    for result in results:
-        if isinstance(result, Exception):
-            logger.warning(f"Hybrid route generation failed: {result}")
-        elif result:
-            hybrid_routes.append(result)
+    for candidate, task in zip(top_candidates, route_tasks):
+        if not task.done():
+            task.cancel()
+            deadline.degrade(f"hybrid:{candidate['stop_name']}")
+            continue
+        if task.exception():
+            logger.warning(f"Hybrid route generation failed: {task.exception()}")
+        elif task.result():
+            hybrid_routes.append(task.result())
 
     return hybrid_routes
 
@@ -1444,6 +1754,8 @@ async def _build_single_hybrid_route(
     http_client=None,
     otp_available: bool = False,
     weather: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    prediction_batch: Optional[PredictionBatch] = None,
 ) -> Optional[RouteOption]:
     """Build a single hybrid route via a specific park-and-ride station."""
 
@@ -1455,7 +1767,7 @@ async def _build_single_hybrid_route(
 
     # --- Drive to station (Mapbox driving-traffic) ---
     drive_geo = await _mapbox_directions(
-        origin, station_coord, "driving-traffic", http_client=http_client,
+        origin, station_coord, "driving-traffic", http_client=http_client, deadline=deadline,
     )
 
     drive_dist = drive_geo["distance_km"] if drive_geo else haversine(origin.lat, origin.lng, park_stop["lat"], park_stop["lng"]) * 1.3
@@ -1496,11 +1808,12 @@ async def _build_single_hybrid_route(
     if otp_available and http_client:
         try:
             otp_itineraries = await query_otp_routes(
-                station_coord, destination, now, num_itineraries=1, http_client=http_client,
+                station_coord, destination, now, num_itineraries=1, http_client=http_client, deadline=deadline,
             )
             if otp_itineraries:
                 itin = otp_itineraries[0]
-                otp_route = parse_otp_itinerary(itin, predictor=predictor, weather=weather)
+                # Only the segments are used — the route's own prediction runs below
+                otp_route = parse_otp_itinerary(itin, weather=weather)
                 # Use OTP segments directly (includes walking + transit)
                 transit_segments = otp_route.segments
                 transit_dist = otp_route.total_distance_km
@@ -1591,7 +1904,7 @@ async def _build_single_hybrid_route(
             walk_dur = _estimate_duration(walk_dist, RouteMode.WALKING)
             walk_geo = await _mapbox_directions(
                 Coordinate(lat=dest_stop["lat"], lng=dest_stop["lng"]),
-                destination, "walking", http_client=http_client,
+                destination, "walking", http_client=http_client, deadline=deadline,
             )
             transit_segments.append(RouteSegment(
                 mode=RouteMode.WALKING,
@@ -1628,7 +1941,7 @@ async def _build_single_hybrid_route(
              pred_mode = "bus"
 
     _w = weather or {}
-    prediction = predictor.predict(
+    prediction_request = dict(
         line=line_for_pred,
         hour=now.hour,
         day_of_week=now.weekday(),
@@ -1640,15 +1953,8 @@ async def _build_single_hybrid_route(
         mode=pred_mode,
     )
 
-    delay_info = DelayInfo(
-        probability=prediction["delay_probability"],
-        expected_minutes=prediction["expected_delay_minutes"],
-        confidence=prediction["confidence"],
-        factors=prediction["contributing_factors"],
-    )
-
-    # --- Stress score ---
-    stress_score = 0.25 + prediction["delay_probability"] * 0.2
+    # --- Stress score (delay term applied with the prediction) ---
+    stress_score = 0.25
     if drive_congestion_data:
         stress_score += _congestion_stress_score(drive_congestion_data)
     elif 7 <= now.hour <= 9 or 17 <= now.hour <= 19:
@@ -1691,7 +1997,7 @@ async def _build_single_hybrid_route(
         rate_str = "Free" if parking_info_model.daily_rate == 0 else f"${parking_info_model.daily_rate:.0f}/day"
         parking_note = f" ({rate_str} parking)"
 
-    return RouteOption(
+    route = RouteOption(
         id=str(uuid.uuid4())[:8],
         label="",
         mode=RouteMode.HYBRID,
@@ -1699,13 +2005,15 @@ async def _build_single_hybrid_route(
         total_distance_km=round(total_dist, 2),
         total_duration_min=round(total_duration, 1),
         cost=cost,
-        delay_info=delay_info,
+        delay_info=DelayInfo(),
         stress_score=round(min(1.0, stress_score), 2),
         departure_time=now.strftime("%H:%M"),
         summary=f"Hybrid via {label_prefix} — {total_dist:.1f} km, {total_duration:.0f} min{parking_note}",
         traffic_summary=hybrid_traffic,
         parking_info=parking_info_model,
     )
+    _queue_prediction(route, [prediction_request], stress_score, 0.2, predictor, prediction_batch)
+    return route
 
 
 async def calculate_custom_route(
@@ -1913,12 +2221,12 @@ async def calculate_custom_route(
     )
 
 
-def _label_routes(routes: list[RouteOption]) -> None:
-    """Label routes by mode with descriptive names."""
-    if not routes:
-        return
+def _label_routes(routes: list[RouteOption], hybrid_count: int = 0) -> int:
+    """Label routes by mode with descriptive names.
 
-    hybrid_count = 0
+    Unnamed hybrids are numbered after `hybrid_count` earlier ones; returns
+    the updated count so batches labeled separately number consistently.
+    """
     for route in routes:
         if route.label:
             continue
@@ -1957,6 +2265,7 @@ def _label_routes(routes: list[RouteOption]) -> None:
                 route.label = f"Hybrid {hybrid_count}" if hybrid_count > 1 else "Hybrid"
         else:
             route.label = route.mode.value.title()
+    return hybrid_count
 
 
 async def calculate_custom_route_v2(
@@ -1,9 +1,13 @@
+import asyncio
 import json
 import logging
+import math
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from app.fast_json import FastJSONResponse, dumps, dumps_str
 from app.models import (
     ChatRequest,
     ChatResponse,
@@ -44,11 +48,44 @@ def _get_state():
     return app_state
 
 
+def _require_gtfs(state: dict) -> dict:
+    """GTFS tables, or a 503 while they are still loading at startup (or if loading failed)."""
+    gtfs = state.get("gtfs")
+    if gtfs is None:
+        if state.get("components", {}).get("gtfs") == "failed":
+            raise HTTPException(status_code=503, detail="Transit data unavailable — GTFS failed to load")
+        raise HTTPException(status_code=503, detail="Transit data is still loading — retry shortly")
+    return gtfs
+
+
 @router.get("/health")
 async def health():
     return {"status": "ok", "service": "FluxRoute API"}
 
 
+# Components that must be warm before the service reports ready, and the states that count
+_READY_COMPONENTS = {
+    "gtfs": ("ready",),
+    "transit_lines": ("ready",),
+    "ml_model": ("ready", "heuristic"),
+}
+
+
+@router.get("/ready")
+async def ready():
+    """Report which startup components are warm; 503 until the core ones are.
+
+    The ML model counts as warm once loading finishes, even if it fell back to
+    the heuristic predictor. OTP is informational only.
+    """
+    components = _get_state().get("components", {})
+    is_ready = all(components.get(c) in ok for c, ok in _READY_COMPONENTS.items())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "components": components},
+    )
+
+
 @router.get("/otp/status")
 async def get_otp_status():
     """Check connection to OpenTripPlanner."""
@@ -60,18 +97,63 @@ async def get_otp_status():
     }
 
 
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    """Upstream latency percentiles, hedging counters and connection reuse per pool,
+    plus each realtime feed's adaptive poll interval and conditional-GET counters."""
+    from app.encoded_responses import encoded_cache_stats
+    from app.gtfs_realtime import realtime_feed_stats
+    from app.upstream import upstream_stats
+    from app.vector_tiles import transit_tile_stats
+
+    state = _get_state()
+    hub = state.get("live_hub")
+    predictor = state.get("predictor")
+    return {
+        **upstream_stats(),
+        "realtime": realtime_feed_stats(),
+        "live_push": hub.stats() if hub is not None else None,
+        "encoded_responses": encoded_cache_stats(),
+        "vector_tiles": transit_tile_stats(),
+        "prediction_cache": predictor.cache_stats() if predictor is not None else None,
+    }
+
+
+@router.get("/live-signals")
+async def get_live_signals():
+    """Per-line live signals (alerts, trip lateness, headway gaps) blended into delay predictions."""
+    adjuster = _get_state().get("live_adjuster")
+    if adjuster is None:
+        raise HTTPException(status_code=503, detail="Live signals are not available yet")
+    return adjuster.snapshot()
+
+
+@router.get("/delay-feedback")
+async def get_delay_feedback(
+    line: Optional[str] = Query(None, description="Restrict to one line (GTFS route_short_name)"),
+    top: int = Query(20, ge=0, le=200, description="Most delayed (line, stop, hour) cells to list"),
+):
+    """Realized delays from GTFS-RT trip updates and rolling calibration of the delay model."""
+    feedback = _get_state().get("delay_feedback")
+    if feedback is None:
+        raise HTTPException(status_code=503, detail="Delay feedback is not running")
+    return feedback.metrics(line=line, top=top)
+
+
 @router.post("/routes", response_model=RouteResponse)
 async def get_routes(request: RouteRequest):
     """Generate multimodal route options."""
+    from app.deadline import Deadline, DEFAULT_ROUTE_BUDGET_S
     from app.route_engine import generate_routes
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
     predictor = state.get("predictor")
 
     if not predictor:
         raise HTTPException(status_code=503, detail="ML predictor not initialized")
 
+    deadline = Deadline(request.deadline_s or DEFAULT_ROUTE_BUDGET_S)
     routes = await generate_routes(
         origin=request.origin,
         destination=request.destination,
@@ -79,12 +161,70 @@ async def get_routes(request: RouteRequest):
         predictor=predictor,
         modes=request.modes,
         app_state=state,
+        deadline=deadline,
+        geometry_format=request.geometry_format,
+        simplify_zoom=request.simplify_zoom,
     )
 
-    return RouteResponse(
+    if deadline.degraded:
+        logger.info(f"Routes degraded by deadline ({deadline.elapsed():.1f}s): {deadline.degraded}")
+
+    return FastJSONResponse(RouteResponse(
         routes=routes,
         origin=request.origin,
         destination=request.destination,
+        degraded=deadline.degraded,
+    ))
+
+
+@router.post("/routes/stream")
+async def stream_routes_endpoint(request: RouteRequest):
+    """Stream route options as NDJSON, one line per option as soon as it is ready.
+
+    Emits {"type": "route", "route": {...}} for each option, then a final
+    {"type": "summary", "routes": [...], ...} with all options labeled and
+    ranked best-first.
+    """
+    from app.deadline import Deadline, DEFAULT_ROUTE_BUDGET_S
+    from app.route_engine import stream_routes
+
+    state = _get_state()
+    gtfs = _require_gtfs(state)
+    predictor = state.get("predictor")
+
+    if not predictor:
+        raise HTTPException(status_code=503, detail="ML predictor not initialized")
+
+    async def ndjson():
+        deadline = Deadline(request.deadline_s or DEFAULT_ROUTE_BUDGET_S)
+        async for kind, payload in stream_routes(
+            origin=request.origin,
+            destination=request.destination,
+            gtfs=gtfs,
+            predictor=predictor,
+            modes=request.modes,
+            app_state=state,
+            deadline=deadline,
+            geometry_format=request.geometry_format,
+            simplify_zoom=request.simplify_zoom,
+        ):
+            if kind == "route":
+                msg = {"type": "route", "route": payload}
+            else:
+                msg = {
+                    "type": "summary",
+                    "routes": payload,
+                    "ranking": [r.id for r in payload],
+                    "origin": request.origin,
+                    "destination": request.destination,
+                    "degraded": deadline.degraded,
+                }
+            yield dumps(msg) + b"\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -96,6 +236,7 @@ async def predict_delay(
     day_of_week: int = Query(0),
     month: Optional[int] = Query(None),
     mode: str = Query("subway", description="Transit mode (subway, bus, streetcar)"),
+    live: bool = Query(True, description="Blend in live alerts, lateness and headway gaps"),
 ):
     """Get ML delay prediction for a specific line/time."""
     state = _get_state()
@@ -112,6 +253,9 @@ async def predict_delay(
         month=month,
         mode=mode,
     )
+    adjuster = state.get("live_adjuster")
+    if live and adjuster is not None:
+        result = adjuster.adjust(line, result)
 
     return DelayPredictionResponse(**result)
 
@@ -139,27 +283,114 @@ async def chat(request: ChatRequest):
 
 
 @router.get("/alerts")
-async def get_alerts():
-    """Get cached GTFS-RT service alerts."""
-    state = _get_state()
-    alerts = state.get("alerts", [])
-    return {"alerts": [a.model_dump() if hasattr(a, 'model_dump') else a for a in alerts]}
+async def get_alerts(request: Request):
+    """Get cached GTFS-RT service alerts (pre-encoded, re-encoded once per poll that changed them)."""
+    from app.encoded_responses import cached_json
+
+    def _build(alerts):
+        return {"alerts": [a.model_dump() if hasattr(a, 'model_dump') else a for a in alerts or []]}
+
+    return await cached_json(request, "alerts", _get_state().get("alerts"), _build)
+
+
+def _parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """Parse "west,south,east,north" (degrees) into a tuple clamped to valid
+    longitudes/latitudes, or raise 400."""
+    try:
+        west, south, east, north = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite numbers")
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="bbox must satisfy west <= east and south <= north")
+    return (
+        min(max(west, -180.0), 180.0), min(max(south, -90.0), 90.0),
+        min(max(east, -180.0), 180.0), min(max(north, -90.0), 90.0),
+    )
 
 
 @router.get("/vehicles")
-async def get_vehicles():
-    """Get cached vehicle positions."""
+async def get_vehicles(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="Only vehicles inside 'west,south,east,north'"),
+    route_id: Optional[list[str]] = Query(None, description="Only vehicles on these GTFS routes (repeatable)"),
+):
+    """Get cached vehicle positions, optionally limited to a map viewport and/or routes.
+
+    The unfiltered list is pre-encoded once per poll; filtered queries are
+    serialized per request from the store's indexes.
+    """
     state = _get_state()
-    vehicles = state.get("vehicles", [])
-    return {"vehicles": [v.model_dump() if hasattr(v, 'model_dump') else v for v in vehicles]}
+    store = state.get("vehicles")
+    if not bbox and not route_id:
+        from app.encoded_responses import cached_json
+
+        def _build(vehicles):
+            if vehicles is None:
+                return {"vehicles": [], "count": 0}
+            return {"vehicles": vehicles.to_dicts(), "count": len(vehicles)}
+
+        return await cached_json(request, "vehicles", store, _build)
+    if store is None:
+        return {"vehicles": [], "count": 0}
+    indices = store.query(_parse_bbox(bbox) if bbox else None, route_id)
+    return {"vehicles": store.to_dicts(indices), "count": len(indices)}
+
+
+@router.get("/live/stream")
+async def live_stream(
+    bbox: Optional[str] = Query(None, description="Only vehicles inside 'west,south,east,north'"),
+):
+    """Server-sent events variant of /ws/live for one fixed viewport: a snapshot,
+    then vehicle and alert deltas after each poll (see app/live_push.py)."""
+    hub = _get_state().get("live_hub")
+    if hub is None:
+        raise HTTPException(status_code=503, detail="Live push is not running")
+    sub = hub.subscribe(_parse_bbox(bbox) if bbox else None)
+
+    async def events():
+        try:
+            async for frame in hub.messages(sub):
+                yield f"data: {frame}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/transit-lines")
-async def get_transit_lines():
-    """Get cached transit line geometries and station positions for map overlay."""
-    state = _get_state()
-    transit_data = state.get("transit_lines", {})
-    return transit_data
+async def get_transit_lines(request: Request):
+    """Get cached transit line geometries and station positions for map overlay.
+
+    Encoded (and compressed) once after the overlay loads; repeat loads are
+    served from bytes or answered 304 via the ETag.
+    """
+    from app.encoded_responses import cached_json
+
+    return await cached_json(request, "transit_lines", _get_state().get("transit_lines"), lambda data: data or {})
+
+
+@router.get("/tiles/transit/{z}/{x}/{y}.mvt")
+async def get_transit_tile(request: Request, z: int, x: int, y: int):
+    """Mapbox Vector Tile of the transit overlay ("lines" and "stations" layers),
+    simplified for the zoom, generated on first request and cached."""
+    from app.encoded_responses import encoded_response
+    from app.vector_tiles import MAX_ZOOM, build_transit_tiles, cached_transit_tiles
+
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    overlay = _get_state().get("transit_lines")
+    if not overlay:
+        raise HTTPException(status_code=503, detail="Transit overlay is still loading — retry shortly")
+
+    tiles = cached_transit_tiles(overlay) or await asyncio.to_thread(build_transit_tiles, overlay)
+    payload = tiles.cached(z, x, y) or await asyncio.to_thread(tiles.tile, z, x, y)
+    return encoded_response(request, payload)
 
 
 @router.get("/transit-shape/{route_id}")
@@ -168,7 +399,7 @@ async def get_transit_shape(route_id: str):
     from app.gtfs_parser import get_route_shape
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
 
     shape = get_route_shape(gtfs, route_id)
     if not shape:
@@ -188,7 +419,7 @@ async def get_nearby_stops(
     from app.gtfs_parser import find_nearest_stops
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
 
     stops = find_nearest_stops(gtfs, lat, lng, radius_km, limit)
     return {"stops": stops}
@@ -203,12 +434,34 @@ async def search_stops(
     from app.gtfs_parser import search_stops as gtfs_search_stops
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
 
     stops = gtfs_search_stops(gtfs, query, limit)
     return StopSearchResponse(stops=[StopSearchResult(**s) for s in stops])
 
 
+@router.get("/stops/{stop_id}/realtime")
+async def get_realtime_departures(
+    stop_id: str,
+    route_id: Optional[str] = Query(None, description="Only departures on this GTFS route"),
+    limit: int = Query(5, ge=1, le=50),
+):
+    """Next departures at a stop from the GTFS-RT trip-update store."""
+    from datetime import datetime
+
+    store = _get_state().get("trip_updates")
+    if store is None:
+        raise HTTPException(status_code=503, detail="Realtime trip updates are not available yet")
+    departures = store.next_departures(stop_id, route_id=route_id, limit=limit)
+    return {
+        "stop_id": stop_id,
+        "departures": [
+            dict(d, departure_time=datetime.fromtimestamp(d["departure"]).strftime("%H:%M")) for d in departures
+        ],
+        "store": store.snapshot(),
+    }
+
+
 @router.get("/weather")
 async def get_weather(
     lat: Optional[float] = Query(None),
@@ -227,7 +480,7 @@ async def get_line_stops(line_id: str):
     from app.gtfs_parser import get_line_stations, TTC_LINE_INFO
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
 
     line_info = TTC_LINE_INFO.get(line_id)
     if not line_info:
@@ -251,7 +504,7 @@ async def calculate_custom_route_endpoint(request: CustomRouteRequest):
     from app.weather import get_current_weather
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
     predictor = state.get("predictor")
     http_client = state.get("http_client")
 
@@ -268,7 +521,7 @@ async def calculate_custom_route_endpoint(request: CustomRouteRequest):
         weather=weather,
     )
 
-    return route.model_dump()
+    return FastJSONResponse(route)
 
 
 @router.post("/suggest-transit-routes", response_model=TransitSuggestionsResponse)
@@ -277,7 +530,7 @@ async def suggest_transit_routes(request: TransitSuggestionsRequest):
     from app.route_builder_suggestions import get_transit_suggestions
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
     http_client = state.get("http_client")
     otp_available = state.get("otp_available", False)
 
@@ -299,7 +552,7 @@ async def calculate_custom_route_v2_endpoint(request: CustomRouteRequestV2):
     from app.weather import get_current_weather
 
     state = _get_state()
-    gtfs = state.get("gtfs", {})
+    gtfs = _require_gtfs(state)
     predictor = state.get("predictor")
     http_client = state.get("http_client")
 
@@ -316,7 +569,7 @@ async def calculate_custom_route_v2_endpoint(request: CustomRouteRequestV2):
         weather=weather,
     )
 
-    return route.model_dump()
+    return FastJSONResponse(route)
 
 
 @router.get("/road-closures")
@@ -324,7 +577,7 @@ async def get_road_closures():
     """Get active road closures from Toronto Open Data."""
     from app.road_closures import fetch_road_closures
 
-    closures = await fetch_road_closures()
+    closures = await fetch_road_closures(_get_state().get("http_client"))
     return closures
 
 
@@ -428,12 +681,12 @@ async def get_navigation_route(request: NavigationRouteRequest):
         )
         alternatives.append(alt_route)
 
-    return NavigationRoute(
+    return FastJSONResponse(NavigationRoute(
         route=primary_route,
         navigation_instructions=nav_instructions,
         voice_locale=request.voice_locale,
         alternatives=alternatives,
-    )
+    ))
 
 
 @router.post("/optimize-route", response_model=OptimizationResponse)
@@ -477,12 +730,12 @@ async def optimize_route(request: OptimizationRequest):
         summary=f"Optimized: {result['distance_km']:.1f} km, {result['duration_min']:.0f} min",
     )
 
-    return OptimizationResponse(
+    return FastJSONResponse(OptimizationResponse(
         waypoint_order=result["waypoint_order"],
         routes=[optimized_route],
         total_distance_km=result["distance_km"],
         total_duration_min=result["duration_min"],
-    )
+    ))
 
 
 @router.post("/isochrone", response_model=IsochroneResponse)
@@ -504,12 +757,65 @@ async def get_isochrone(request: IsochroneRequest):
     if not geojson:
         raise HTTPException(status_code=502, detail="Could not fetch isochrone data")
 
-    return IsochroneResponse(
+    return FastJSONResponse(IsochroneResponse(
         geojson=geojson,
         center=request.center,
         profile=request.profile,
         contours_minutes=request.contours_minutes,
-    )
+    ))
+
+
+@router.websocket("/ws/live")
+async def live_websocket(websocket: WebSocket, bbox: Optional[str] = None):
+    """Vehicle and alert deltas for a map viewport (see app/live_push.py).
+
+    Client sends: {"type": "viewport", "bbox": [west, south, east, north]} (null for everything)
+    Server sends: a snapshot, then "vehicles"/"alerts" deltas after each poll,
+    and {"type": "error", "detail": ...} for a malformed message
+    """
+    hub = _get_state().get("live_hub")
+    if hub is None:
+        await websocket.close(code=1011, reason="Live push unavailable")
+        return
+    try:
+        initial = _parse_bbox(bbox) if bbox else None
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+    sub = hub.subscribe(initial)
+
+    async def _send():
+        async for frame in hub.messages(sub):
+            await websocket.send_text(frame)
+
+    sender = asyncio.create_task(_send())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            # A bad message gets an error frame; only a disconnect ends the socket
+            try:
+                msg = json.loads(text)
+                if not isinstance(msg, dict):
+                    raise ValueError("messages must be JSON objects")
+                if msg.get("type") != "viewport":
+                    continue
+                box = msg.get("bbox")
+                if box is not None and not isinstance(box, list):
+                    raise ValueError("bbox must be [west, south, east, north] or null")
+                sub.set_viewport(_parse_bbox(",".join(str(v) for v in box)) if box is not None else None)
+            except HTTPException as e:
+                await websocket.send_text(dumps_str({"type": "error", "detail": e.detail}))
+            except ValueError as e:
+                await websocket.send_text(dumps_str({"type": "error", "detail": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Live WebSocket error: {e}")
+    finally:
+        sender.cancel()
+        hub.unsubscribe(sub)
 
 
 @router.websocket("/ws/navigation/{session_id}")
@@ -584,23 +890,23 @@ async def navigation_websocket(websocket: WebSocket, session_id: str):
                                 "navigation_instructions": new_route.get("navigation_instructions", []),
                             },
                         }
-                        await websocket.send_text(json.dumps(reroute_msg))
+                        await websocket.send_text(dumps_str(reroute_msg))
                     else:
                         # Mapbox reroute failed — send basic reroute notification
-                        await websocket.send_text(update.model_dump_json())
+                        await websocket.send_text(dumps_str(update))
                     continue
 
                 # Send normal navigation update
-                await websocket.send_text(update.model_dump_json())
+                await websocket.send_text(dumps_str(update))
 
                 # If arrived, close connection
                 if update.type == "arrival":
-                    await websocket.send_text(json.dumps({"type": "arrival", "destination_reached": True}))
+                    await websocket.send_text(dumps_str({"type": "arrival", "destination_reached": True}))
                     break
 
             elif msg.get("type") == "end_navigation":
                 nav_manager.end_session(session_id)
-                await websocket.send_text(json.dumps({"type": "session_ended"}))
+                await websocket.send_text(dumps_str({"type": "session_ended"}))
                 break
 
     except WebSocketDisconnect:
@@ -0,0 +1,166 @@
+"""Trip-indexed store for GTFS-RT trip updates.
+
+The poller parses each trip-updates feed into {trip_id: (route_id, timestamp,
+rows)}, where rows are (stop_sequence, stop_id, arrival, departure, delay) in
+feed (stop sequence) order, and hands it to `TripUpdateStore.apply()`. That
+diffs the snapshot against the current state: unchanged trips keep their
+objects and index entries; only added, changed and removed trips touch the
+per-stop index.
+
+Lookups:
+- `stop_time(trip_id, stop_id, scheduled)` — the explicit update for that
+  stop or, following GTFS-RT propagation, the delay of the nearest upstream
+  stop with a known delay applied to the stop's scheduled time;
+- `next_departures(stop_id, route_id)` — upcoming realtime departures at a
+  stop, straight from the per-stop index.
+
+Trips that leave the feed expire once their last stop has passed, or after
+TRIP_TTL_S without being seen. `trips` is replaced (never mutated) on every
+apply, so worker threads can read a consistent snapshot of it.
+"""
+
+import heapq
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger("fluxroute.trip_updates")
+
+TRIP_TTL_S = 600
+PASSED_GRACE_S = 120
+
+# (stop_sequence or None, stop_id, arrival epoch or None, departure epoch or None, delay seconds or None)
+StopRow = tuple[Optional[int], str, Optional[int], Optional[int], Optional[int]]
+
+
+class TripState:
+    """One trip's latest stop-time updates."""
+
+    def __init__(self, trip_id: str, route_id: Optional[str], timestamp: int, rows: tuple, seen_at: float):
+        self.trip_id = trip_id
+        self.route_id = route_id
+        self.timestamp = timestamp
+        self.rows = rows
+        self.seen_at = seen_at
+        self.index = {row[1]: i for i, row in enumerate(rows)}
+        times = [row[3] or row[2] for row in rows if row[2] or row[3]]
+        self.last_time = max(times) if times else 0
+
+    def propagated_delay(self, scheduled: float) -> Optional[int]:
+        """Delay of the last updated stop scheduled at or before `scheduled`."""
+        delay = None
+        for _seq, _stop_id, arrival, departure, row_delay in self.rows:
+            event = departure or arrival
+            if row_delay is None or event is None:
+                continue
+            if event - row_delay > scheduled:
+                break
+            delay = row_delay
+        return delay
+
+
+class TripUpdateStore:
+    """Realtime stop-time updates indexed by trip and by stop; see the module docstring."""
+
+    def __init__(self):
+        self.trips: dict[str, TripState] = {}
+        self.by_stop: dict[str, set[str]] = {}
+        self.updated_at: Optional[float] = None
+        self.last_diff = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+
+    def __len__(self) -> int:
+        return len(self.trips)
+
+    def apply(self, snapshot: dict, now: Optional[float] = None) -> dict:
+        """Apply a full feed snapshot as a diff; returns the added/updated/unchanged/removed counts."""
+        now = now if now is not None else time.time()
+        trips = dict(self.trips)
+        diff = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+
+        for trip_id, (route_id, timestamp, rows) in snapshot.items():
+            current = trips.get(trip_id)
+            if current is not None and current.rows == rows and current.route_id == route_id:
+                current.seen_at = now
+                diff["unchanged"] += 1
+                continue
+            if current is not None:
+                self._unindex(current)
+                diff["updated"] += 1
+            else:
+                diff["added"] += 1
+            trip = TripState(trip_id, route_id, timestamp, rows, now)
+            self._index(trip)
+            trips[trip_id] = trip
+
+        for trip_id, trip in list(trips.items()):
+            if trip_id in snapshot:
+                continue
+            if trip.last_time < now - PASSED_GRACE_S or now - trip.seen_at > TRIP_TTL_S:
+                del trips[trip_id]
+                self._unindex(trip)
+                diff["removed"] += 1
+
+        self.trips = trips
+        self.updated_at = now
+        self.last_diff = diff
+        return diff
+
+    def _index(self, trip: TripState) -> None:
+        for stop_id in trip.index:
+            self.by_stop.setdefault(stop_id, set()).add(trip.trip_id)
+
+    def _unindex(self, trip: TripState) -> None:
+        for stop_id in trip.index:
+            trip_ids = self.by_stop.get(stop_id)
+            if trip_ids is not None:
+                trip_ids.discard(trip.trip_id)
+                if not trip_ids:
+                    del self.by_stop[stop_id]
+
+    def stop_time(self, trip_id: str, stop_id: str, scheduled: Optional[float] = None) -> Optional[dict]:
+        """Realtime {"arrival", "departure", "delay", "source"} for a trip at a stop, or None.
+
+        `scheduled` (epoch of the static stop time) enables delay propagation
+        to stops the feed has no explicit update for.
+        """
+        trip = self.trips.get(trip_id)
+        if trip is None:
+            return None
+
+        i = trip.index.get(stop_id)
+        if i is not None:
+            _seq, _stop_id, arrival, departure, delay = trip.rows[i]
+            if arrival or departure:
+                return {"arrival": arrival, "departure": departure, "delay": delay, "source": "explicit"}
+
+        if scheduled is None:
+            return None
+        delay = trip.propagated_delay(scheduled)
+        if delay is None:
+            return None
+        estimated = int(scheduled + delay)
+        return {"arrival": estimated, "departure": estimated, "delay": delay, "source": "propagated"}
+
+    def next_departures(
+        self, stop_id: str, route_id: Optional[str] = None, now: Optional[float] = None, limit: int = 5,
+    ) -> list[dict]:
+        """Upcoming realtime departures at a stop (optionally on one route), soonest first."""
+        now = now if now is not None else time.time()
+        upcoming = []
+        for trip_id in self.by_stop.get(stop_id, ()):
+            trip = self.trips.get(trip_id)
+            if trip is None or (route_id is not None and trip.route_id != route_id):
+                continue
+            _seq, _stop_id, arrival, departure, delay = trip.rows[trip.index[stop_id]]
+            event = departure or arrival
+            if event and event >= now:
+                upcoming.append({"trip_id": trip_id, "route_id": trip.route_id, "departure": event, "delay": delay})
+        return heapq.nsmallest(limit, upcoming, key=lambda d: d["departure"])
+
+    def snapshot(self) -> dict:
+        return {
+            "trips": len(self.trips),
+            "stops": len(self.by_stop),
+            "updated_age_s": round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            "last_diff": self.last_diff,
+        }
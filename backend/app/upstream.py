@@ -0,0 +1,327 @@
+"""Shared upstream HTTP layer: pooled client registry, latency tracking, hedged GETs.
+
+One process-wide `httpx.AsyncClient` is mounted with a separate connection
+pool per upstream (Mapbox, OTP, Open-Meteo, TTC feeds, ArcGIS), each with its
+own limits, keep-alive expiry and HTTP/2 setting, so a slow upstream can't
+starve the others' connections. Helpers that aren't handed a client use
+`get_http_client()` instead of opening a throwaway one.
+
+A hedged request fires a duplicate GET when the first one has not answered
+within the endpoint's observed p90 latency, and returns whichever response
+arrives first. Extra load is capped with a per-endpoint token bucket so at
+most ~HEDGE_MAX_EXTRA of requests are duplicated.
+"""
+
+import asyncio
+import bisect
+import importlib.util
+import logging
+import os
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger("fluxroute.upstream")
+
+HEDGING_ENABLED = os.getenv("HTTP_HEDGING", "1").lower() not in ("0", "false", "no")
+HEDGE_QUANTILE = 0.90
+HEDGE_MAX_EXTRA = 0.10  # At most ~10% extra requests per endpoint
+HEDGE_MIN_SAMPLES = 20  # Don't hedge until the histogram has seen this many responses
+HEDGE_MIN_DELAY_S = 0.05
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _pool_config() -> dict[str, dict]:
+    """Connection pool settings per upstream, keyed by pool name."""
+    otp_base = os.getenv("OTP_BASE_URL", "http://localhost:8080").rstrip("/")
+    return {
+        "mapbox": {
+            "prefixes": ("https://api.mapbox.com",),
+            "max_connections": 40, "max_keepalive": 20, "keepalive_expiry": 60.0, "http2": True,
+        },
+        "otp": {
+            "prefixes": (otp_base,),
+            "max_connections": 20, "max_keepalive": 10, "keepalive_expiry": 30.0, "http2": False,
+        },
+        "weather": {
+            "prefixes": ("https://api.open-meteo.com",),
+            "max_connections": 10, "max_keepalive": 5, "keepalive_expiry": 60.0, "http2": True,
+        },
+        # Polled every 30s — keep-alive outlives the poll interval so sockets are reused
+        "ttc_realtime": {
+            "prefixes": ("https://opendata.toronto.ca", "https://alerts.ttc.ca"),
+            "max_connections": 10, "max_keepalive": 5, "keepalive_expiry": 90.0, "http2": True,
+        },
+        "arcgis": {
+            "prefixes": ("https://services.arcgis.com",),
+            "max_connections": 5, "max_keepalive": 2, "keepalive_expiry": 60.0, "http2": True,
+        },
+        "default": {
+            "prefixes": (),
+            "max_connections": 50, "max_keepalive": 20, "keepalive_expiry": 30.0, "http2": False,
+        },
+    }
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (5 ms … ~37 s) with exponential decay.
+
+    Counts are halved whenever `max_samples` is reached, so quantiles track
+    recent behaviour rather than the whole process lifetime.
+    """
+
+    BOUNDS_S = tuple(0.005 * 1.25 ** i for i in range(41))
+
+    def __init__(self, max_samples: int = 2000):
+        self.max_samples = max_samples
+        self.counts = [0] * (len(self.BOUNDS_S) + 1)
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS_S, seconds)] += 1
+        self.total += 1
+        if self.total >= self.max_samples:
+            self.counts = [c // 2 for c in self.counts]
+            self.total = sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile, or None if empty."""
+        if self.total == 0:
+            return None
+        target = q * self.total
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.BOUNDS_S[min(i, len(self.BOUNDS_S) - 1)]
+        return self.BOUNDS_S[-1]
+
+
+class EndpointStats:
+    """Latency histogram plus hedging counters for one upstream endpoint."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._hedge_tokens = 1.0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging isn't warranted."""
+        if self.histogram.total < HEDGE_MIN_SAMPLES:
+            return None
+        p = self.histogram.quantile(HEDGE_QUANTILE)
+        return max(p, HEDGE_MIN_DELAY_S) if p is not None else None
+
+    def earn_token(self) -> None:
+        self._hedge_tokens = min(10.0, self._hedge_tokens + HEDGE_MAX_EXTRA)
+
+    def take_token(self) -> bool:
+        if self._hedge_tokens < 1.0:
+            return False
+        self._hedge_tokens -= 1.0
+        return True
+
+    def snapshot(self) -> dict:
+        def _ms(q: float) -> Optional[float]:
+            v = self.histogram.quantile(q)
+            return round(v * 1000, 1) if v is not None else None
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": _ms(0.50),
+            "p90_ms": _ms(0.90),
+            "p99_ms": _ms(0.99),
+        }
+
+
+class PoolStats:
+    """Request and connection counters for one connection pool."""
+
+    def __init__(self, http2: bool):
+        self.http2 = http2
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def snapshot(self) -> dict:
+        reuse = 1.0 - self.connections / self.requests if self.requests else None
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "new_connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_ratio": round(reuse, 3) if reuse is not None else None,
+        }
+
+
+_endpoint_stats: dict[str, EndpointStats] = {}
+_pool_stats: dict[str, PoolStats] = {}
+_pool_by_origin: dict[tuple, str] = {}
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _origin(url: httpx.URL) -> tuple:
+    return (url.scheme, url.host, url.port)
+
+
+async def _on_request(request: httpx.Request) -> None:
+    """Count requests per pool and trace new TCP/TLS connections."""
+    stats = _pool_stats.get(_pool_by_origin.get(_origin(request.url), "default"))
+    if stats is None:
+        return
+    stats.requests += 1
+
+    async def trace(event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            stats.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            stats.tls_handshakes += 1
+
+    request.extensions["trace"] = trace
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    mounts = {}
+    default_transport = None
+    for name, cfg in _pool_config().items():
+        http2 = cfg["http2"] and HTTP2_AVAILABLE
+        # Force IPv4 — IPv6 to Mapbox/CloudFront can timeout
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=cfg["max_connections"],
+                max_keepalive_connections=cfg["max_keepalive"],
+                keepalive_expiry=cfg["keepalive_expiry"],
+            ),
+            http2=http2,
+            local_address="0.0.0.0",
+        )
+        _pool_stats[name] = PoolStats(http2)
+        if name == "default":
+            default_transport = transport
+        for prefix in cfg["prefixes"]:
+            mounts[prefix] = transport
+            _pool_by_origin[_origin(httpx.URL(prefix))] = name
+
+    return httpx.AsyncClient(
+        timeout=12.0,
+        follow_redirects=True,
+        transport=default_transport,
+        mounts=mounts,
+        event_hooks={"request": [_on_request]},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_http_client()
+        logger.info(
+            f"Shared HTTP client created ({len(_pool_stats)} upstream pools, "
+            f"HTTP/2 {'enabled' if HTTP2_AVAILABLE else 'unavailable — install h2'})"
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _stats_for(endpoint: str) -> EndpointStats:
+    stats = _endpoint_stats.get(endpoint)
+    if stats is None:
+        stats = _endpoint_stats[endpoint] = EndpointStats()
+    return stats
+
+
+def upstream_stats() -> dict:
+    """Per-endpoint latency/hedging counters and per-pool connection reuse."""
+    return {
+        "hedging_enabled": HEDGING_ENABLED,
+        "endpoints": {name: s.snapshot() for name, s in sorted(_endpoint_stats.items())},
+        "pools": {name: s.snapshot() for name, s in sorted(_pool_stats.items())},
+    }
+
+
+def _record_slow_failure(stats: EndpointStats, elapsed: float, timed_out: bool) -> None:
+    """Record a timed-out or cancelled GET as a latency sample only if it ran
+    at least as long as the current hedge delay.
+
+    Such a call took at least `elapsed`, so it can only pull p90 up; shorter
+    ones (and fast errors such as refused connections, which only count in
+    `errors`) would drag p90 below real response times and make hedges fire
+    early during outages. Before the delay is known, only timeouts count.
+    """
+    threshold = stats.hedge_delay()
+    if threshold is None:
+        threshold = 0.0 if timed_out else None
+    if threshold is not None and elapsed >= threshold:
+        stats.histogram.record(elapsed)
+
+
+async def hedged_get(
+    client: httpx.AsyncClient,
+    url: str,
+    endpoint: str,
+    hedge: bool = True,
+    **kwargs,
+) -> httpx.Response:
+    """GET `url`, hedging with a duplicate request past the endpoint's p90.
+
+    `endpoint` names the latency histogram (e.g. "mapbox.directions").
+    Remaining kwargs go to `client.get`. Raises like `client.get` if every
+    attempt fails.
+    """
+    stats = _stats_for(endpoint)
+    stats.requests += 1
+    stats.earn_token()
+    start = time.monotonic()
+
+    delay = stats.hedge_delay() if (hedge and HEDGING_ENABLED) else None
+    attempts = [asyncio.ensure_future(client.get(url, **kwargs))]
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and stats.take_token():
+                stats.hedged += 1
+                logger.debug(f"Hedging {endpoint} after {delay * 1000:.0f}ms")
+                attempts.append(asyncio.ensure_future(client.get(url, **kwargs)))
+
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    if task is not attempts[0]:
+                        stats.hedge_wins += 1
+                    stats.histogram.record(time.monotonic() - start)
+                    return task.result()
+
+        stats.errors += 1
+        failed = [task for task in attempts if not task.cancelled()]
+        if not failed:
+            raise asyncio.CancelledError()
+        error = failed[0].exception()
+        if isinstance(error, httpx.TimeoutException):
+            _record_slow_failure(stats, time.monotonic() - start, timed_out=True)
+        raise error
+    except asyncio.CancelledError:
+        # Cancelled by the caller (e.g. the route deadline)
+        _record_slow_failure(stats, time.monotonic() - start, timed_out=False)
+        raise
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
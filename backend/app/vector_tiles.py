@@ -0,0 +1,280 @@
+"""Mapbox Vector Tiles (MVT 2.1) for the transit overlay.
+
+/transit-lines ships the whole network as one GeoJSON document. Here the same
+overlay (`app_state["transit_lines"]`) is cut into z/x/y tiles with two
+layers, "lines" and "stations", so the map only loads what is in view:
+- coordinates are projected to Web Mercator once per overlay;
+- line geometry is Douglas–Peucker simplified once per zoom, to
+  SIMPLIFY_TOLERANCE tile units (below what a tile can show), then clipped
+  to each tile plus a BUFFER so strokes don't seam at tile edges;
+- stations are included from STATION_MIN_ZOOM up;
+- tiles are generated lazily (worker thread) and kept in an LRU of
+  TILE_CACHE_SIZE pre-compressed payloads; everything is rebuilt when the
+  overlay object in app_state is replaced.
+
+The protobuf encoding is hand-rolled (varints and length-delimited fields of
+the vector_tile.proto schema), so no extra dependency is needed.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.encoded_responses import EncodedPayload
+from app.geometry import clip_line, douglas_peucker, lnglat_to_mercator
+
+logger = logging.getLogger("fluxroute.tiles")
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+EXTENT = 4096
+BUFFER = 64  # Tile units drawn beyond each edge
+SIMPLIFY_TOLERANCE = 2.0  # Tile units (1/8 px on a 256 px tile)
+MAX_ZOOM = 22
+MAX_SIMPLIFY_ZOOM = 16  # Deeper zooms reuse this zoom's geometry
+STATION_MIN_ZOOM = 11
+TILE_CACHE_SIZE = 4096
+
+# Geometry types and commands from the MVT spec
+_POINT, _LINESTRING = 1, 2
+_MOVE_TO, _LINE_TO = 1, 2
+
+
+# --- Protobuf writer ---
+
+def _varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _field_varint(field: int, value: int, out: bytearray) -> None:
+    _varint(field << 3, out)
+    _varint(value, out)
+
+
+def _field_bytes(field: int, data: bytes, out: bytearray) -> None:
+    _varint((field << 3) | 2, out)
+    _varint(len(data), out)
+    out += data
+
+
+def _packed(values: list[int]) -> bytes:
+    out = bytearray()
+    for value in values:
+        _varint(value, out)
+    return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+class _Layer:
+    """One MVT layer: features plus the shared key/value tables."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.keys: dict[str, int] = {}
+        self.values: dict[str, int] = {}
+        self.features: list[bytes] = []
+
+    def add(self, geom_type: int, geometry: list[int], properties: dict) -> None:
+        tags = []
+        for key, value in properties.items():
+            if value is None or value == "":
+                continue
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault(str(value), len(self.values)))
+        feature = bytearray()
+        _field_bytes(2, _packed(tags), feature)
+        _field_varint(3, geom_type, feature)
+        _field_bytes(4, _packed(geometry), feature)
+        self.features.append(bytes(feature))
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        _field_varint(15, 2, out)  # version
+        _field_bytes(1, self.name.encode("utf-8"), out)
+        for feature in self.features:
+            _field_bytes(2, feature, out)
+        for key in self.keys:
+            _field_bytes(3, key.encode("utf-8"), out)
+        for value in self.values:
+            string_value = bytearray()
+            _field_bytes(1, value.encode("utf-8"), string_value)
+            _field_bytes(4, bytes(string_value), out)
+        _field_varint(5, EXTENT, out)
+        return bytes(out)
+
+
+def _line_geometry(parts: list[list[tuple[int, int]]]) -> list[int]:
+    """MoveTo/LineTo command stream for integer tile-coordinate polylines."""
+    geometry: list[int] = []
+    cx = cy = 0
+    for part in parts:
+        deduped = [part[0]] + [p for prev, p in zip(part, part[1:]) if p != prev]
+        if len(deduped) < 2:
+            continue
+        x, y = deduped[0]
+        geometry += [_command(_MOVE_TO, 1), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        geometry.append(_command(_LINE_TO, len(deduped) - 1))
+        for x, y in deduped[1:]:
+            geometry += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+    return geometry
+
+
+# --- Tiling ---
+
+def _bbox(points: list[tuple[float, float]]) -> tuple[float, float, float, float]:
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class TransitTiles:
+    """The overlay projected to Web Mercator, with per-zoom geometry and a tile LRU."""
+
+    def __init__(self, overlay: dict):
+        self.overlay = overlay
+        self.lines: list[tuple[dict, list[tuple[float, float]]]] = []
+        self.stations: list[tuple[dict, tuple[float, float]]] = []
+
+        for feature in (overlay.get("lines") or {}).get("features", []):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "LineString":
+                paths = [geometry.get("coordinates") or []]
+            elif geometry.get("type") == "MultiLineString":
+                paths = geometry.get("coordinates") or []
+            else:
+                continue
+            for path in paths:
+                points = [lnglat_to_mercator(c[0], c[1]) for c in path]
+                if len(points) >= 2:
+                    self.lines.append((feature.get("properties") or {}, points))
+
+        for feature in (overlay.get("stations") or {}).get("features", []):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Point" and geometry.get("coordinates"):
+                lng, lat = geometry["coordinates"][:2]
+                self.stations.append((feature.get("properties") or {}, lnglat_to_mercator(lng, lat)))
+
+        self._zoom_lines: dict[int, list] = {}
+        self._tiles: OrderedDict[tuple[int, int, int], EncodedPayload] = OrderedDict()
+        self._lock = threading.Lock()  # Tile LRU (also read from the event loop)
+        self._zoom_lock = threading.Lock()  # Per-zoom simplification
+        self.hits = 0
+        self.builds = 0
+
+    def _lines_at(self, z: int) -> list[tuple[dict, list, tuple]]:
+        """(properties, simplified points, bbox) per line for zoom `z`."""
+        z = min(z, MAX_SIMPLIFY_ZOOM)
+        lines = self._zoom_lines.get(z)
+        if lines is None:
+            tolerance = SIMPLIFY_TOLERANCE / (EXTENT * (1 << z))
+            lines = []
+            for props, points in self.lines:
+                simplified = douglas_peucker(points, tolerance)
+                lines.append((props, simplified, _bbox(simplified)))
+            self._zoom_lines[z] = lines
+        return lines
+
+    def cached(self, z: int, x: int, y: int) -> Optional[EncodedPayload]:
+        with self._lock:
+            payload = self._tiles.get((z, x, y))
+            if payload is not None:
+                self._tiles.move_to_end((z, x, y))
+                self.hits += 1
+            return payload
+
+    def tile(self, z: int, x: int, y: int) -> EncodedPayload:
+        """Encoded tile z/x/y (from the LRU, or built and cached)."""
+        payload = self.cached(z, x, y)
+        if payload is not None:
+            return payload
+
+        payload = EncodedPayload(self._encode(z, x, y), media_type=MVT_MEDIA_TYPE)
+        with self._lock:
+            self._tiles[(z, x, y)] = payload
+            self.builds += 1
+            while len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        return payload
+
+    def _encode(self, z: int, x: int, y: int) -> bytes:
+        scale = 1 << z
+        pad = BUFFER / EXTENT
+        # Tile (plus buffer) in normalized Mercator units
+        west, north = (x - pad) / scale, (y - pad) / scale
+        east, south = (x + 1 + pad) / scale, (y + 1 + pad) / scale
+
+        def to_tile(p: tuple[float, float]) -> tuple[float, float]:
+            return (p[0] * scale - x) * EXTENT, (p[1] * scale - y) * EXTENT
+
+        with self._zoom_lock:
+            lines = self._lines_at(z)
+        line_layer = _Layer("lines")
+        for props, points, (minx, miny, maxx, maxy) in lines:
+            if maxx < west or minx > east or maxy < north or miny > south:
+                continue
+            local = [to_tile(p) for p in points]
+            parts = clip_line(local, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+            geometry = _line_geometry([[(round(px), round(py)) for px, py in part] for part in parts])
+            if geometry:
+                line_layer.add(_LINESTRING, geometry, props)
+
+        station_layer = _Layer("stations")
+        if z >= STATION_MIN_ZOOM:
+            for props, point in self.stations:
+                if west <= point[0] <= east and north <= point[1] <= south:
+                    px, py = to_tile(point)
+                    geometry = [_command(_MOVE_TO, 1), _zigzag(round(px)), _zigzag(round(py))]
+                    station_layer.add(_POINT, geometry, props)
+
+        out = bytearray()
+        for layer in (line_layer, station_layer):
+            if layer.features:
+                _field_bytes(3, layer.encode(), out)
+        return bytes(out)
+
+    def stats(self) -> dict:
+        return {
+            "lines": len(self.lines),
+            "stations": len(self.stations),
+            "cached_tiles": len(self._tiles),
+            "hits": self.hits,
+            "builds": self.builds,
+        }
+
+
+_current: Optional[TransitTiles] = None
+_build_lock = threading.Lock()
+
+
+def cached_transit_tiles(overlay: dict) -> Optional[TransitTiles]:
+    """The tiler for `overlay` if it is already built."""
+    current = _current
+    return current if current is not None and current.overlay is overlay else None
+
+
+def build_transit_tiles(overlay: dict) -> TransitTiles:
+    """Project `overlay` for tiling (blocking — call from a worker thread)."""
+    global _current
+    with _build_lock:
+        current = cached_transit_tiles(overlay)
+        if current is None:
+            current = TransitTiles(overlay)
+            _current = current
+            logger.info(f"Vector tiles ready: {len(current.lines)} line paths, {len(current.stations)} stations")
+        return current
+
+
+def transit_tile_stats() -> Optional[dict]:
+    return _current.stats() if _current is not None else None
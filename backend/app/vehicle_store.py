@@ -0,0 +1,162 @@
+"""Columnar store for realtime vehicle positions with a spatial grid index.
+
+Each poll's vehicles are held as parallel NumPy arrays (id, route, lat, lon,
+bearing, speed, timestamp) instead of a list of Pydantic objects, built once
+in the decoder's worker thread. Two indexes are built with it:
+- a uniform lat/lng grid (GRID_DEG cells): positions sorted by cell key, so
+  each cell is a contiguous slice found by binary search;
+- route_id -> row indices.
+
+`query(bbox, route_ids)` narrows with whichever index is smaller, then
+filters the candidates exactly; `to_dicts()` serializes only those rows.
+The store is immutable once built, so readers never see a partial update.
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+GRID_DEG = 0.01  # ~1.1 km north-south, ~0.8 km east-west in Toronto
+MAX_GRID_CELLS = 256  # Larger boxes use one vectorized mask instead of per-cell slices
+_LNG_CELLS = 1 << 20  # Column count for packing (row, col) into one int64 key
+
+
+def _cell_keys(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    rows = np.floor(lat / GRID_DEG).astype(np.int64)
+    cols = np.floor(lon / GRID_DEG).astype(np.int64)
+    return rows * _LNG_CELLS + (cols % _LNG_CELLS)
+
+
+class VehicleStore:
+    """Immutable columnar snapshot of vehicle positions; see the module docstring."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        routes: np.ndarray,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        bearing: np.ndarray,
+        speed: np.ndarray,
+        timestamp: np.ndarray,
+    ):
+        self.ids = ids
+        self.routes = routes
+        self.lat = lat
+        self.lon = lon
+        self.bearing = bearing
+        self.speed = speed
+        self.timestamp = timestamp
+
+        keys = _cell_keys(lat, lon)
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+        self.route_index: dict[str, np.ndarray] = {}
+        if len(routes):
+            unique, inverse = np.unique(routes.astype(str), return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+            for i, route_id in enumerate(unique):
+                if route_id != "None":
+                    self.route_index[str(route_id)] = order[bounds[i]:bounds[i + 1]]
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> "VehicleStore":
+        """Build from (vehicle_id, route_id, lat, lon, bearing, speed, timestamp) tuples."""
+        if not rows:
+            return cls.empty()
+        ids, routes, lat, lon, bearing, speed, ts = zip(*rows)
+        return cls(
+            np.array(ids, dtype=object),
+            np.array(routes, dtype=object),
+            np.array(lat, dtype=np.float64),
+            np.array(lon, dtype=np.float64),
+            np.array([np.nan if b is None else b for b in bearing], dtype=np.float32),
+            np.array([np.nan if s is None else s for s in speed], dtype=np.float32),
+            np.array([0 if t is None else t for t in ts], dtype=np.int64),
+        )
+
+    @classmethod
+    def from_positions(cls, vehicles: Iterable) -> "VehicleStore":
+        """Build from VehiclePosition models (e.g. mock data)."""
+        return cls.from_rows([
+            (v.vehicle_id, v.route_id, v.latitude, v.longitude, v.bearing, v.speed, v.timestamp)
+            for v in vehicles
+        ])
+
+    @classmethod
+    def empty(cls) -> "VehicleStore":
+        obj = np.array([], dtype=object)
+        f64 = np.array([], dtype=np.float64)
+        f32 = np.array([], dtype=np.float32)
+        return cls(obj, obj.copy(), f64, f64.copy(), f32, f32.copy(), np.array([], dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _in_bbox(self, west: float, south: float, east: float, north: float) -> np.ndarray:
+        row0, row1 = int(np.floor(south / GRID_DEG)), int(np.floor(north / GRID_DEG))
+        col0, col1 = int(np.floor(west / GRID_DEG)), int(np.floor(east / GRID_DEG))
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > MAX_GRID_CELLS:
+            candidates = np.arange(len(self))
+        else:
+            # Each grid row's cells are contiguous in key order: one slice per row
+            slices = []
+            for row in range(row0, row1 + 1):
+                lo = np.searchsorted(self._sorted_keys, row * _LNG_CELLS + (col0 % _LNG_CELLS), side="left")
+                hi = np.searchsorted(self._sorted_keys, row * _LNG_CELLS + (col1 % _LNG_CELLS), side="right")
+                if hi > lo:
+                    slices.append(self._order[lo:hi])
+            if not slices:
+                return np.array([], dtype=np.int64)
+            candidates = np.concatenate(slices)
+
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return candidates[inside]
+
+    def query(
+        self,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        route_ids: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """Row indices inside `bbox` (west, south, east, north) and on any of `route_ids`."""
+        if route_ids is not None:
+            parts = [self.route_index[r] for r in route_ids if r in self.route_index]
+            by_route = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+            if bbox is None:
+                return by_route
+            west, south, east, north = bbox
+            lat, lon = self.lat[by_route], self.lon[by_route]
+            return by_route[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+        if bbox is not None:
+            return np.sort(self._in_bbox(*bbox))
+        return np.arange(len(self))
+
+    def to_dicts(self, indices: Optional[np.ndarray] = None) -> list[dict]:
+        """VehiclePosition-shaped dicts for the given rows (all rows by default)."""
+        if indices is None:
+            indices = np.arange(len(self))
+        bearing = self.bearing[indices]
+        speed = self.speed[indices]
+        return [
+            {
+                "vehicle_id": vid, "route_id": route_id, "latitude": lat, "longitude": lon,
+                "bearing": None if b != b else round(b, 1),  # NaN -> None
+                "speed": None if s != s else round(s, 1),
+                "timestamp": ts or None,
+            }
+            for vid, route_id, lat, lon, b, s, ts in zip(
+                self.ids[indices].tolist(), self.routes[indices].tolist(),
+                self.lat[indices].tolist(), self.lon[indices].tolist(),
+                bearing.tolist(), speed.tolist(), self.timestamp[indices].tolist(),
+            )
+        ]
+
+    def positions_by_route(self) -> dict[str, list[tuple[float, float]]]:
+        """route_id -> [(lat, lon), ...] for every vehicle with a route."""
+        return {
+            route_id: list(zip(self.lat[idx].tolist(), self.lon[idx].tolist()))
+            for route_id, idx in self.route_index.items()
+        }
@@ -3,6 +3,9 @@ from typing import Optional
 
 import httpx
 
+from app.deadline import Deadline, should_skip, timeout_for
+from app.upstream import get_http_client
+
 logger = logging.getLogger("fluxroute.weather")
 
 # Toronto default coordinates
@@ -14,12 +17,17 @@ async def get_current_weather(
     lat: Optional[float] = None,
     lng: Optional[float] = None,
     http_client: Optional[httpx.AsyncClient] = None,
+    deadline: Optional[Deadline] = None,
 ) -> dict:
     """Fetch current weather from Open-Meteo API (no API key needed)."""
     lat = lat or DEFAULT_LAT
     lng = lng or DEFAULT_LNG
 
     try:
+        if should_skip(deadline, "weather"):
+            raise TimeoutError("request deadline exhausted")
+
+        timeout = timeout_for(deadline, 3.0)
         url = (
             f"https://api.open-meteo.com/v1/forecast"
             f"?latitude={lat}&longitude={lng}"
@@ -27,15 +35,10 @@ async def get_current_weather(
             f"&timezone=America/Toronto"
         )
 
-        if http_client:
-            resp = await http_client.get(url, timeout=3.0)
-            resp.raise_for_status()
-            data = resp.json()
-        else:
-            async with httpx.AsyncClient(timeout=3.0) as client:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                data = resp.json()
+        client = http_client or get_http_client()
+        resp = await client.get(url, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
 
         current = data.get("current", {})
 
@@ -67,6 +70,8 @@ async def get_current_weather(
 
     except Exception as e:
         logger.warning(f"Weather API failed, using defaults: {e}")
+        if deadline:
+            deadline.degrade("weather")
         return {
             "temperature": 2.0,
             "precipitation": 0.0,
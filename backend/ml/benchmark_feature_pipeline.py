@@ -0,0 +1,134 @@
+"""Benchmark: training-prep time of the vectorized feature pipeline.
+
+Runs the weather join and feature engineering on the combined 2022–2025
+delay dataset (data/ttc-all-delay-data.parquet or .csv) two ways and checks they agree:
+- "row-wise": the previous implementation — an iterrows() loop to attach
+  weather and per-row apply() for hour, season, rush-hour and weekend;
+- "vectorized": enrich_weather_data.attach_weather (one merge) followed by
+  feature_engineering.engineer_features (whole-column operations).
+
+Weather is synthesized for every day in the data so no API calls are made.
+
+Usage:
+    python -m ml.benchmark_feature_pipeline [--rows N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from ml.enrich_weather_data import _default_weather, attach_weather
+from ml.cache import find_dataset, read_frame
+from ml.feature_engineering import ORIGINAL_NAME, engineer_features, get_season
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.ml.benchmark")
+
+_TIME_FEATURES = ["hour", "season", "is_rush_hour", "is_weekend"]
+
+
+def _synthetic_weather(dates: pd.Series) -> dict[str, dict]:
+    days = pd.to_datetime(dates, errors="coerce", format="mixed").dropna()
+    rng = np.random.default_rng(42)
+    weather = {}
+    for day in pd.date_range(days.min(), days.max(), freq="D").strftime("%Y-%m-%d"):
+        weather[day] = {
+            "temperature_mean": float(rng.normal(8, 10)),
+            "temperature_max": float(rng.normal(13, 10)),
+            "temperature_min": float(rng.normal(3, 10)),
+            "precipitation_sum": float(rng.exponential(2)),
+            "snowfall_sum": float(rng.exponential(0.5)),
+            "wind_speed_max": float(rng.normal(20, 6)),
+        }
+    return weather
+
+
+def _row_wise_weather(df: pd.DataFrame, weather_cache: dict[str, dict], date_col: str) -> pd.DataFrame:
+    """The previous iterrows() join (keys normalized the same way for a fair comparison)."""
+    day_keys = pd.to_datetime(df[date_col], errors="coerce", format="mixed").dt.strftime("%Y-%m-%d")
+    weather_rows = []
+    for i, _row in df.iterrows():
+        weather_rows.append(weather_cache.get(day_keys[i], _default_weather()))
+    weather_df = pd.DataFrame(weather_rows)
+    return pd.concat([df.reset_index(drop=True), weather_df.reset_index(drop=True)], axis=1)
+
+
+def _parse_hour(time_str) -> int:
+    try:
+        s = str(time_str).strip()
+        hour = int(s.split(":")[0])
+        if "PM" in s.upper() and hour != 12:
+            hour += 12
+        elif "AM" in s.upper() and hour == 12:
+            hour = 0
+        return hour % 24
+    except (ValueError, IndexError):
+        return 12
+
+
+def _row_wise_time_features(df: pd.DataFrame, time_col: str, date_col: str) -> pd.DataFrame:
+    """The previous apply()-based time features."""
+    out = pd.DataFrame(index=df.index)
+    parsed = pd.to_datetime(df[date_col], errors="coerce", format="mixed")
+    out["hour"] = df[time_col].apply(_parse_hour)
+    out["season"] = parsed.dt.month.apply(lambda m: get_season(m) if m == m else 4)
+    out["is_rush_hour"] = out["hour"].apply(lambda h: 1 if (7 <= h <= 9 or 17 <= h <= 19) else 0)
+    out["is_weekend"] = parsed.dt.dayofweek.apply(lambda d: 1 if d >= 5 else 0)
+    return out[parsed.notna()]
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=0, help="Use only the first N rows (0 = all)")
+    args = parser.parse_args()
+
+    path = find_dataset(ORIGINAL_NAME)
+    if path is None:
+        logger.error(f"No {ORIGINAL_NAME} dataset found. Run `python -m ml.combine_all_data` first.")
+        return
+
+    raw, read_s = _timed(read_frame, path)
+    if args.rows:
+        raw = raw.head(args.rows)
+    date_col = "date" if "date" in raw.columns else "Date"
+    time_col = "time" if "time" in raw.columns else "Time"
+    weather_cache = _synthetic_weather(raw[date_col])
+    logger.info(f"{len(raw):,} rows, {len(weather_cache):,} days of weather (read {read_s:.2f}s)")
+
+    old_joined, old_join_s = _timed(_row_wise_weather, raw, weather_cache, date_col)
+    new_joined, new_join_s = _timed(attach_weather, raw, weather_cache, date_col)
+    weather_cols = list(_default_weather())
+    assert np.allclose(old_joined[weather_cols].values, new_joined[weather_cols].values), "Weather join mismatch"
+
+    old_time, old_time_s = _timed(_row_wise_time_features, new_joined, time_col, date_col)
+    (X, *_), new_features_s = _timed(engineer_features, new_joined.copy())
+    mismatched = [c for c in _TIME_FEATURES if c in X.columns and not (old_time.loc[X.index, c].values == X[c].values).all()]
+    assert not mismatched, f"Time feature mismatch: {mismatched}"
+
+    logger.info("Stage                   row-wise   vectorized   speedup")
+    logger.info(f"Weather join          {old_join_s:9.2f}s  {new_join_s:10.2f}s  {old_join_s / new_join_s:7.1f}x")
+    logger.info(
+        f"Time features         {old_time_s:9.2f}s  {new_features_s:10.2f}s  {old_time_s / new_features_s:7.1f}x"
+        "  (vectorized = all features)"
+    )
+    # Row-wise prep = the same column encodings plus the row-wise stages
+    # (slightly overcounts: the vectorized time features are included too)
+    old_total = read_s + old_join_s + old_time_s + new_features_s
+    new_total = read_s + new_join_s + new_features_s
+    logger.info(f"End-to-end prep       {old_total:9.2f}s  {new_total:10.2f}s  {old_total / new_total:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
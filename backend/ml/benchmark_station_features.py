@@ -0,0 +1,139 @@
+"""Benchmark: station-level features in online predictions.
+
+Compares the two ways the backend can feed the trained model:
+- "zeroed": station, bound, incident code and min_gap all sent as 0 (how
+  predictions were served before the encoders were saved with the model);
+- "encoded": station and bound encoded with the saved encoders, min_gap set
+  to the station's median, incident code 0 — what DelayPredictor sends now.
+
+Accuracy is measured on the same held-out 20% split train_model.py uses.
+Latency is measured through DelayPredictor.predict_batch for a typical
+route request: one station-less row per leg (lookup-table hits) versus one
+row per station along each leg. Per-station rows are served from the
+predictor's output cache once seen, so they are timed cold (cache cleared
+before every call — the model cost) and warm (a repeated request).
+
+Usage:
+    python -m ml.benchmark_station_features [--legs 2] [--stations 12] [--repeat 200]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import accuracy_score, brier_score_loss, f1_score, mean_absolute_error
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from app.ml_predictor import DelayPredictor
+from ml.feature_engineering import load_and_engineer_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.ml.benchmark")
+
+
+def _score(name: str, classifier, regressor, X: np.ndarray, y_cls: np.ndarray, y_reg: np.ndarray) -> dict:
+    proba = classifier.predict_proba(X)[:, 1]
+    pred = (proba >= 0.5).astype(int)
+    metrics = {
+        "accuracy": accuracy_score(y_cls, pred),
+        "f1": f1_score(y_cls, pred, zero_division=0),
+        "brier": brier_score_loss(y_cls, proba),
+        "mae": mean_absolute_error(y_reg, np.maximum(0.0, regressor.predict(X))),
+    }
+    logger.info(
+        f"  {name:<8} accuracy={metrics['accuracy']:.4f}  F1={metrics['f1']:.4f}  "
+        f"Brier={metrics['brier']:.4f}  MAE={metrics['mae']:.2f} min"
+    )
+    return metrics
+
+
+def benchmark_accuracy(predictor: DelayPredictor) -> None:
+    """Score the served feature vectors against held-out real delays."""
+    X, y_class, y_reg, feature_cols, _ = load_and_engineer_features(return_encoders=True)
+    if list(feature_cols) != list(predictor.feature_cols):
+        logger.error(f"Model features {predictor.feature_cols} do not match the data {feature_cols}; retrain first")
+        return
+
+    _, X_test, _, y_cls_test, _, y_reg_test = train_test_split(
+        X.values, y_class.values, y_reg.values,
+        test_size=0.20, random_state=42, stratify=y_class.values,
+    )
+    col = {name: i for i, name in enumerate(feature_cols)}
+
+    zeroed = X_test.astype(np.float32)
+    for name in ("station_encoded", "bound_encoded", "code_encoded", "min_gap"):
+        zeroed[:, col[name]] = 0
+
+    encoded = X_test.astype(np.float32)
+    encoded[:, col["code_encoded"]] = 0
+    gaps = predictor.encoders.get("min_gap_by_station")
+    stations = encoded[:, col["station_encoded"]].astype(int)
+    encoded[:, col["min_gap"]] = np.asarray(gaps)[np.clip(stations, 0, len(gaps) - 1)] if gaps else 0
+
+    logger.info(f"Held-out accuracy ({len(X_test):,} rows):")
+    before = _score("zeroed", predictor.classifier, predictor.regressor, zeroed, y_cls_test, y_reg_test)
+    after = _score("encoded", predictor.classifier, predictor.regressor, encoded, y_cls_test, y_reg_test)
+    logger.info(
+        f"  gain     accuracy={after['accuracy'] - before['accuracy']:+.4f}  "
+        f"F1={after['f1'] - before['f1']:+.4f}  Brier={after['brier'] - before['brier']:+.4f}  "
+        f"MAE={after['mae'] - before['mae']:+.2f} min"
+    )
+
+
+def benchmark_latency(predictor: DelayPredictor, legs: int, stations: int, repeat: int) -> None:
+    """Time one route's predictions with and without per-station rows."""
+    station_names = list((predictor.encoders.get("station") or {}).keys()) or ["Union", "Bloor-Yonge"]
+    base = dict(line="1", hour=8, day_of_week=1, month=1, temperature=-5.0, precipitation=2.0, mode="subway")
+
+    per_leg = [dict(base, line=str(leg % 2 + 1)) for leg in range(legs)]
+    per_station = [
+        dict(row, station=station_names[i % len(station_names)], bound="N")
+        for row in per_leg for i in range(stations)
+    ]
+
+    logger.info(f"Latency per route ({legs} legs, {stations} stations/leg, {repeat} runs):")
+    for name, requests in (("per-leg", per_leg), ("per-station", per_station)):
+        cold = 0.0
+        for _ in range(repeat):
+            predictor.clear_output_cache()
+            start = time.perf_counter()
+            predictor.predict_batch(requests)
+            cold += time.perf_counter() - start
+
+        predictor.predict_batch(requests)  # Warm up the cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predictor.predict_batch(requests)
+        warm = time.perf_counter() - start
+
+        logger.info(
+            f"  {name:<12} {len(requests):>3} rows  cold {cold * 1000 / repeat:.3f} ms  "
+            f"warm {warm * 1000 / repeat:.3f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legs", type=int, default=2)
+    parser.add_argument("--stations", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    predictor = DelayPredictor()
+    predictor.load()
+    if predictor.mode != "ml":
+        logger.error("No trained model found. Run `python -m ml.train_model` first.")
+        return
+    if not predictor.encoders:
+        logger.warning("Model was saved without encoders — retrain to get station-level features")
+
+    benchmark_accuracy(predictor)
+    benchmark_latency(predictor, args.legs, args.stations, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Content-hash cache for the ML pipeline's intermediate datasets.
+
+Each stage (parsing a raw download, combining, weather enrichment, feature
+engineering) is keyed by the SHA-256 of its input files — including the
+source file of the code that computes it — plus any parameters. When the
+key matches the manifest, the stored output is read back instead of
+recomputed. Outputs are Parquet when pyarrow is installed, CSV otherwise.
+
+File digests are memoized by (mtime, size), so unchanged inputs are not
+re-hashed on every run. Every stage's wall time (and whether it was a
+cache hit) is collected for report_timings().
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+from typing import Callable, Optional, Union
+
+import pandas as pd
+
+logger = logging.getLogger("fluxroute.ml.cache")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+FORMAT_EXT = ".parquet" if PARQUET_AVAILABLE else ".csv"
+
+# (stage, seconds, cache hit) for every stage run in this process
+TIMINGS: list[tuple[str, float, bool]] = []
+
+StageResult = Union[pd.DataFrame, tuple[pd.DataFrame, dict]]
+
+
+def dataset_path(name: str, directory: str = DATA_DIR) -> str:
+    """Where to write dataset `name` in the preferred format."""
+    return os.path.join(directory, name + FORMAT_EXT)
+
+
+def find_dataset(name: str, directory: str = DATA_DIR) -> Optional[str]:
+    """Existing copy of dataset `name`: Parquet if present (and readable), else CSV."""
+    for ext in ((".parquet", ".csv") if PARQUET_AVAILABLE else (".csv",)):
+        path = os.path.join(directory, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_frame(df: pd.DataFrame, path: str) -> None:
+    """Write atomically. Object columns holding mixed types (e.g. numeric
+    vehicle IDs next to text) are stored as strings so Parquet accepts them."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if path.endswith(".parquet"):
+        out = df.copy()
+        for col in out.columns[out.dtypes == object]:
+            out[col] = out[col].where(out[col].isna(), out[col].astype(str))
+        out.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _load_manifest() -> dict:
+    if os.path.exists(MANIFEST_PATH):
+        try:
+            with open(MANIFEST_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache manifest: {e}")
+    return {"files": {}, "stages": {}}
+
+
+def _save_manifest(manifest: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def file_digest(path: str, manifest: Optional[dict] = None) -> str:
+    """SHA-256 of a file's contents, reused while its mtime and size are unchanged."""
+    manifest = manifest if manifest is not None else _load_manifest()
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    memo = manifest["files"].get(key)
+    if memo and memo["mtime_ns"] == stat.st_mtime_ns and memo["size"] == stat.st_size:
+        return memo["sha256"]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    manifest["files"][key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": h.hexdigest()}
+    return h.hexdigest()
+
+
+def cached_stage(
+    name: str,
+    inputs: list[str],
+    output: str,
+    compute: Callable[[], StageResult],
+    params: Optional[dict] = None,
+) -> tuple[pd.DataFrame, dict]:
+    """Run (or reuse) one pipeline stage; returns (frame, meta).
+
+    `output` is a path without extension. `compute` returns the frame, or
+    (frame, meta) where meta is a JSON-serializable dict stored alongside.
+    """
+    start = time.perf_counter()
+    manifest = _load_manifest()
+    h = hashlib.sha256(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    for path in inputs:
+        h.update(os.path.basename(path).encode())
+        h.update(file_digest(path, manifest).encode())
+    key = h.hexdigest()
+
+    entry = manifest["stages"].get(name)
+    if entry and entry["key"] == key and os.path.exists(entry["output"]):
+        df = read_frame(entry["output"])
+        _record(name, start, hit=True)
+        _save_manifest(manifest)  # Keep any refreshed file digests
+        return df, entry.get("meta", {})
+
+    result = compute()
+    df, meta = result if isinstance(result, tuple) else (result, {})
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    path = output + FORMAT_EXT
+    write_frame(df, path)
+
+    manifest["stages"][name] = {"key": key, "output": path, "rows": len(df), "meta": meta}
+    manifest["files"].pop(os.path.abspath(path), None)
+    _save_manifest(manifest)
+    _record(name, start, hit=False)
+    return df, meta
+
+
+def cached_frame(
+    name: str, inputs: list[str], output: str, compute: Callable[[], pd.DataFrame], params: Optional[dict] = None,
+) -> pd.DataFrame:
+    """cached_stage for stages without metadata."""
+    return cached_stage(name, inputs, output, compute, params)[0]
+
+
+def _record(name: str, start: float, hit: bool) -> None:
+    seconds = time.perf_counter() - start
+    TIMINGS.append((name, seconds, hit))
+    logger.info(f"[{name}] {'cached' if hit else 'computed'} in {seconds:.2f}s")
+
+
+def report_timings() -> None:
+    """Log every stage run in this process with its time and cache status."""
+    if not TIMINGS:
+        return
+    logger.info("Stage timings:")
+    for name, seconds, hit in TIMINGS:
+        logger.info(f"  {name:<32} {seconds:8.2f}s  {'cache hit' if hit else 'recomputed'}")
+    logger.info(f"  {'total':<32} {sum(t[1] for t in TIMINGS):8.2f}s")
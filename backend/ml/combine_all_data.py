@@ -15,14 +15,19 @@ Data source: City of Toronto Open Data Portal
 
 import logging
 import os
+import sys
 
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from ml.cache import CACHE_DIR, DATA_DIR, cached_frame, dataset_path, report_timings
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("fluxroute.ml.combine")
 
-RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "raw_downloads")
-OUTPUT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "ttc-all-delay-data.csv")
+RAW_DIR = os.path.join(DATA_DIR, "raw_downloads")
+OUTPUT_NAME = "ttc-all-delay-data"
+OUTPUT_PATH = dataset_path(OUTPUT_NAME)
 
 
 def _load_subway_xlsx(path: str) -> pd.DataFrame:
@@ -136,59 +141,23 @@ def _load_bus_csv_2025(path: str) -> pd.DataFrame:
     })
 
 
-def combine():
-    """Load all raw files and combine into unified CSV."""
-    all_frames = []
-
-    # --- Subway ---
-    for year in [2022, 2023, 2024]:
-        path = os.path.join(RAW_DIR, f"subway-{year}.xlsx")
-        if os.path.exists(path):
-            df = _load_subway_xlsx(path)
-            logger.info(f"Subway {year}: {len(df)} rows")
-            all_frames.append(df)
-
-    path_2025 = os.path.join(RAW_DIR, "subway-2025.csv")
-    if os.path.exists(path_2025):
-        df = _load_subway_csv_2025(path_2025)
-        logger.info(f"Subway 2025: {len(df)} rows")
-        all_frames.append(df)
-
-    # --- Streetcar ---
-    for year in [2022, 2023, 2024]:
-        path = os.path.join(RAW_DIR, f"streetcar-{year}.xlsx")
-        if os.path.exists(path):
-            df = _load_streetcar_xlsx(path)
-            logger.info(f"Streetcar {year}: {len(df)} rows")
-            all_frames.append(df)
+# (file name, loader, log label) for every raw download, in combine order
+RAW_SOURCES = [
+    *[(f"subway-{year}.xlsx", _load_subway_xlsx, f"Subway {year}") for year in (2022, 2023, 2024)],
+    ("subway-2025.csv", _load_subway_csv_2025, "Subway 2025"),
+    *[(f"streetcar-{year}.xlsx", _load_streetcar_xlsx, f"Streetcar {year}") for year in (2022, 2023, 2024)],
+    ("streetcar-2025.csv", _load_streetcar_csv_2025, "Streetcar 2025"),
+    *[(f"bus-{year}.xlsx", _load_bus_xlsx, f"Bus {year}") for year in (2022, 2023, 2024)],
+    ("bus-2025.csv", _load_bus_csv_2025, "Bus 2025"),
+]
 
-    path_2025 = os.path.join(RAW_DIR, "streetcar-2025.csv")
-    if os.path.exists(path_2025):
-        df = _load_streetcar_csv_2025(path_2025)
-        logger.info(f"Streetcar 2025: {len(df)} rows")
-        all_frames.append(df)
-
-    # --- Bus ---
-    for year in [2022, 2023, 2024]:
-        path = os.path.join(RAW_DIR, f"bus-{year}.xlsx")
-        if os.path.exists(path):
-            df = _load_bus_xlsx(path)
-            logger.info(f"Bus {year}: {len(df)} rows")
-            all_frames.append(df)
-
-    path_2025 = os.path.join(RAW_DIR, "bus-2025.csv")
-    if os.path.exists(path_2025):
-        df = _load_bus_csv_2025(path_2025)
-        logger.info(f"Bus 2025: {len(df)} rows")
-        all_frames.append(df)
-
-    if not all_frames:
-        logger.error("No data files found!")
-        return
 
-    combined = pd.concat(all_frames, ignore_index=True)
+def clean_combined(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate loaded frames, drop undated rows, zero-fill gaps, sort by date."""
+    combined = pd.concat(frames, ignore_index=True)
 
-    # Clean up
+    # Clean up (dates come back as text from a CSV-format cache)
+    combined["date"] = pd.to_datetime(combined["date"], errors="coerce")
     combined = combined.dropna(subset=["date"])
     combined["min_delay"] = combined["min_delay"].fillna(0)
     combined["min_gap"] = combined["min_gap"].fillna(0)
@@ -196,8 +165,42 @@ def combine():
     # Sort by date
     combined = combined.sort_values("date").reset_index(drop=True)
 
-    # Format date as string for CSV
+    # Format date as string (same as the original CSV output)
     combined["date"] = combined["date"].dt.strftime("%Y-%m-%d")
+    return combined
+
+
+def combine():
+    """Load all raw files and combine into one unified dataset.
+
+    Each raw file's parsed frame is cached by content hash, so only new or
+    changed downloads are parsed again (XLSX parsing dominates this stage).
+    """
+    sources = [
+        (filename, loader, label, os.path.join(RAW_DIR, filename))
+        for filename, loader, label in RAW_SOURCES
+        if os.path.exists(os.path.join(RAW_DIR, filename))
+    ]
+    if not sources:
+        logger.error("No data files found!")
+        return
+
+    def _combine_sources() -> pd.DataFrame:
+        all_frames = []
+        for filename, loader, label, path in sources:
+            df = cached_frame(
+                f"raw:{filename}", [path, __file__],
+                os.path.join(CACHE_DIR, "raw-" + os.path.splitext(filename)[0]),
+                lambda loader=loader, path=path: loader(path),
+            )
+            logger.info(f"{label}: {len(df)} rows")
+            all_frames.append(df)
+        return clean_combined(all_frames)
+
+    combined = cached_frame(
+        "combined", [path for *_, path in sources] + [__file__],
+        os.path.join(DATA_DIR, OUTPUT_NAME), _combine_sources,
+    )
 
     logger.info(f"\n{'='*50}")
     logger.info(f"COMBINED DATASET")
@@ -222,8 +225,8 @@ def combine():
     for code, count in combined["code"].value_counts().head(15).items():
         logger.info(f"  {code}: {count}")
 
-    combined.to_csv(OUTPUT_PATH, index=False)
     logger.info(f"\nSaved to {OUTPUT_PATH}")
+    report_timings()
 
 
 if __name__ == "__main__":
@@ -6,11 +6,15 @@ making the process ~365x faster than per-date fetching.
 
 import logging
 import os
+import sys
 import time
 
 import httpx
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from ml.cache import DATA_DIR, cached_frame, dataset_path, find_dataset, read_frame, report_timings
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("fluxroute.ml.enrich")
 
@@ -18,9 +22,9 @@ ARCHIVE_API = "https://archive-api.open-meteo.com/v1/archive"
 TORONTO_LAT = 43.6532
 TORONTO_LNG = -79.3832
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-INPUT_PATH = os.path.join(DATA_DIR, "ttc-all-delay-data.csv")
-OUTPUT_PATH = os.path.join(DATA_DIR, "ttc-all-delay-data-enriched.csv")
+INPUT_NAME = "ttc-all-delay-data"
+OUTPUT_NAME = "ttc-all-delay-data-enriched"
+OUTPUT_PATH = dataset_path(OUTPUT_NAME)
 
 
 def _fetch_weather_range(start_date: str, end_date: str) -> dict[str, dict]:
@@ -85,14 +89,53 @@ def _default_weather() -> dict:
     }
 
 
+def attach_weather(df: pd.DataFrame, weather_cache: dict[str, dict], date_col: str) -> pd.DataFrame:
+    """Left-join daily weather onto delay rows by date (one merge, no per-row loop).
+
+    Dates are normalized to YYYY-MM-DD first, so "2024-01-05 00:00:00" and
+    "2024/1/5" match too. Days without weather get _default_weather().
+    """
+    defaults = _default_weather()
+    weather_df = pd.DataFrame.from_dict(weather_cache, orient="index", columns=list(defaults))
+    weather_df.index.name = "_weather_date"
+
+    day_keys = pd.to_datetime(df[date_col], errors="coerce", format="mixed").dt.strftime("%Y-%m-%d")
+    enriched_df = (
+        df.reset_index(drop=True)
+        .assign(_weather_date=day_keys.reset_index(drop=True))
+        .merge(weather_df, left_on="_weather_date", right_index=True, how="left")
+        .drop(columns="_weather_date")
+    )
+    return enriched_df.fillna(defaults)
+
+
 def enrich():
-    """Main enrichment: add weather columns to delay CSV.
+    """Main enrichment: add weather columns to the combined delay dataset.
+
+    Skipped (served from the cache) when neither the combined dataset nor
+    this script has changed since the last run.
+    """
+    input_path = find_dataset(INPUT_NAME)
+    if input_path is None:
+        logger.error(f"No {INPUT_NAME} dataset found. Run `python -m ml.combine_all_data` first.")
+        return
+
+    enriched_df = cached_frame(
+        "enriched", [input_path, __file__], os.path.join(DATA_DIR, OUTPUT_NAME),
+        lambda: _enrich_frame(input_path),
+    )
+    logger.info(f"Enriched dataset saved to {OUTPUT_PATH}")
+    logger.info(f"Columns: {list(enriched_df.columns)}")
+    logger.info(f"Shape: {enriched_df.shape}")
+    report_timings()
+
 
-    Fetches weather in year-sized chunks (4 API calls for 2022-2025)
-    instead of per-date (1,460+ calls).
+def _enrich_frame(input_path: str) -> pd.DataFrame:
+    """Fetch weather in year-sized chunks (4 API calls for 2022-2025)
+    instead of per-date (1,460+ calls) and join it onto the delay rows.
     """
-    logger.info(f"Loading delay data from {INPUT_PATH}")
-    df = pd.read_csv(INPUT_PATH)
+    logger.info(f"Loading delay data from {input_path}")
+    df = read_frame(input_path)
     logger.info(f"Loaded {len(df)} rows")
 
     date_col = "date" if "date" in df.columns else "Date"
@@ -121,22 +164,10 @@ def enrich():
     logger.info(f"Total weather entries cached: {len(weather_cache)}")
 
     # Check coverage
-    covered = sum(1 for d in unique_dates if str(d) in weather_cache)
+    covered = parsed.dt.strftime("%Y-%m-%d").isin(weather_cache.keys()).sum()
     logger.info(f"Weather coverage: {covered}/{len(unique_dates)} dates ({covered/len(unique_dates):.1%})")
 
-    # Map weather to each row
-    weather_rows = []
-    for _, row in df.iterrows():
-        weather = weather_cache.get(str(row[date_col]), _default_weather())
-        weather_rows.append(weather)
-
-    weather_df = pd.DataFrame(weather_rows)
-    enriched_df = pd.concat([df.reset_index(drop=True), weather_df.reset_index(drop=True)], axis=1)
-
-    enriched_df.to_csv(OUTPUT_PATH, index=False)
-    logger.info(f"Enriched CSV saved to {OUTPUT_PATH}")
-    logger.info(f"Columns: {list(enriched_df.columns)}")
-    logger.info(f"Shape: {enriched_df.shape}")
+    return attach_weather(df, weather_cache, date_col)
 
 
 if __name__ == "__main__":
@@ -15,7 +15,6 @@ import sys
 
 import joblib
 import numpy as np
-import pandas as pd
 from sklearn.metrics import (
     accuracy_score,
     classification_report,
@@ -28,6 +27,7 @@ from sklearn.metrics import (
 from sklearn.model_selection import StratifiedKFold, cross_val_score, train_test_split
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from ml.cache import report_timings
 from ml.feature_engineering import load_and_engineer_features, MODE_ENCODING
 
 logging.basicConfig(level=logging.INFO)
@@ -58,7 +58,7 @@ def evaluate():
 
     # Load REAL data only — no augmentation
     try:
-        X, y_class, y_reg, _ = load_and_engineer_features()
+        X, y_class, y_reg, _, dates = load_and_engineer_features(return_dates=True)
     except Exception as e:
         logger.error(f"Failed to load features: {e}")
         return
@@ -125,17 +125,9 @@ def evaluate():
     logger.info("TEST 3: Temporal split (train early, test late)")
     logger.info("=" * 60)
 
-    from ml.feature_engineering import ENRICHED_PATH, ORIGINAL_PATH
-    csv_path = ENRICHED_PATH if os.path.exists(ENRICHED_PATH) else ORIGINAL_PATH
-    raw_df = pd.read_csv(csv_path)
-
-    date_col = "date" if "date" in raw_df.columns else "Date"
-    raw_df["parsed_date"] = pd.to_datetime(raw_df[date_col], errors="coerce", format="mixed")
-    raw_df = raw_df.dropna(subset=["parsed_date"])
-
-    if len(raw_df) >= len(X_np):
-        dates = raw_df["parsed_date"].values[:len(X_np)]
-        sorted_idx = np.argsort(dates)
+    # Dates come from the cached feature frame, row-aligned with X
+    if len(dates) == len(X_np):
+        sorted_idx = np.argsort(dates.values, kind="stable")
 
         split_point = int(len(sorted_idx) * 0.75)
         train_idx = sorted_idx[:split_point]
@@ -242,3 +234,4 @@ def evaluate():
 
 if __name__ == "__main__":
     evaluate()
+    report_timings()
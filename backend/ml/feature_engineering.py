@@ -1,13 +1,15 @@
 import logging
 import os
+import re
 
 import pandas as pd
 
+from ml.cache import CACHE_DIR, DATA_DIR, cached_stage, find_dataset, read_frame
+
 logger = logging.getLogger("fluxroute.ml.features")
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-ENRICHED_PATH = os.path.join(DATA_DIR, "ttc-all-delay-data-enriched.csv")
-ORIGINAL_PATH = os.path.join(DATA_DIR, "ttc-all-delay-data.csv")
+ENRICHED_NAME = "ttc-all-delay-data-enriched"
+ORIGINAL_NAME = "ttc-all-delay-data"
 
 # Transit mode encoding
 MODE_ENCODING = {"subway": 1, "bus": 2, "streetcar": 3}
@@ -40,6 +42,19 @@ CODE_ENCODING = {
 # Direction / bound encoding
 BOUND_ENCODING = {"N": 1, "S": 2, "E": 3, "W": 4, "B": 5}
 
+# Tokens dropped when normalizing station names ("ST GEORGE YUS STATION" -> "ST GEORGE")
+_STATION_NOISE = {"STATION", "STN", "STATIO", "YUS", "YU", "BD", "BDS", "SHP", "SRT"}
+
+
+def station_key(name) -> str:
+    """Normalize a station/location name so delay-log and GTFS spellings match.
+
+    Must match ml_predictor._station_key in the backend.
+    """
+    s = re.sub(r"\(.*?\)", " ", str(name).upper())
+    tokens = re.sub(r"[^A-Z0-9]+", " ", s).split()
+    return " ".join(t for t in tokens if t not in _STATION_NOISE)
+
 
 def get_season(month: int) -> int:
     """Map month to season: 1=Winter, 2=Spring, 3=Summer, 4=Fall."""
@@ -52,24 +67,66 @@ def get_season(month: int) -> int:
     return 4
 
 
-def load_and_engineer_features(filepath: str | None = None) -> tuple:
-    """Load TTC delay CSV and extract ML features.
+def load_and_engineer_features(
+    filepath: str | None = None, return_encoders: bool = False, return_dates: bool = False,
+) -> tuple:
+    """Load the TTC delay dataset and extract ML features.
+
+    Automatically uses the enriched dataset (with weather) if available,
+    falls back to the original. The engineered features are cached by the
+    dataset's (and this file's) content hash, so repeated train/evaluate
+    runs skip straight to the cached frame.
 
-    Automatically uses enriched CSV (with weather) if available,
-    falls back to original CSV.
+    With return_encoders=True a fifth element is returned: the label → code
+    maps used for line, station and bound, plus the median min_gap per
+    station code, so the backend can encode live inputs the same way.
+    With return_dates=True each row's parsed date (aligned with X) follows,
+    for temporal splits.
     """
     if filepath is None:
-        if os.path.exists(ENRICHED_PATH):
-            filepath = ENRICHED_PATH
-            logger.info("Using enriched CSV with weather data")
+        filepath = find_dataset(ENRICHED_NAME)
+        if filepath:
+            logger.info("Using enriched dataset with weather data")
         else:
-            filepath = ORIGINAL_PATH
-            logger.info("Enriched CSV not found, using original")
-
-    logger.info(f"Loading delay data from {filepath}")
-    df = pd.read_csv(filepath)
-    logger.info(f"Loaded {len(df)} rows. Columns: {list(df.columns)}")
-
+            filepath = find_dataset(ORIGINAL_NAME)
+            logger.info("Enriched dataset not found, using original")
+        if filepath is None:
+            raise FileNotFoundError(f"No {ORIGINAL_NAME} dataset in {DATA_DIR}")
+
+    def _compute() -> tuple[pd.DataFrame, dict]:
+        logger.info(f"Loading delay data from {filepath}")
+        df = read_frame(filepath)
+        logger.info(f"Loaded {len(df)} rows. Columns: {list(df.columns)}")
+        X, y_class, y_reg, feature_cols, encoders, dates = engineer_features(
+            df, return_encoders=True, return_dates=True,
+        )
+        frame = X.assign(is_significant_delay=y_class, delay_minutes=y_reg, parsed_date=dates)
+        return frame.reset_index(drop=True), {"feature_cols": feature_cols, "encoders": encoders}
+
+    frame, meta = cached_stage(
+        "features", [filepath, __file__], os.path.join(CACHE_DIR, "features"), _compute,
+    )
+    feature_cols = meta["feature_cols"]
+
+    result = (frame[feature_cols], frame["is_significant_delay"], frame["delay_minutes"], feature_cols)
+    if return_encoders:
+        result += (meta["encoders"],)
+    if return_dates:
+        result += (pd.to_datetime(frame["parsed_date"]),)
+    return result
+
+
+def engineer_features(
+    df: pd.DataFrame, return_encoders: bool = False, return_dates: bool = False,
+    encoders: dict | None = None,
+) -> tuple:
+    """Extract ML features from an already-loaded delay DataFrame.
+
+    Every step is a whole-column operation; see load_and_engineer_features
+    for the return value. Pass a trained model's `encoders` to encode new
+    rows exactly as its training data was (instead of re-ranking lines and
+    stations by frequency in `df`).
+    """
     # Dynamically inspect columns
     date_col = _find_column(df, ["date", "Date", "DATE"])
     time_col = _find_column(df, ["time", "Time", "TIME"])
@@ -89,12 +146,12 @@ def load_and_engineer_features(filepath: str | None = None) -> tuple:
     df = df.dropna(subset=["parsed_date"])
 
     # --- Time features ---
-    df["hour"] = df[time_col].apply(_parse_hour)
+    df["hour"] = _parse_hours(df[time_col])
     df["month"] = df["parsed_date"].dt.month
     df["day_of_week"] = df["parsed_date"].dt.dayofweek  # 0=Monday
-    df["season"] = df["month"].apply(get_season)
-    df["is_rush_hour"] = df["hour"].apply(lambda h: 1 if (7 <= h <= 9 or 17 <= h <= 19) else 0)
-    df["is_weekend"] = df["day_of_week"].apply(lambda d: 1 if d >= 5 else 0)
+    df["season"] = (df["month"] % 12) // 3 + 1  # Same mapping as get_season()
+    df["is_rush_hour"] = (df["hour"].between(7, 9) | df["hour"].between(17, 19)).astype(int)
+    df["is_weekend"] = (df["day_of_week"] >= 5).astype(int)
 
     # --- Mode feature (subway/bus/streetcar) ---
     if mode_col and mode_col in df.columns:
@@ -105,18 +162,31 @@ def load_and_engineer_features(filepath: str | None = None) -> tuple:
     # --- Line/route encoding ---
     # Frequency-encode: top routes get their own code, rest bucketed to 0
     if line_col and line_col in df.columns:
-        top_lines = df[line_col].astype(str).value_counts().head(60).index.tolist()
-        line_map = {line: i + 1 for i, line in enumerate(top_lines)}
-        df["line_encoded"] = df[line_col].astype(str).map(line_map).fillna(0).astype(int)
+        line_labels = df[line_col].astype(str).str.strip().str.upper()
+        if encoders:
+            line_map = encoders["line"]
+        else:
+            top_lines = line_labels.value_counts().head(60).index.tolist()
+            line_map = {line: i + 1 for i, line in enumerate(top_lines)}
+        df["line_encoded"] = line_labels.map(line_map).fillna(0).astype(int)
     else:
+        line_map = {}
         df["line_encoded"] = 0
 
     # --- Station / location encoding ---
     if station_col and station_col in df.columns:
-        top_stations = df[station_col].dropna().astype(str).value_counts().head(100).index.tolist()
-        station_map = {s: i + 1 for i, s in enumerate(top_stations)}
-        df["station_encoded"] = df[station_col].astype(str).map(station_map).fillna(0).astype(int)
+        station_names = df[station_col].fillna("").astype(str)
+        # Normalize each distinct name once rather than once per row
+        unique_names = station_names.unique()
+        station_keys = station_names.map(dict(zip(unique_names, map(station_key, unique_names))))
+        if encoders:
+            station_map = encoders["station"]
+        else:
+            top_stations = station_keys[station_keys != ""].value_counts().head(100).index.tolist()
+            station_map = {s: i + 1 for i, s in enumerate(top_stations)}
+        df["station_encoded"] = station_keys.map(station_map).fillna(0).astype(int)
     else:
+        station_map = {}
         df["station_encoded"] = 0
 
     # --- Incident code encoding ---
@@ -166,6 +236,18 @@ def load_and_engineer_features(filepath: str | None = None) -> tuple:
     y_class = df["is_significant_delay"]
     y_reg = df["delay_minutes"]
 
+    # Gap is only known after an incident; serve each station's typical value
+    if not encoders:
+        gap_by_station = df.groupby("station_encoded")["min_gap"].median()
+        encoders = {
+            "line": line_map,
+            "station": station_map,
+            "bound": dict(BOUND_ENCODING),
+            "min_gap_by_station": [
+                float(gap_by_station.get(code, gap_by_station.median())) for code in range(len(station_map) + 1)
+            ],
+        }
+
     logger.info(f"Feature engineering complete: {len(X)} samples, {len(feature_cols)} features")
     logger.info(f"Features: {feature_cols}")
     logger.info(f"Significant delays: {y_class.sum()} / {len(y_class)} ({y_class.mean():.1%})")
@@ -175,7 +257,12 @@ def load_and_engineer_features(filepath: str | None = None) -> tuple:
             count = (df["mode_encoded"] == mode_val).sum()
             logger.info(f"  {mode_name}: {count} samples")
 
-    return X, y_class, y_reg, feature_cols
+    result = (X, y_class, y_reg, feature_cols)
+    if return_encoders:
+        result += (encoders,)
+    if return_dates:
+        result += (df["parsed_date"],)
+    return result
 
 
 def _find_column(df: pd.DataFrame, candidates: list[str]):
@@ -186,16 +273,14 @@ def _find_column(df: pd.DataFrame, candidates: list[str]):
     return None
 
 
-def _parse_hour(time_str) -> int:
-    """Parse hour from time string like '08:30' or '8:30 AM'."""
-    try:
-        s = str(time_str).strip()
-        parts = s.split(":")
-        hour = int(parts[0])
-        if "PM" in s.upper() and hour != 12:
-            hour += 12
-        elif "AM" in s.upper() and hour == 12:
-            hour = 0
-        return hour % 24
-    except (ValueError, IndexError):
-        return 12
+def _parse_hours(times: pd.Series) -> pd.Series:
+    """Parse hours from time strings like '08:30' or '8:30 AM'; unparseable → 12."""
+    s = times.astype(str).str.strip().str.upper()
+    hour = pd.to_numeric(s.str.split(":").str[0], errors="coerce")
+    hour = hour.where(hour == hour.round())  # int() semantics: "8.5" is not an hour
+
+    pm = s.str.contains("PM", regex=False)
+    am = s.str.contains("AM", regex=False)
+    hour = hour.mask(pm & (hour != 12), hour + 12)
+    hour = hour.mask(am & (hour == 12), 0)
+    return (hour.fillna(12) % 24).astype(int)
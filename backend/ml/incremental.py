@@ -0,0 +1,368 @@
+"""Incremental retraining from new TTC delay records.
+
+Instead of re-reading every raw XLSX/CSV, re-fetching all weather and fitting
+from zero, this keeps:
+- a columnar training store (data/training_store/, one Parquet part per
+  ingest) holding every delay record already seen, weather attached;
+- a daily weather cache (data/weather_cache.parquet), so only new dates hit
+  the Open-Meteo archive;
+- a manifest of raw files by mtime/size, so unchanged downloads are skipped
+  without being parsed. Changed files are de-duplicated against the store by
+  a per-record hash.
+
+The update step then warm-starts the saved XGBoost models: extra boosting
+rounds are fitted on the rows ingested since the model was trained (plus a
+replay sample of older rows so earlier patterns aren't forgotten), with the
+model's saved encoders so feature codes stay stable. New stations that
+weren't in the top 100 land in the "other" bucket until the next full
+retrain.
+
+Usage:
+    python -m ml.incremental --ingest-only       # Just append new records
+    python -m ml.incremental                     # Ingest + warm-start the models
+    python -m ml.incremental --compare           # ...and report vs. a full retrain
+    python -m ml.incremental --mark-seen         # Record the store as already in the model
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error
+from xgboost import XGBClassifier, XGBRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from ml.combine_all_data import RAW_DIR, RAW_SOURCES, clean_combined
+from ml.enrich_weather_data import _fetch_weather_range, attach_weather
+from ml.feature_engineering import DATA_DIR, engineer_features
+from ml.train_model import MODEL_OUTPUT, PARAM_GRID, export_compact
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.ml.incremental")
+
+STORE_DIR = os.path.join(DATA_DIR, "training_store")
+MANIFEST_PATH = os.path.join(STORE_DIR, "manifest.json")
+WEATHER_CACHE_PATH = os.path.join(DATA_DIR, "weather_cache.parquet")
+REPORT_OUTPUT = os.path.join(os.path.dirname(__file__), "incremental_report.json")
+
+# Columns identifying a delay record (for de-duplicating re-downloaded files)
+KEY_COLUMNS = ["date", "time", "mode", "line", "station", "code", "min_delay", "bound", "vehicle"]
+
+# The archive API lags real time by a few days; records this recent are held
+# back from the store until their weather can be fetched
+ARCHIVE_LAG_DAYS = 7
+
+
+# ─── Store ──────────────────────────────────────────────────────────────────
+
+def _load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_PATH):
+        return {"sources": {}, "parts": []}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: dict) -> None:
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _record_keys(df: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(df[KEY_COLUMNS].astype(str), index=False).astype("uint64")
+
+
+def read_store(parts: list[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read the training store (or just the given part files / columns)."""
+    manifest = _load_manifest()
+    names = [p["name"] for p in manifest["parts"]] if parts is None else parts
+    if not names:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(
+        [pd.read_parquet(os.path.join(STORE_DIR, name), columns=columns) for name in names],
+        ignore_index=True,
+    )
+
+
+def _cached_weather(dates: pd.Series) -> dict[str, dict]:
+    """Daily weather for every date in `dates`, fetching only dates not yet cached."""
+    cache = pd.read_parquet(WEATHER_CACHE_PATH) if os.path.exists(WEATHER_CACHE_PATH) else pd.DataFrame()
+    wanted = set(dates.dropna().unique())
+    missing = sorted(wanted - set(cache.index))
+
+    if missing:
+        fetched = {}
+        cutoff = (date.today() - timedelta(days=ARCHIVE_LAG_DAYS)).isoformat()
+        years = sorted({d[:4] for d in missing if d <= cutoff})
+        for year in years:
+            in_year = [d for d in missing if d.startswith(year) and d <= cutoff]
+            logger.info(f"  Fetching weather {in_year[0]} to {in_year[-1]}...")
+            fetched.update(_fetch_weather_range(in_year[0], in_year[-1]))
+            time.sleep(1.0)  # Be respectful to the API
+        if fetched:
+            new_rows = pd.DataFrame.from_dict(fetched, orient="index")
+            cache = pd.concat([cache, new_rows[~new_rows.index.isin(cache.index)]]).sort_index()
+            cache.to_parquet(WEATHER_CACHE_PATH)
+        logger.info(f"Weather: {len(missing)} dates missing, {len(fetched)} fetched, {len(cache)} cached")
+
+    return cache.reindex(sorted(wanted)).dropna().to_dict(orient="index")
+
+
+def ingest() -> int:
+    """Append delay records from new or changed raw files to the store.
+
+    Records dated within ARCHIVE_LAG_DAYS have no archive weather yet; they
+    are held back rather than stored with placeholder weather, and their
+    source files stay unmarked so the next ingest picks them up again.
+
+    Returns the number of rows added.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    manifest = _load_manifest()
+
+    frames, changed = [], {}
+    for filename, loader, label in RAW_SOURCES:
+        path = os.path.join(RAW_DIR, filename)
+        if not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        signature = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        seen = manifest["sources"].get(filename, {})
+        if {k: seen.get(k) for k in signature} == signature:
+            continue
+        df = loader(path)
+        logger.info(f"{label}: {len(df)} rows (new or changed file)")
+        frames.append(df.assign(_source=filename))
+        changed[filename] = {**signature, "rows": len(df)}
+
+    if not frames:
+        logger.info("No new or changed raw files")
+        return 0
+
+    new = clean_combined(frames)
+    new["record_key"] = _record_keys(new)
+    new = new.drop_duplicates("record_key")
+    known = read_store(columns=["record_key"])["record_key"]
+    new = new[~new["record_key"].isin(known)].reset_index(drop=True)
+
+    pending = set()
+    if not new.empty:
+        weather = _cached_weather(new["date"])
+        covered = new["date"].isin(weather.keys())
+        held = new[~covered]
+        if not held.empty:
+            pending = set(held["_source"])
+            logger.info(
+                f"Holding back {len(held)} records dated {held['date'].min()} to {held['date'].max()} "
+                f"until archive weather covers them ({', '.join(sorted(pending))})"
+            )
+        new = new[covered].reset_index(drop=True)
+
+    new = new.drop(columns="_source")
+    if not new.empty:
+        new = attach_weather(new, weather, "date")
+        new["ingested_at"] = datetime.now().isoformat(timespec="seconds")
+
+        name = f"part-{len(manifest['parts']):05d}.parquet"
+        new.to_parquet(os.path.join(STORE_DIR, name), index=False)
+        manifest["parts"].append({
+            "name": name,
+            "rows": len(new),
+            "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            "date_range": [new["date"].min(), new["date"].max()],
+        })
+
+    manifest["sources"].update({f: sig for f, sig in changed.items() if f not in pending})
+    _save_manifest(manifest)
+    total = sum(p["rows"] for p in manifest["parts"])
+    logger.info(f"Ingested {len(new)} new records ({total} in store)")
+    return len(new)
+
+
+# ─── Warm start ─────────────────────────────────────────────────────────────
+
+def _seen_parts(model_data: dict, manifest: dict) -> set[str]:
+    """Store parts the saved model has already been trained on."""
+    seen = model_data.get("metrics", {}).get("store_parts")
+    if seen is not None:
+        return set(seen)
+    # Model from a full CSV retrain: parts ingested before it was written
+    trained_at = datetime.fromtimestamp(os.path.getmtime(MODEL_OUTPUT)).isoformat(timespec="seconds")
+    return {p["name"] for p in manifest["parts"] if p["ingested_at"] <= trained_at}
+
+
+def _features(df: pd.DataFrame, encoders: dict) -> tuple:
+    X, y_class, y_reg, feature_cols, dates = engineer_features(df, return_dates=True, encoders=encoders)
+    return X.values, y_class.values, y_reg.values, feature_cols, dates.values
+
+
+def _scale_weight(y: np.ndarray) -> float:
+    return (len(y) - y.sum()) / max(y.sum(), 1)
+
+
+def _score(classifier, regressor, X, y_cls, y_reg) -> dict:
+    pred = classifier.predict(X)
+    return {
+        "accuracy": float(accuracy_score(y_cls, pred)),
+        "f1": float(f1_score(y_cls, pred, zero_division=0)),
+        "mae": float(mean_absolute_error(y_reg, regressor.predict(X))),
+    }
+
+
+def _warm_start(model_data: dict, X, y_cls, y_reg, rounds: int) -> tuple:
+    """Fit `rounds` more trees onto copies of the saved classifier and regressor."""
+    params = {**model_data.get("metrics", {}).get("best_params", PARAM_GRID[0]), "n_estimators": rounds}
+    reg_params = {k: v for k, v in params.items() if k != "gamma"}
+
+    classifier = XGBClassifier(**params, scale_pos_weight=_scale_weight(y_cls), random_state=42, eval_metric="logloss")
+    classifier.fit(X, y_cls, xgb_model=model_data["classifier"].get_booster())
+    regressor = XGBRegressor(**reg_params, random_state=42)
+    regressor.fit(X, y_reg, xgb_model=model_data["regressor"].get_booster())
+    return classifier, regressor
+
+
+def _full_retrain(model_data: dict, X, y_cls, y_reg) -> tuple:
+    """Fit fresh models with the saved best params (no search) — the comparison baseline."""
+    params = model_data.get("metrics", {}).get("best_params", PARAM_GRID[0])
+    reg_params = {k: v for k, v in params.items() if k != "gamma"}
+
+    classifier = XGBClassifier(**params, scale_pos_weight=_scale_weight(y_cls), random_state=42, eval_metric="logloss")
+    classifier.fit(X, y_cls)
+    regressor = XGBRegressor(**reg_params, random_state=42)
+    regressor.fit(X, y_reg)
+    return classifier, regressor
+
+
+def update(rounds: int = 100, replay: float = 1.0, compare: bool = False) -> None:
+    """Ingest new records and warm-start the saved models on them.
+
+    replay: rows of already-seen data sampled per new row and mixed into the
+    warm-start fit. compare: hold out the newest 20% of new rows (by date),
+    score the old, warm-started and fully retrained models on them, and write
+    the timings and metrics to incremental_report.json.
+    """
+    ingest_start = time.perf_counter()
+    ingest()
+    ingest_s = time.perf_counter() - ingest_start
+
+    if not os.path.exists(MODEL_OUTPUT):
+        logger.error(f"No model at {MODEL_OUTPUT}. Run `python -m ml.train_model` first.")
+        return
+    model_data = joblib.load(MODEL_OUTPUT)
+    encoders = model_data.get("encoders")
+    if not encoders:
+        logger.error("Saved model has no encoders; run a full `python -m ml.train_model` first")
+        return
+
+    manifest = _load_manifest()
+    seen = _seen_parts(model_data, manifest)
+    new_parts = [p["name"] for p in manifest["parts"] if p["name"] not in seen]
+    if not new_parts:
+        logger.info("Model is up to date with the store")
+        return
+
+    X_new, y_cls_new, y_reg_new, feature_cols, dates_new = _features(read_store(new_parts), encoders)
+    if feature_cols != model_data["feature_cols"]:
+        logger.error(f"Store features {feature_cols} differ from the model's; run a full retrain")
+        return
+    logger.info(f"{len(X_new)} new rows since the model was trained")
+
+    holdout = np.zeros(len(X_new), dtype=bool)
+    if compare:
+        order = np.argsort(dates_new, kind="stable")
+        holdout[order[int(len(order) * 0.8):]] = True
+
+    old = read_store(sorted(seen)) if seen else pd.DataFrame()
+    X_old, y_cls_old, y_reg_old = np.empty((0, X_new.shape[1])), np.empty(0, dtype=int), np.empty(0)
+    if replay > 0 and not old.empty:
+        sample = old.sample(n=min(len(old), int((~holdout).sum() * replay)), random_state=42)
+        X_old, y_cls_old, y_reg_old, _, _ = _features(sample, encoders)
+
+    X_fit = np.vstack([X_new[~holdout], X_old])
+    y_cls_fit = np.concatenate([y_cls_new[~holdout], y_cls_old])
+    y_reg_fit = np.concatenate([y_reg_new[~holdout], y_reg_old])
+
+    start = time.perf_counter()
+    classifier, regressor = _warm_start(model_data, X_fit, y_cls_fit, y_reg_fit, rounds)
+    warm_s = time.perf_counter() - start
+    logger.info(f"Warm start: +{rounds} trees on {len(X_fit)} rows in {warm_s:.1f}s (ingest {ingest_s:.1f}s)")
+
+    if compare:
+        X_eval, y_cls_eval, y_reg_eval = X_new[holdout], y_cls_new[holdout], y_reg_new[holdout]
+
+        # Full retrain on everything except the held-out rows (feature prep included)
+        start = time.perf_counter()
+        X_full, y_cls_full, y_reg_full = X_new[~holdout], y_cls_new[~holdout], y_reg_new[~holdout]
+        if not old.empty:
+            X_seen, y_cls_seen, y_reg_seen, _, _ = _features(old.copy(), encoders)
+            X_full = np.vstack([X_seen, X_full])
+            y_cls_full = np.concatenate([y_cls_seen, y_cls_full])
+            y_reg_full = np.concatenate([y_reg_seen, y_reg_full])
+        full_clf, full_reg = _full_retrain(model_data, X_full, y_cls_full, y_reg_full)
+        full_s = time.perf_counter() - start
+
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "new_rows": int(len(X_new)),
+            "holdout_rows": int(holdout.sum()),
+            "ingest_seconds": round(ingest_s, 1),
+            "previous": _score(model_data["classifier"], model_data["regressor"], X_eval, y_cls_eval, y_reg_eval),
+            "warm_start": {**_score(classifier, regressor, X_eval, y_cls_eval, y_reg_eval),
+                           "fit_seconds": round(warm_s, 1), "fit_rows": int(len(X_fit))},
+            "full_retrain": {**_score(full_clf, full_reg, X_eval, y_cls_eval, y_reg_eval),
+                             "fit_seconds": round(full_s, 1), "fit_rows": int(len(X_full))},
+        }
+        for name in ("previous", "warm_start", "full_retrain"):
+            r = report[name]
+            logger.info(
+                f"  {name:<13} accuracy={r['accuracy']:.4f}  F1={r['f1']:.4f}  MAE={r['mae']:.2f} min"
+                + (f"  fit {r['fit_seconds']:.1f}s" if "fit_seconds" in r else "")
+            )
+        with open(REPORT_OUTPUT, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Comparison saved to {REPORT_OUTPUT}")
+
+    model_data.update(classifier=classifier, regressor=regressor)
+    model_data["metrics"] = {
+        **model_data.get("metrics", {}),
+        "store_parts": sorted(seen | set(new_parts)),
+        "incremental_updates": model_data.get("metrics", {}).get("incremental_updates", 0) + 1,
+        "last_incremental": {"new_rows": int(len(X_new)), "rounds": rounds, "fit_seconds": round(warm_s, 1)},
+    }
+    joblib.dump(model_data, MODEL_OUTPUT)
+    logger.info(f"Model saved to {MODEL_OUTPUT}")
+    export_compact(classifier, regressor, feature_cols, X_fit, encoders)
+
+
+def mark_seen() -> None:
+    """Record every part in the store as already trained into the saved model."""
+    model_data = joblib.load(MODEL_OUTPUT)
+    parts = [p["name"] for p in _load_manifest()["parts"]]
+    model_data.setdefault("metrics", {})["store_parts"] = parts
+    joblib.dump(model_data, MODEL_OUTPUT)
+    logger.info(f"Marked {len(parts)} store parts as seen by {MODEL_OUTPUT}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally update the TTC delay models")
+    parser.add_argument("--ingest-only", action="store_true", help="Append new records to the store and stop")
+    parser.add_argument("--mark-seen", action="store_true", help="Treat the current store as already trained on")
+    parser.add_argument("--rounds", type=int, default=100, help="Boosting rounds to add (default: 100)")
+    parser.add_argument("--replay", type=float, default=1.0, help="Old rows replayed per new row (default: 1.0)")
+    parser.add_argument("--compare", action="store_true", help="Also fit a full retrain and compare on held-out new rows")
+    args = parser.parse_args()
+
+    if args.ingest_only:
+        ingest()
+    elif args.mark_seen:
+        mark_seen()
+    else:
+        update(rounds=args.rounds, replay=args.replay, compare=args.compare)
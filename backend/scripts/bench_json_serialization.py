@@ -0,0 +1,95 @@
+"""Benchmark: response serialization throughput, FastAPI default path vs app.fast_json.
+
+For a /api/routes-sized RouteResponse (hybrid routes with Mapbox-resolution
+geometry) and for navigation WebSocket messages, compares:
+- "fastapi default": what FastAPI does for a returned model with a
+  response_model — model_dump, re-validation against the model,
+  jsonable_encoder, then json.dumps;
+- "json.dumps / model_dump_json": the previous WebSocket path;
+- "fast_json": FastJSONResponse.render / fast_json.dumps (model_dump_json for
+  models, orjson for plain data).
+
+Usage:
+    python scripts/bench_json_serialization.py [--routes 4] [--drive-points 3000] [--seconds 2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.fast_json import ORJSON_AVAILABLE, FastJSONResponse, dumps  # noqa: E402
+from app.models import Coordinate, NavigationUpdate, RouteResponse  # noqa: E402
+from scripts.bench_route_geometry import _path, _route  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.bench")
+
+
+def _fastapi_default(response: RouteResponse) -> bytes:
+    content = response.model_dump()
+    validated = RouteResponse.model_validate(content)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _throughput(fn, seconds: float) -> tuple[float, int]:
+    """Calls per second of fn() over ~`seconds`, and the output size."""
+    out = fn()
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start), len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=4)
+    parser.add_argument("--drive-points", type=int, default=3000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    random.seed(42)
+    response = RouteResponse(
+        routes=[_route(i, args.drive_points, 800) for i in range(args.routes)],
+        origin=Coordinate(lat=43.78, lng=-79.52),
+        destination=Coordinate(lat=43.643, lng=-79.378),
+    )
+    renderer = FastJSONResponse(content=None)
+    update = NavigationUpdate(
+        step_index=3, remaining_distance_km=4.2, remaining_duration_min=11.0, eta="08:59",
+        instruction="Turn left onto Bloor Street West", voice_instruction="In 200 metres, turn left",
+        lane_guidance=[{"valid": True, "indications": ["left"]}, {"valid": False, "indications": ["straight"]}],
+        speed_limit=50.0,
+    )
+    reroute = {
+        "type": "reroute", "reason": "Off route detected",
+        "new_route": {"geometry": {"type": "LineString", "coordinates": _path(1500, (-79.4, 43.7), (-79.38, 43.65), 0.002)},
+                      "distance_km": 4.4, "duration_min": 12.0, "steps": []},
+    }
+
+    cases = [
+        ("RouteResponse", "fastapi default", lambda: _fastapi_default(response)),
+        ("RouteResponse", "fast_json", lambda: renderer.render(response)),
+        ("nav update", "model_dump_json", lambda: update.model_dump_json().encode()),
+        ("nav update", "fast_json", lambda: dumps(update)),
+        ("nav reroute", "json.dumps", lambda: json.dumps(reroute).encode()),
+        ("nav reroute", "fast_json", lambda: dumps(reroute)),
+    ]
+    logger.info(f"orjson available: {ORJSON_AVAILABLE}")
+    logger.info("Payload         path               calls/s      bytes")
+    for payload, label, fn in cases:
+        rate, size = _throughput(fn, args.seconds)
+        logger.info(f"{payload:<15} {label:<17} {rate:9.1f} {size:>10,}")
+
+
+if __name__ == "__main__":
+    main()
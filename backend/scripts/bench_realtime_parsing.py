@@ -0,0 +1,165 @@
+"""Benchmark: event-loop blocking while decoding GTFS-RT feeds.
+
+Builds synthetic TTC-sized feeds (vehicle positions and trip updates) and
+decodes each one two ways while a heartbeat task records how late the event
+loop wakes up from a 1 ms sleep:
+- "inline": the previous path — ParseFromString, the per-entity loop and
+  validated Pydantic construction, all on the event loop;
+- "thread": gtfs_realtime's decoders in a worker thread (compact tuples
+  packed into a columnar VehicleStore) — off the loop but not off the GIL;
+- "process": trip updates only, via gtfs_realtime._decode_off_loop (the
+  child decode process the poller uses; tuples are pickled back).
+
+Usage:
+    python scripts/bench_realtime_parsing.py [--vehicles 2000] [--trips 1500] [--stops 20] [--repeat 10]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google.transit import gtfs_realtime_pb2  # noqa: E402
+
+from app.gtfs_realtime import (  # noqa: E402
+    _decode_off_loop, _parse_trip_updates_protobuf, decode_vehicles_protobuf, shutdown_decode_pool,
+)
+from app.models import VehiclePosition  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.bench")
+
+HEARTBEAT_S = 0.001
+
+
+def _vehicle_feed(n: int) -> bytes:
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    feed.header.timestamp = int(time.time())
+    for i in range(n):
+        entity = feed.entity.add(id=str(i))
+        vp = entity.vehicle
+        vp.vehicle.id = f"{1000 + i}"
+        vp.trip.route_id = str(random.choice([1, 2, 4, 501, 504, 505, 29, 32, 35, 52]))
+        vp.position.latitude = 43.65 + random.uniform(-0.1, 0.1)
+        vp.position.longitude = -79.38 + random.uniform(-0.2, 0.2)
+        vp.position.bearing = random.uniform(0, 360)
+        vp.position.speed = random.uniform(0, 15)
+        vp.timestamp = int(time.time())
+    return feed.SerializeToString()
+
+
+def _trip_update_feed(trips: int, stops: int) -> bytes:
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    feed.header.timestamp = int(time.time())
+    now = int(time.time())
+    for i in range(trips):
+        entity = feed.entity.add(id=str(i))
+        tu = entity.trip_update
+        tu.trip.trip_id = str(40000000 + i)
+        tu.trip.route_id = str(random.choice([1, 2, 501, 504, 29, 32]))
+        delay = random.randint(-60, 600)
+        for s in range(stops):
+            stu = tu.stop_time_update.add(stop_id=str(10000 + i * stops + s))
+            stu.arrival.time = now + s * 90 + delay
+            stu.arrival.delay = delay
+            stu.departure.time = now + s * 90 + delay + 20
+    return feed.SerializeToString()
+
+
+def _inline_vehicles(content: bytes) -> list[VehiclePosition]:
+    """The previous on-loop decoder: validated Pydantic objects per entity."""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.ParseFromString(content)
+    vehicles = []
+    for entity in feed.entity:
+        if entity.HasField("vehicle"):
+            vp = entity.vehicle
+            vehicles.append(VehiclePosition(
+                vehicle_id=str(vp.vehicle.id) if vp.vehicle.id else entity.id,
+                route_id=str(vp.trip.route_id) if vp.trip.route_id else None,
+                latitude=vp.position.latitude,
+                longitude=vp.position.longitude,
+                bearing=vp.position.bearing if vp.position.bearing else None,
+                speed=vp.position.speed if vp.position.speed else None,
+                timestamp=vp.timestamp if vp.timestamp else None,
+            ))
+    return vehicles
+
+
+async def _measure(decode, content: bytes, path: str, repeat: int) -> dict:
+    """Decode `repeat` times while a heartbeat samples event-loop lag."""
+    loop = asyncio.get_running_loop()
+    lags: list[float] = []
+    done = False
+
+    async def heartbeat():
+        while not done:
+            start = loop.time()
+            await asyncio.sleep(HEARTBEAT_S)
+            lags.append(loop.time() - start - HEARTBEAT_S)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if path == "thread":
+            await asyncio.to_thread(decode, content)
+        elif path == "process":
+            await _decode_off_loop(decode, content)
+        else:
+            decode(content)
+            await asyncio.sleep(0)
+    wall = (time.perf_counter() - start) / repeat
+    done = True
+    await beat
+
+    lags.sort()
+    return {
+        "decode_ms": wall * 1000,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(0.99 * (len(lags) - 1))] * 1000 if lags else 0.0,
+        "blocked_ms": sum(lag for lag in lags if lag > 0.005) * 1000 / repeat,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=2000)
+    parser.add_argument("--trips", type=int, default=1500)
+    parser.add_argument("--stops", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(42)
+    trip_content = _trip_update_feed(args.trips, args.stops)
+    feeds = [
+        ("vehicles", _vehicle_feed(args.vehicles), [
+            ("inline", _inline_vehicles), ("thread", decode_vehicles_protobuf),
+        ]),
+        ("trip updates", trip_content, [
+            ("inline", _parse_trip_updates_protobuf), ("thread", _parse_trip_updates_protobuf),
+            ("process", _parse_trip_updates_protobuf),
+        ]),
+    ]
+    await _decode_off_loop(_parse_trip_updates_protobuf, trip_content)  # Start the decode process
+
+    logger.info("Feed          path       decode    max lag    p99 lag   blocked/poll")
+    for name, content, paths in feeds:
+        for label, decode in paths:
+            r = await _measure(decode, content, label, args.repeat)
+            logger.info(
+                f"{name:<13} {label:<9} {r['decode_ms']:7.1f}ms  {r['max_lag_ms']:7.1f}ms  "
+                f"{r['p99_lag_ms']:7.1f}ms  {r['blocked_ms']:9.1f}ms"
+            )
+        logger.info(f"{'':<13} ({len(content) / 1024:.0f} KiB)")
+    shutdown_decode_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
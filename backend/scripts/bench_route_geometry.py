@@ -0,0 +1,100 @@
+"""Benchmark: route payload size and serialization time per geometry encoding.
+
+Builds a synthetic hybrid route (Mapbox-resolution drive leg with congestion
+sub-segments, a GTFS-shape subway leg, a walk leg) and serializes it the way
+/api/routes does — encode_route_geometry, then model_dump_json — for each
+geometry format, with and without per-zoom Douglas–Peucker simplification.
+Reports raw and gzip bytes and the encode + serialize time per response.
+
+Usage:
+    python scripts/bench_route_geometry.py [--drive-points 3000] [--transit-points 800] [--routes 4] [--repeat 50]
+"""
+
+import argparse
+import gzip
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.models import (  # noqa: E402
+    Coordinate, CostBreakdown, DelayInfo, GeometryFormat, RouteMode, RouteOption, RouteResponse, RouteSegment,
+)
+from app.route_engine import encode_route_geometry  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fluxroute.bench")
+
+
+def _path(n: int, start: tuple[float, float], end: tuple[float, float], wiggle: float) -> list[list[float]]:
+    """n [lng, lat] points from start to end with street-grid-like wiggle."""
+    coords = []
+    for i in range(n):
+        t = i / (n - 1)
+        lng = start[0] + t * (end[0] - start[0]) + wiggle * math.sin(t * 40) + random.uniform(-1e-5, 1e-5)
+        lat = start[1] + t * (end[1] - start[1]) + wiggle * math.cos(t * 25) + random.uniform(-1e-5, 1e-5)
+        coords.append([round(lng, 6), round(lat, 6)])
+    return coords
+
+
+def _route(i: int, drive_points: int, transit_points: int) -> RouteOption:
+    drive = _path(drive_points, (-79.52, 43.78), (-79.41, 43.72), 0.004)
+    transit = _path(transit_points, (-79.41, 43.72), (-79.38, 43.645), 0.002)
+    walk = _path(150, (-79.38, 43.645), (-79.378, 43.643), 0.0002)
+    levels = ["low", "moderate", "heavy", "severe"]
+    step = max(2, drive_points // 40)
+    congestion = [
+        {"geometry": {"type": "LineString", "coordinates": drive[j:j + step + 1]}, "congestion": random.choice(levels)}
+        for j in range(0, drive_points - 1, step)
+    ]
+    segments = [
+        RouteSegment(mode=RouteMode.DRIVING, geometry={"type": "LineString", "coordinates": drive},
+                     distance_km=12.0, duration_min=18.0, congestion_segments=congestion),
+        RouteSegment(mode=RouteMode.TRANSIT, geometry={"type": "LineString", "coordinates": transit},
+                     distance_km=9.0, duration_min=16.0, transit_line="Line 1", color="#F0CC49"),
+        RouteSegment(mode=RouteMode.WALKING, geometry={"type": "LineString", "coordinates": walk},
+                     distance_km=0.3, duration_min=4.0),
+    ]
+    return RouteOption(
+        id=f"hybrid-{i}", label="Park & Ride", mode=RouteMode.HYBRID, segments=segments,
+        total_distance_km=21.3, total_duration_min=38.0,
+        cost=CostBreakdown(fare=3.3, gas=2.1, parking=5.0, total=10.4), delay_info=DelayInfo(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drive-points", type=int, default=3000)
+    parser.add_argument("--transit-points", type=int, default=800)
+    parser.add_argument("--routes", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    routes = [_route(i, args.drive_points, args.transit_points) for i in range(args.routes)]
+    origin, destination = Coordinate(lat=43.78, lng=-79.52), Coordinate(lat=43.643, lng=-79.378)
+
+    configs = [(fmt, zoom) for fmt in GeometryFormat for zoom in (None, 16, 13)]
+    logger.info("Format      zoom       bytes    gzip   encode+dump")
+    baseline = None
+    for fmt, zoom in configs:
+        elapsed = 0.0
+        for _ in range(args.repeat):
+            copies = [r.model_copy(deep=True) for r in routes]
+            start = time.perf_counter()
+            encode_route_geometry(copies, fmt, zoom)
+            body = RouteResponse(routes=copies, origin=origin, destination=destination).model_dump_json().encode()
+            elapsed += time.perf_counter() - start
+        size, zipped = len(body), len(gzip.compress(body, compresslevel=6))
+        baseline = baseline or size
+        logger.info(
+            f"{fmt.value:<11} {str(zoom or '-'):<5} {size:>10,} {zipped:>8,}  {elapsed / args.repeat * 1000:7.1f}ms"
+            f"  ({size / baseline:.0%} of full GeoJSON)"
+        )
+
+
+if __name__ == "__main__":
+    main()
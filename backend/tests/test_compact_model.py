@@ -0,0 +1,52 @@
+"""CompactBooster must reproduce the XGBoost models it was exported from."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+xgb = pytest.importorskip("xgboost")
+
+from app.compact_model import CompactBooster, _parse_base_score  # noqa: E402
+
+FEATURES = ["hour", "day_of_week", "route", "temperature"]
+
+
+def _data(rows: int = 400):
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(rows, len(FEATURES))).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan  # Exercise the missing-value branches
+    signal = np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 2])
+    return X, (signal > 0).astype(int), 3.0 * signal + rng.normal(scale=0.1, size=rows)
+
+
+def test_parse_base_score_scalar_and_vector():
+    assert _parse_base_score("5E-1") == pytest.approx(0.5)
+    assert _parse_base_score("[4.6E-1]") == pytest.approx(0.46)
+
+
+def test_classifier_parity():
+    X, y_cls, _ = _data()
+    model = xgb.XGBClassifier(n_estimators=20, max_depth=3).fit(X, y_cls)
+    compact = CompactBooster.from_xgboost(model, FEATURES)
+    np.testing.assert_allclose(
+        compact.predict_proba(X)[:, 1], model.predict_proba(X)[:, 1], atol=1e-5,
+    )
+
+
+def test_regressor_parity():
+    X, _, y_reg = _data()
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(X, y_reg)
+    compact = CompactBooster.from_xgboost(model, FEATURES)
+    np.testing.assert_allclose(compact.predict(X), model.predict(X), atol=1e-4)
+
+
+def test_arrays_round_trip():
+    X, _, y_reg = _data()
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=2).fit(X, y_reg)
+    compact = CompactBooster.from_xgboost(model, FEATURES)
+    restored = CompactBooster.from_arrays(compact.to_arrays("reg_"), "reg_")
+    np.testing.assert_allclose(restored.predict(X), compact.predict(X))
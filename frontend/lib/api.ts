@@ -2,6 +2,7 @@ import { API_URL } from "./constants";
 import type {
   RouteRequest,
   RouteResponse,
+  RouteStreamMessage,
   RouteOption,
   DelayPredictionResponse,
   ChatMessage,
@@ -44,6 +45,47 @@ export async function getRoutes(request: RouteRequest): Promise<RouteResponse> {
   });
 }
 
+/**
+ * Stream route options from /routes/stream (NDJSON). `onMessage` fires for each
+ * option as soon as the backend finishes it, then once more with the ranked summary.
+ */
+export async function streamRoutes(
+  request: RouteRequest,
+  onMessage: (msg: RouteStreamMessage) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const res = await fetch(`${API_URL}/api/routes/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(request),
+    signal,
+  });
+
+  if (!res.ok || !res.body) {
+    throw new Error(`API error: ${res.status} ${res.statusText}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onMessage(JSON.parse(line) as RouteStreamMessage);
+      newline = buffer.indexOf("\n");
+    }
+  }
+
+  const tail = buffer.trim();
+  if (tail) onMessage(JSON.parse(tail) as RouteStreamMessage);
+}
+
 export async function predictDelay(params: {
   line: string;
   hour?: number;
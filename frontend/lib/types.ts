@@ -84,14 +84,20 @@ export interface RouteRequest {
   destination: Coordinate;
   modes?: RouteMode[];
   departure_time?: string;
+  deadline_s?: number;
 }
 
 export interface RouteResponse {
   routes: RouteOption[];
   origin: Coordinate;
   destination: Coordinate;
+  degraded?: string[];
 }
 
+export type RouteStreamMessage =
+  | { type: "route"; route: RouteOption }
+  | (RouteResponse & { type: "summary"; ranking: string[] });
+
 export interface DelayPredictionResponse {
   delay_probability: number;
   expected_delay_minutes: number;